@@ -0,0 +1 @@
+"""离线性能基准（不访问 X），用法见 benchmarks/run.py"""
@@ -0,0 +1,321 @@
+"""基准用例。
+
+每个用例是一个异步上下文管理器：进入时完成准备工作（创建 LinkHandler、启动本地 HTTP 服务等），
+返回一次操作（协程函数），退出时释放资源。计时只覆盖操作本身。
+
+yt-dlp 的结果来自 benchmarks/fixtures 中录制的 info，syndication 接口由本地 aiohttp 服务返回
+tests/fixtures 中的响应，全部用例都不访问网络。
+"""
+import contextlib
+import itertools
+import json
+import os
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable
+from unittest.mock import patch
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from handlers.link_handler import LinkHandler, build_media_result, select_best_format
+from handlers.syndication import SyndicationResolver, parse_syndication_tweet
+from utils.formatter import format_success_message
+
+
+__all__ = ['CASES', 'load_fixture']
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+TEST_FIXTURES_DIR = Path(__file__).parent.parent / "tests" / "fixtures"
+
+# 录制的 info 中的推文 ID；缓存未命中的用例每次使用不同的 ID
+TWEET_ID = 1863123456789012345
+
+Operation = Callable[[], Awaitable[None]]
+
+
+def load_fixture(name: str) -> dict:
+    """读取录制的响应，先在 benchmarks/fixtures 中查找，再在 tests/fixtures 中查找"""
+    path = FIXTURES_DIR / name
+    if not path.exists():
+        path = TEST_FIXTURES_DIR / name
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _tweet_url(tweet_id: int) -> str:
+    return f"https://x.com/example/status/{tweet_id}"
+
+
+def _env(**values: str) -> contextlib.AbstractContextManager:
+    """临时设置 Config 读取的环境变量"""
+    return patch.dict(os.environ, {"BOT_TOKEN": "benchmark", **values})
+
+
+def _no_native(**values: str) -> contextlib.AbstractContextManager:
+    return _env(NATIVE_RESOLVER_ENABLED="false", RATE_LIMIT_PER_MINUTE="1000000000", **values)
+
+
+# ---------------------------------------------------------------------------
+# 纯 CPU：格式选择与消息格式化
+# ---------------------------------------------------------------------------
+
+@contextlib.asynccontextmanager
+async def select_best_format_case() -> AsyncIterator[Operation]:
+    info = load_fixture("ytdlp_video_info.json")
+
+    async def op() -> None:
+        select_best_format(info)
+
+    yield op
+
+
+@contextlib.asynccontextmanager
+async def build_video_result_case() -> AsyncIterator[Operation]:
+    info = load_fixture("ytdlp_video_info.json")
+
+    async def op() -> None:
+        build_media_result(info, str(TWEET_ID))
+
+    yield op
+
+
+@contextlib.asynccontextmanager
+async def build_photo_result_case() -> AsyncIterator[Operation]:
+    info = load_fixture("ytdlp_photo_info.json")
+
+    async def op() -> None:
+        build_media_result(info, "1863000000000000001")
+
+    yield op
+
+
+@contextlib.asynccontextmanager
+async def parse_syndication_case() -> AsyncIterator[Operation]:
+    data = load_fixture("syndication_video.json")
+
+    async def op() -> None:
+        parse_syndication_tweet(data, data.get("id_str"))
+
+    yield op
+
+
+@contextlib.asynccontextmanager
+async def format_success_message_case() -> AsyncIterator[Operation]:
+    video = build_media_result(load_fixture("ytdlp_video_info.json"), str(TWEET_ID)).video
+
+    async def op() -> None:
+        format_success_message(video)
+
+    yield op
+
+
+# ---------------------------------------------------------------------------
+# LinkHandler.resolve()
+# ---------------------------------------------------------------------------
+
+@contextlib.asynccontextmanager
+async def _link_handler(**env: str) -> AsyncIterator[LinkHandler]:
+    """yt-dlp 替换为返回录制 info 的函数，仍经过解析线程池"""
+    from config import Config
+
+    info = load_fixture("ytdlp_video_info.json")
+    with _no_native(**env):
+        handler = LinkHandler(Config())
+    handler._extract_info_sync = lambda url: info
+    try:
+        yield handler
+    finally:
+        await handler.close()
+        handler.executor.shutdown()
+
+
+@contextlib.asynccontextmanager
+async def resolve_miss_case() -> AsyncIterator[Operation]:
+    async with _link_handler() as handler:
+        ids = itertools.count(TWEET_ID)
+
+        async def op() -> None:
+            await handler.resolve(_tweet_url(next(ids)))
+
+        yield op
+
+
+@contextlib.asynccontextmanager
+async def resolve_hit_case() -> AsyncIterator[Operation]:
+    async with _link_handler() as handler:
+        url = _tweet_url(TWEET_ID)
+        await handler.resolve(url)
+
+        async def op() -> None:
+            await handler.resolve(url)
+
+        yield op
+
+
+@contextlib.asynccontextmanager
+async def _syndication_server() -> AsyncIterator[str]:
+    """返回录制响应的本地 syndication 接口"""
+    body = json.dumps(load_fixture("syndication_video.json"))
+
+    async def tweet_result(request: web.Request) -> web.Response:
+        return web.Response(text=body, content_type="application/json")
+
+    app = web.Application()
+    app.router.add_get("/tweet-result", tweet_result)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        yield str(server.make_url("/tweet-result"))
+    finally:
+        await server.close()
+
+
+@contextlib.asynccontextmanager
+async def resolve_native_case() -> AsyncIterator[Operation]:
+    async with _syndication_server() as base_url, _link_handler() as handler:
+        handler.native = SyndicationResolver(base_url=base_url)
+        ids = itertools.count(TWEET_ID)
+
+        async def op() -> None:
+            await handler.resolve(_tweet_url(next(ids)))
+
+        yield op
+
+
+# ---------------------------------------------------------------------------
+# server.create_app()
+# ---------------------------------------------------------------------------
+
+@contextlib.asynccontextmanager
+async def _api_client() -> AsyncIterator[TestClient]:
+    from server import create_app
+
+    info = load_fixture("ytdlp_video_info.json")
+    with _no_native(), \
+            patch.object(LinkHandler, "warm_up", lambda self: 0), \
+            patch.object(LinkHandler, "_extract_info_sync", lambda self, url: info):
+        client = TestClient(TestServer(create_app()))
+        await client.start_server()
+        try:
+            yield client
+        finally:
+            await client.close()
+
+
+@contextlib.asynccontextmanager
+async def extract_miss_case() -> AsyncIterator[Operation]:
+    async with _api_client() as client:
+        ids = itertools.count(TWEET_ID)
+
+        async def op() -> None:
+            async with client.get("/extract", params={"url": _tweet_url(next(ids))}) as resp:
+                assert resp.status == 200, resp.status
+                await resp.read()
+
+        yield op
+
+
+@contextlib.asynccontextmanager
+async def extract_hit_case() -> AsyncIterator[Operation]:
+    async with _api_client() as client:
+        params = {"url": _tweet_url(TWEET_ID)}
+
+        async def op() -> None:
+            async with client.get("/extract", params=params) as resp:
+                assert resp.status == 200, resp.status
+                await resp.read()
+
+        yield op
+
+
+# ---------------------------------------------------------------------------
+# Bot 消息处理
+# ---------------------------------------------------------------------------
+
+class _FakeMessage:
+    """只实现消息处理用到的方法，避免 MagicMock 的开销计入结果"""
+
+    def __init__(self, text: str = ""):
+        self.text = text
+        self.replies = 0
+
+    async def reply_text(self, text: str, **kwargs) -> "_FakeMessage":
+        self.replies += 1
+        return _FakeMessage(text)
+
+    async def delete(self) -> None:
+        pass
+
+
+class _FakeUser:
+    id = 1
+
+
+class _FakeUpdate:
+    effective_user = _FakeUser()
+
+    def __init__(self, text: str):
+        self.message = _FakeMessage(text)
+
+
+@contextlib.asynccontextmanager
+async def _message_handler() -> AsyncIterator:
+    from handlers.message_handler import MessageHandler
+
+    info = load_fixture("ytdlp_video_info.json")
+    with _no_native(ALLOWED_USER_IDS="1"):
+        handler = MessageHandler()
+    handler.link_handler._extract_info_sync = lambda url: info
+
+    # 不上传文件，走回复直链的分支
+    async def send(message, video, tweet_id=None) -> bool:
+        return False
+
+    handler.uploader.send = send
+    try:
+        yield handler
+    finally:
+        await handler.close()
+        handler.link_handler.executor.shutdown()
+
+
+@contextlib.asynccontextmanager
+async def bot_message_case() -> AsyncIterator[Operation]:
+    async with _message_handler() as handler:
+        ids = itertools.count(TWEET_ID)
+
+        async def op() -> None:
+            outcome = await handler._process_message(_FakeUpdate(_tweet_url(next(ids))))
+            assert outcome == "video", outcome
+
+        yield op
+
+
+@contextlib.asynccontextmanager
+async def bot_multi_message_case() -> AsyncIterator[Operation]:
+    async with _message_handler() as handler:
+        ids = itertools.count(TWEET_ID, 3)
+
+        async def op() -> None:
+            first = next(ids)
+            text = " ".join(_tweet_url(first + i) for i in range(3))
+            outcome = await handler._process_message(_FakeUpdate(text))
+            assert outcome == "multiple", outcome
+
+        yield op
+
+
+# 名称 -> 用例，按从轻到重排列
+CASES: dict[str, Callable[[], contextlib.AbstractAsyncContextManager[Operation]]] = {
+    "select_best_format": select_best_format_case,
+    "build_media_result.video": build_video_result_case,
+    "build_media_result.photos": build_photo_result_case,
+    "parse_syndication_tweet": parse_syndication_case,
+    "format_success_message": format_success_message_case,
+    "link_handler.resolve.hit": resolve_hit_case,
+    "link_handler.resolve.miss": resolve_miss_case,
+    "link_handler.resolve.native": resolve_native_case,
+    "server.extract.hit": extract_hit_case,
+    "server.extract.miss": extract_miss_case,
+    "bot.message": bot_message_case,
+    "bot.message.multi": bot_multi_message_case,
+}
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+离线性能基准
+
+用录制的 yt-dlp info 和本地模拟的 HTTP 响应测量解析路径的开销：格式选择、消息格式化、
+LinkHandler.resolve()、server.create_app() 的 /extract 以及 Bot 消息处理。不访问 X。
+
+使用方法:
+    python3 benchmarks/run.py                     # 运行全部用例并与基线比较
+    python3 benchmarks/run.py -k resolve          # 只运行名称包含 resolve 的用例
+    python3 benchmarks/run.py --check             # 比基线慢（或分配更多内存）超过容差时退出码为 1
+    python3 benchmarks/run.py --update-baseline   # 把本次结果写入 benchmarks/baseline.json
+
+每个用例输出：
+    ops/s       吞吐量（计时阶段的操作次数 / 总耗时）
+    p50 / p99   单次操作耗时（微秒）
+    alloc       单次操作的峰值内存分配（tracemalloc，单独一轮，不影响计时）
+    retained    每次操作后仍未释放的内存（缓存等）
+
+计时结果与机器相关，--check 默认只比较内存分配；在生成基线的机器上可以加 --check-timing 同时比较 p50。
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.cases import CASES, Operation
+
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+DEFAULT_ITERATIONS = 2000
+DEFAULT_WARMUP = 50
+DEFAULT_ALLOC_ITERATIONS = 200
+DEFAULT_TOLERANCE = 0.5
+# 耗时低于该值（微秒）时不做回归判断，噪声比差异更大
+MIN_COMPARABLE_US = 5.0
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def _time_case(op: Operation, iterations: int) -> dict:
+    """计时阶段：逐次记录耗时（纳秒）"""
+    latencies = []
+    gc.collect()
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        t0 = time.perf_counter_ns()
+        await op()
+        latencies.append(time.perf_counter_ns() - t0)
+    total = time.perf_counter_ns() - start
+
+    latencies.sort()
+    return {
+        "ops_per_sec": round(iterations / (total / 1e9), 1),
+        "p50_us": round(_percentile(latencies, 0.50) / 1000, 2),
+        "p99_us": round(_percentile(latencies, 0.99) / 1000, 2),
+    }
+
+
+async def _measure_allocations(op: Operation, iterations: int) -> dict:
+    """内存阶段：每次操作前重置峰值，取中位数"""
+    peaks = []
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start_current, _ = tracemalloc.get_traced_memory()
+        for _ in range(iterations):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await op()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+        gc.collect()
+        end_current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    peaks.sort()
+    return {
+        "alloc_kib": round(_percentile(peaks, 0.50) / 1024, 2),
+        "retained_b": round(max(0, end_current - start_current) / iterations),
+    }
+
+
+async def run_case(name: str, iterations: int, warmup: int, alloc_iterations: int) -> dict:
+    async with CASES[name]() as op:
+        for _ in range(warmup):
+            await op()
+        result = await _time_case(op, iterations)
+        if alloc_iterations > 0:
+            result.update(await _measure_allocations(op, alloc_iterations))
+    return result
+
+
+def compare(name: str, result: dict, baseline: dict, tolerance: float, check_timing: bool) -> list[str]:
+    """返回超过容差的指标说明"""
+    regressions = []
+    keys = ["alloc_kib"]
+    if check_timing:
+        keys.append("p50_us")
+    for key in keys:
+        old, new = baseline.get(key), result.get(key)
+        if old is None or new is None:
+            continue
+        if key.endswith("_us") and old < MIN_COMPARABLE_US:
+            continue
+        if new > old * (1 + tolerance):
+            regressions.append(f"{name}: {key} {old} -> {new} (+{(new / old - 1) * 100:.0f}%)" if old
+                               else f"{name}: {key} {old} -> {new}")
+    return regressions
+
+
+def _delta(result: dict, baseline: dict | None, key: str) -> str:
+    if not baseline or not baseline.get(key) or key not in result:
+        return ""
+    change = (result[key] / baseline[key] - 1) * 100
+    return f" ({change:+.0f}%)"
+
+
+def print_row(name: str, result: dict, baseline: dict | None) -> None:
+    print(
+        f"{name:<28} "
+        f"{result['ops_per_sec']:>10.1f}{_delta(result, baseline, 'ops_per_sec'):<7} "
+        f"{result['p50_us']:>9.1f}{_delta(result, baseline, 'p50_us'):<7} "
+        f"{result['p99_us']:>9.1f} "
+        f"{result.get('alloc_kib', 0):>8.1f}{_delta(result, baseline, 'alloc_kib'):<7} "
+        f"{result.get('retained_b', 0):>8}"
+    )
+
+
+def load_baseline(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8")).get("cases", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_baseline(path: Path, results: dict[str, dict]) -> None:
+    # 只运行部分用例时保留其他用例的基线
+    cases = load_baseline(path)
+    cases.update(results)
+    data = {
+        "python": platform.python_version(),
+        "platform": platform.platform(terse=True),
+        "cases": dict(sorted(cases.items())),
+    }
+    path.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+async def run(args: argparse.Namespace) -> int:
+    names = [name for name in CASES if not args.k or any(k in name for k in args.k)]
+    if not names:
+        print(f"没有匹配的用例，可用用例: {', '.join(CASES)}", file=sys.stderr)
+        return 2
+
+    baseline = load_baseline(args.baseline)
+    print(f"{'case':<28} {'ops/s':>17} {'p50 µs':>16} {'p99 µs':>9} {'alloc KiB':>15} {'retained':>8}")
+
+    results = {}
+    regressions = []
+    for name in names:
+        result = await run_case(name, args.iterations, args.warmup, args.alloc_iterations)
+        results[name] = result
+        print_row(name, result, baseline.get(name))
+        if name in baseline:
+            regressions += compare(name, result, baseline[name], args.tolerance, args.check_timing)
+
+    if args.update_baseline:
+        save_baseline(args.baseline, results)
+        print(f"\n基线已更新: {args.baseline}")
+        return 0
+
+    if regressions:
+        print("\n⚠️  超过基线容差:")
+        for line in regressions:
+            print(f"   {line}")
+        return 1 if args.check else 0
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="avdoulou 离线性能基准")
+    parser.add_argument("-k", action="append", help="只运行名称包含该字符串的用例（可重复）")
+    parser.add_argument("-n", "--iterations", type=int, default=DEFAULT_ITERATIONS, help="计时阶段的操作次数")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP, help="预热次数")
+    parser.add_argument("--alloc-iterations", type=int, default=DEFAULT_ALLOC_ITERATIONS,
+                        help="内存分配统计的操作次数（0 表示跳过）")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="基线文件")
+    parser.add_argument("--update-baseline", action="store_true", help="把本次结果写入基线文件")
+    parser.add_argument("--check", action="store_true", help="超过基线容差时以退出码 1 结束")
+    parser.add_argument("--check-timing", action="store_true",
+                        help="同时比较 p50 耗时（只应在生成基线的机器上使用）")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"允许超过基线的比例（默认 {DEFAULT_TOLERANCE}）")
+    args = parser.parse_args()
+
+    # 每次请求都会打印 INFO 日志，会影响计时
+    logging.disable(logging.INFO)
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,11 @@ import logging
 import signal
 import sys
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
+from telegram.ext import Application
 from telegram.error import TelegramError
 from config import Config
-from handlers.message_handler import MessageHandler as MsgHandler
+from handlers.telegram_bot import CONCURRENT_UPDATES, TelegramBot
+from utils.metrics import start_metrics_server
 
 
 def setup_logging(log_level: str) -> None:
@@ -39,25 +40,55 @@ def main():
         sys.exit(1)
     print(f"白名单用户: {allowed_ids}")
 
+    # webhook 模式下 Bot 运行在 server.py 中，Telegram 不允许同时轮询
+    if config.webhook_url:
+        print("错误: 已设置 WEBHOOK_URL，Bot 由 server.py 以 webhook 方式运行，无需启动 bot.py")
+        print("如需轮询模式，请清空 WEBHOOK_URL（启动轮询时会自动删除 webhook）")
+        sys.exit(1)
+
     # 配置日志
     setup_logging(config.log_level)
 
+    # 创建消息和内联查询处理器（与 webhook 模式共用）
+    telegram_bot = TelegramBot(config)
+    msg_handler = telegram_bot.msg_handler
+
+    metrics_runner = None
+
+    async def post_init(application: Application) -> None:
+        """启动后载入持久化的热门条目和 file_id，在后台预热 YoutubeDL 实例池（不阻塞接收消息），并按需启动指标端口"""
+        nonlocal metrics_runner
+        if config.metrics_port:
+            metrics_runner = await start_metrics_server(
+                "0.0.0.0", config.metrics_port, msg_handler.link_handler.collect_metrics
+            )
+            logging.info(f"指标端口: http://0.0.0.0:{config.metrics_port}/metrics")
+        await msg_handler.link_handler.restore()
+        await msg_handler.uploader.restore()
+        msg_handler.link_handler.start_warm_up()
+
+    async def post_shutdown(application: Application) -> None:
+        """关闭网络连接和指标端口"""
+        await telegram_bot.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+
     # 创建应用
     try:
-        application = Application.builder().token(config.bot_token).build()
+        application = (
+            Application.builder()
+            .token(config.bot_token)
+            .post_init(post_init)
+            .post_shutdown(post_shutdown)
+            .concurrent_updates(CONCURRENT_UPDATES)
+            .build()
+        )
     except Exception as e:
         print(f"错误: 无法创建 Telegram 应用 - {e}")
         sys.exit(1)
 
-    # 创建消息处理器（传入 config）
-    msg_handler = MsgHandler(config)
-
     # 注册处理器
-    application.add_handler(CommandHandler("start", msg_handler.start_command))
-    application.add_handler(CommandHandler("help", msg_handler.help_command))
-    application.add_handler(
-        MessageHandler(filters.TEXT & ~filters.COMMAND, msg_handler.handle_message)
-    )
+    telegram_bot.register(application)
 
     # 信号处理器
     def signal_handler(sig, frame):
@@ -6,13 +6,55 @@
 环境变量:
     BOT_TOKEN: Telegram Bot 令牌（必填）
     LOG_LEVEL: 日志级别，默认 INFO
-    RATE_LIMIT_PER_MINUTE: 每分钟请求限制，默认 5
+    RATE_LIMIT_PER_MINUTE: 每分钟请求限制（Bot 按用户、每个链接计一次，API 按客户端 IP），默认 5
+    TRUST_PROXY_HEADERS: API 是否信任 X-Real-IP / X-Forwarded-For 获取客户端 IP，默认 false
     ALLOWED_USER_IDS: 允许使用 Bot 的 Telegram 用户 ID，逗号分隔（必填）
     TWITTER_COOKIE: Twitter/X Cookie，用于访问 18+ 内容（可选）
+    TWITTER_COOKIES: 多个账号的 Cookie，用 | 分隔，请求会在账号之间轮换（可选）
+    TWITTER_COOKIES_FILE: 多账号 Cookie 文件路径，每行一个 Cookie，# 开头为注释（可选）
+    COOKIE_QUARANTINE_SECONDS: 账号遇到 429 / 认证错误后的隔离时间（秒），默认 300
+    CACHE_MAX_SIZE: 解析结果缓存条目上限，默认 512，0 表示关闭
+    CACHE_TTL_SECONDS: 解析结果缓存有效期（秒），默认 600，0 表示关闭
+    URL_EXPIRY_MARGIN_SECONDS: 带签名的媒体地址在过期前多少秒从缓存中移除，默认 60
+    REFRESH_AHEAD_SECONDS: 热门条目在缓存失效前多少秒内开始后台刷新，默认 120
+    REFRESH_MIN_HITS: 条目被命中多少次后视为热门，默认 3
+    YDL_POOL_SIZE: 每组保留的空闲 YoutubeDL 实例数，默认 4，0 表示不复用
+    YDL_MAX_USES: 单个 YoutubeDL 实例最多使用次数，之后重建，默认 50
+    NATIVE_RESOLVER_ENABLED: 是否先用 syndication 接口解析公开推文，失败再用 yt-dlp，默认 true
+    NATIVE_RESOLVER_URL: syndication 接口地址
+    NATIVE_RESOLVER_TIMEOUT: syndication 接口超时（秒），默认 5
+    BATCH_MAX_URLS: /extract/batch 一次最多提交的链接数，默认 200
+    BATCH_URLS_PER_MINUTE: /extract/batch 每个客户端 IP 每分钟最多解析的链接数（按链接计），默认 60；
+        可以一次提交 BATCH_MAX_URLS 个，之后按这个速度恢复
+    STREAM_MAX_CONCURRENT: /stream 同时转发的视频流上限，超出返回 503，默认 16
+    STREAM_TIMEOUT: /stream 连接 CDN 及两次读取之间的超时（秒），默认 30
+    HLS_WINDOW: 下载只有 HLS 的视频时同时请求的分片数，默认 8
+    FILE_ID_CACHE_SIZE: Bot 缓存的已发送视频 file_id 数量（按推文 ID），默认 2048
+    INLINE_DEBOUNCE_SECONDS: 内联查询停止输入多久后才开始解析（秒），默认 0.6
+    METRICS_PORT: Bot 进程的 Prometheus 指标端口，默认 0 表示不启用（API 服务直接使用 /metrics）
+    EXTRACT_WORKERS: 解析线程数，默认 4
+    EXTRACT_QUEUE_SIZE: 最多排队的解析任务数，超出后直接返回“服务繁忙”，默认 32
+    CIRCUIT_FAILURE_THRESHOLD: X 连续返回限流 / 认证 / 服务器错误多少次后暂停提取，默认 5，0 表示不启用
+    CIRCUIT_OPEN_SECONDS: 第一次暂停的时间（秒），之后每次恢复失败翻倍，默认 30
+    CIRCUIT_MAX_OPEN_SECONDS: 暂停时间上限（秒），默认 600
+    STORE_PATH: 解析结果与 file_id 的 SQLite 持久化文件，重启后预加载热门条目，默认为空表示不启用
+    STORE_MAX_ENTRIES: 持久化的条目数上限，超出后删除命中最少的条目，默认 10000
+    STORE_PRELOAD: 启动时载入内存缓存的热门条目数，默认 512
+    STORE_FLUSH_INTERVAL: 批量写入间隔（秒），默认 2
+    SHARED_STATE_PATH: 多个 server.py 进程共用的 SQLite 文件（解析缓存、频率限制、解析租约），
+        server.py --workers 大于 1 且未设置时自动在 /dev/shm 中创建，默认为空表示不共享
+    WEBHOOK_URL: API 服务的公网地址（如 https://bot.example.com），设置后 Bot 以 webhook 方式挂在 server.py 上，
+        不再单独运行 bot.py，默认为空
+    WEBHOOK_PATH: 接收 Telegram 更新的路径，默认 /telegram/webhook
+    WEBHOOK_SECRET: Telegram 推送时携带的密钥（字母、数字、_ 和 -），为空时由 BOT_TOKEN 派生
 """
+import re
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import field_validator
 
+from utils.cookies import write_netscape_cookie_file
+
 
 class Config(BaseSettings):
     """Bot 配置"""
@@ -20,8 +62,43 @@ class Config(BaseSettings):
     bot_token: str
     log_level: str = "INFO"
     rate_limit_per_minute: int = 5
+    trust_proxy_headers: bool = False  # 反向代理不在本机（如 Docker 网桥）时开启，来自 127.0.0.1 的请求总是读取
     allowed_user_ids: str = ""  # 逗号分隔的用户 ID 列表
     twitter_cookie: str = ""  # Twitter/X Cookie（Netscape 格式）
+    twitter_cookies: str = ""  # 多账号 Cookie，用 | 分隔
+    twitter_cookies_file: str = ""  # 多账号 Cookie 文件，每行一个
+    cookie_quarantine_seconds: int = 300  # 出错账号的隔离时间（秒）
+    cache_max_size: int = 512  # 解析结果缓存条目上限
+    cache_ttl_seconds: int = 600  # 解析结果缓存有效期（秒）
+    url_expiry_margin_seconds: int = 60  # 签名地址过期前提前失效的秒数
+    refresh_ahead_seconds: int = 120  # 热门条目提前刷新的时间窗口（秒）
+    refresh_min_hits: int = 3  # 触发后台刷新的最少命中次数
+    ydl_pool_size: int = 4  # 每组保留的空闲 YoutubeDL 实例数
+    ydl_max_uses: int = 50  # 单个 YoutubeDL 实例最多使用次数
+    native_resolver_enabled: bool = True  # 先用 syndication 接口解析
+    native_resolver_url: str = "https://cdn.syndication.twimg.com/tweet-result"
+    native_resolver_timeout: float = 5.0  # syndication 接口超时（秒）
+    batch_max_urls: int = 200  # /extract/batch 一次最多提交的链接数
+    batch_urls_per_minute: int = 60  # /extract/batch 每个 IP 每分钟解析的链接数
+    stream_max_concurrent: int = 16  # /stream 同时转发的视频流上限
+    stream_timeout: float = 30.0  # /stream 上游读取超时（秒）
+    hls_window: int = 8  # HLS 同时下载的分片数
+    file_id_cache_size: int = 2048  # 已发送视频的 file_id 缓存条目上限
+    inline_debounce_seconds: float = 0.6  # 内联查询防抖时间（秒）
+    metrics_port: int = 0  # Bot 进程的指标端口，0 表示不启用
+    extract_workers: int = 4  # 解析线程数
+    extract_queue_size: int = 32  # 最多排队的解析任务数
+    circuit_failure_threshold: int = 5  # 连续失败多少次后熔断，0 表示不启用
+    circuit_open_seconds: float = 30.0  # 第一次熔断的时间（秒）
+    circuit_max_open_seconds: float = 600.0  # 熔断时间上限（秒）
+    store_path: str = ""  # SQLite 持久化文件，为空表示不启用
+    store_max_entries: int = 10000  # 持久化的条目数上限
+    store_preload: int = 512  # 启动时预加载的热门条目数
+    store_flush_interval: float = 2.0  # 批量写入间隔（秒）
+    shared_state_path: str = ""  # 多进程共享状态文件，为空表示不共享
+    webhook_url: str = ""  # API 服务的公网地址，设置后启用 webhook 模式
+    webhook_path: str = "/telegram/webhook"  # 接收 Telegram 更新的路径
+    webhook_secret: str = ""  # webhook 密钥，为空时由 BOT_TOKEN 派生
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -36,6 +113,52 @@ class Config(BaseSettings):
             raise ValueError("rate_limit_per_minute must be at least 1")
         return v
 
+    @field_validator("ydl_max_uses", "extract_workers", "batch_max_urls", "batch_urls_per_minute", "refresh_min_hits",
+                     "stream_max_concurrent", "hls_window", "store_max_entries")
+    @classmethod
+    def validate_positive(cls, v: int) -> int:
+        if v < 1:
+            raise ValueError("value must be at least 1")
+        return v
+
+    @field_validator("cache_max_size", "cache_ttl_seconds", "ydl_pool_size", "extract_queue_size",
+                     "cookie_quarantine_seconds", "metrics_port", "file_id_cache_size", "url_expiry_margin_seconds",
+                     "refresh_ahead_seconds", "store_preload", "circuit_failure_threshold")
+    @classmethod
+    def validate_non_negative(cls, v: int) -> int:
+        if v < 0:
+            raise ValueError("value must not be negative")
+        return v
+
+    @field_validator("inline_debounce_seconds")
+    @classmethod
+    def validate_debounce(cls, v: float) -> float:
+        if v < 0:
+            raise ValueError("inline_debounce_seconds must not be negative")
+        return v
+
+    @field_validator("native_resolver_timeout", "stream_timeout", "store_flush_interval",
+                     "circuit_open_seconds", "circuit_max_open_seconds")
+    @classmethod
+    def validate_timeout(cls, v: float) -> float:
+        if v <= 0:
+            raise ValueError("timeout must be positive")
+        return v
+
+    @field_validator("webhook_path")
+    @classmethod
+    def validate_webhook_path(cls, v: str) -> str:
+        if not v.startswith("/"):
+            raise ValueError("webhook_path must start with /")
+        return v
+
+    @field_validator("webhook_secret")
+    @classmethod
+    def validate_webhook_secret(cls, v: str) -> str:
+        if v and not re.fullmatch(r"[A-Za-z0-9_-]{1,256}", v):
+            raise ValueError("webhook_secret may only contain A-Z, a-z, 0-9, _ and - (at most 256 characters)")
+        return v
+
     @field_validator("log_level")
     @classmethod
     def validate_log_level(cls, v: str) -> str:
@@ -58,51 +181,25 @@ class Config(BaseSettings):
         allowed = self.get_allowed_user_ids()
         return user_id in allowed
 
+    def get_twitter_cookies(self) -> list[str]:
+        """获取所有账号的 Cookie（TWITTER_COOKIE、TWITTER_COOKIES、TWITTER_COOKIES_FILE 合并去重）"""
+        cookies = [self.twitter_cookie]
+        cookies.extend(self.twitter_cookies.split("|"))
+        if self.twitter_cookies_file.strip():
+            with open(self.twitter_cookies_file.strip(), encoding="utf-8") as f:
+                cookies.extend(line for line in f if not line.lstrip().startswith("#"))
+
+        result = []
+        for cookie in cookies:
+            cookie = cookie.strip()
+            if cookie and cookie not in result:
+                result.append(cookie)
+        return result
+
     def get_twitter_cookie_file(self) -> str | None:
         """获取 Twitter Cookie 文件路径
 
         如果配置了 cookie 内容，会创建临时文件并返回路径
         使用唯一文件名避免并发请求的竞态条件
         """
-        if not self.twitter_cookie.strip():
-            return None
-
-        import tempfile
-        import os
-
-        # 创建唯一的临时 cookie 文件（Netscape 格式）
-        fd, cookie_file = tempfile.mkstemp(suffix="_twitter_cookies.txt", prefix="avdoulou_")
-
-        try:
-            # 解析 cookie 字符串并转换成 Netscape 格式
-            # 输入格式: auth_token=xxx; ct0=xxx; twid=xxx
-            # 输出格式: 每行一个 cookie，tab 分隔 7 个字段
-            cookies = self.twitter_cookie.strip().split(';')
-
-            with os.fdopen(fd, 'w') as f:
-                # Netscape 格式头部（可选，但某些工具需要）
-                f.write("# Netscape HTTP Cookie File\n")
-                f.write("# This file is generated by avdoulou\n\n")
-
-                for cookie in cookies:
-                    cookie = cookie.strip()
-                    if '=' in cookie:
-                        name, value = cookie.split('=', 1)
-                        name = name.strip()
-                        value = value.strip()
-                        # 跳过空值
-                        if not name or not value:
-                            continue
-                        # Netscape 格式: domain \t flag \t path \t secure \t expiration \t name \t value
-                        # flag: TRUE 表示可用于所有子域名
-                        # secure: FALSE 表示非 HTTPS 专用（虽然 x.com 用 HTTPS，但 yt-dlp 期望 FALSE）
-                        f.write(f".x.com\tTRUE\t/\tFALSE\t0\t{name}\t{value}\n")
-
-            return cookie_file
-        except Exception:
-            # 如果写入失败，关闭文件描述符
-            try:
-                os.close(fd)
-            except:
-                pass
-            raise
+        return write_netscape_cookie_file(self.twitter_cookie)
@@ -0,0 +1,122 @@
+"""多账号 Cookie 池。
+
+X 对单个账号有请求频率限制。配置多个账号的 Cookie 后，每次提取选择最久未使用的账号；
+返回 429 或认证错误的账号会被临时隔离，连续出错时隔离时间翻倍。
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from utils.cookies import CookieFile
+from utils.exceptions import ERROR_AUTH, ERROR_RATE_LIMITED
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUARANTINE_SECONDS = 300
+MAX_QUARANTINE_SECONDS = 3600
+
+
+@dataclass
+class CookieAccount:
+    """一个 X 账号"""
+    name: str
+    cookies: CookieFile
+    last_used: float = 0.0
+    quarantined_until: float = 0.0
+    strikes: int = 0  # 连续被隔离的次数
+    successes: int = 0
+    failures: int = 0
+
+
+class AccountPool:
+    """按最久未使用（LRU）轮换账号，出错的账号临时隔离（线程安全）"""
+
+    def __init__(
+        self,
+        cookies: list[str] | None = None,
+        quarantine_seconds: float = DEFAULT_QUARANTINE_SECONDS,
+        max_quarantine_seconds: float = MAX_QUARANTINE_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+        directory: str | None = None,
+    ):
+        self.quarantine_seconds = quarantine_seconds
+        self.max_quarantine_seconds = max_quarantine_seconds
+        self._clock = clock
+        self._directory = directory
+        self._lock = threading.Lock()
+        self.accounts: list[CookieAccount] = self._build(cookies or [])
+
+    def __len__(self) -> int:
+        return len(self.accounts)
+
+    def _build(self, cookies: list[str]) -> list[CookieAccount]:
+        accounts = []
+        for cookie in cookies:
+            cookie_file = CookieFile(cookie, self._directory)
+            if cookie_file:
+                accounts.append(CookieAccount(name=cookie_file.identity, cookies=cookie_file))
+        return accounts
+
+    def acquire(self) -> CookieAccount | None:
+        """选择一个可用账号；未配置账号或全部被隔离时返回 None（匿名访问）"""
+        with self._lock:
+            now = self._clock()
+            available = [a for a in self.accounts if a.quarantined_until <= now]
+            if not available:
+                if self.accounts:
+                    logger.warning("All cookie accounts are quarantined, falling back to anonymous access")
+                return None
+            account = min(available, key=lambda a: a.last_used)
+            account.last_used = now
+            return account
+
+    def report_success(self, account: CookieAccount) -> None:
+        with self._lock:
+            account.successes += 1
+            account.strikes = 0
+
+    def report_failure(self, account: CookieAccount, error_kind: str) -> None:
+        """记录失败；限流和认证错误会让账号进入隔离期"""
+        with self._lock:
+            account.failures += 1
+            if error_kind not in (ERROR_RATE_LIMITED, ERROR_AUTH):
+                return
+            account.strikes += 1
+            duration = min(
+                self.quarantine_seconds * 2 ** (account.strikes - 1),
+                self.max_quarantine_seconds,
+            )
+            account.quarantined_until = self._clock() + duration
+        logger.warning(f"Cookie account {account.name} quarantined for {duration:.0f}s ({error_kind})")
+
+    def rotate(self, cookies: list[str]) -> bool:
+        """替换账号列表，有变化时返回 True；旧账号的 Cookie 文件会被删除"""
+        new_accounts = self._build(cookies)
+        with self._lock:
+            if [a.name for a in new_accounts] == [a.name for a in self.accounts]:
+                return False
+            old_accounts, self.accounts = self.accounts, new_accounts
+        for account in old_accounts:
+            account.cookies.invalidate()
+        return True
+
+    def invalidate(self) -> None:
+        """删除所有账号的 Cookie 文件"""
+        for account in self.accounts:
+            account.cookies.invalidate()
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            now = self._clock()
+            return [
+                {
+                    'name': a.name,
+                    'quarantined_for': max(0.0, round(a.quarantined_until - now, 1)),
+                    'successes': a.successes,
+                    'failures': a.failures,
+                }
+                for a in self.accounts
+            ]
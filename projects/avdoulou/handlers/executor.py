@@ -0,0 +1,106 @@
+"""专用的解析线程池。
+
+yt-dlp 的提取是阻塞调用，放在 asyncio 默认线程池里会和其他任务抢线程，且没有准入控制。
+ExtractionExecutor 使用独立的线程池，并限制排队任务数：队列已满时立即抛出
+ExtractorBusyError，由调用方返回 503 / “服务繁忙”，而不是让请求无限排队。
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from utils.exceptions import ExtractorBusyError
+from utils.metrics import STAGE_LATENCY
+
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_QUEUE = 32
+
+
+class ExtractionExecutor:
+    """有界的解析线程池，附带排队与执行统计"""
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, max_queue: int = DEFAULT_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="extract")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.queue_wait_last = 0.0
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """在解析线程池中执行 fn(*args)
+
+        Raises:
+            ExtractorBusyError: 等待执行的任务数已达到 max_queue
+        """
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise ExtractorBusyError("解析队列已满", retry_after=self._estimate_retry_after())
+            self.queued += 1
+
+        submitted_at = time.monotonic()
+
+        def job():
+            waited = time.monotonic() - submitted_at
+            with self._lock:
+                self.queued -= 1
+                self.in_flight += 1
+                self.queue_wait_total += waited
+                self.queue_wait_last = waited
+                self.queue_wait_max = max(self.queue_wait_max, waited)
+            STAGE_LATENCY.observe(waited, stage="queue_wait")
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+                    self.completed += 1
+
+        future = self._pool.submit(job)
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    def _on_done(self, future) -> None:
+        # 排队中的任务被取消时 job 不会执行，需要在这里归还名额
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    def _estimate_retry_after(self) -> float:
+        """粗略估计多久之后可能有空位（秒）"""
+        if not self.completed:
+            return 1.0
+        avg_wait = self.queue_wait_total / self.completed
+        return max(1.0, round(avg_wait, 1))
+
+    @property
+    def saturation(self) -> float:
+        """繁忙程度：(执行中 + 排队中) / (线程数 + 队列上限)"""
+        capacity = self.max_workers + self.max_queue
+        return (self.in_flight + self.queued) / capacity if capacity else 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            avg_wait = self.queue_wait_total / self.completed if self.completed else 0.0
+            return {
+                'workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'queued': self.queued,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'queue_wait_avg_ms': round(avg_wait * 1000, 1),
+                'queue_wait_max_ms': round(self.queue_wait_max * 1000, 1),
+                'queue_wait_last_ms': round(self.queue_wait_last * 1000, 1),
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=True)
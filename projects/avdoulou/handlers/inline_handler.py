@@ -0,0 +1,166 @@
+"""Telegram 内联查询（@bot <推文链接>）。
+
+用户输入链接时每次按键都会产生一个内联查询。为避免一条链接触发十几次解析：
+- 每个用户的查询先等待 debounce 秒，期间收到同一用户的新查询时取消旧查询
+- 解析走 LinkHandler.resolve()，命中缓存时不计入频率限制
+- 已经发送过的视频直接返回缓存的 file_id
+"""
+import asyncio
+import logging
+
+from telegram import (
+    InlineQuery,
+    InlineQueryResultArticle,
+    InlineQueryResultCachedVideo,
+    InlineQueryResultPhoto,
+    InlineQueryResultVideo,
+    InputTextMessageContent,
+    Update,
+)
+from telegram.error import BadRequest
+from telegram.ext import ContextTypes
+
+from config import Config
+from handlers.link_handler import LinkHandler
+from handlers.models import MediaResult
+from handlers.video_uploader import VideoUploader
+from utils.exceptions import ServiceUnavailableError
+from utils.formatter import format_error_message, format_unavailable_message
+from utils.hls import is_hls_url
+from utils.rate_limiter import TokenBucketLimiter
+from utils.validators import extract_tweet_id, is_x_video_url
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEBOUNCE_SECONDS = 0.6
+# Telegram 端按查询文本缓存结果的时间（秒）；结果只对当前用户可见
+RESULT_CACHE_SECONDS = 300
+
+
+class InlineHandler:
+    """内联查询处理器"""
+
+    def __init__(
+        self,
+        config: Config,
+        link_handler: LinkHandler,
+        uploader: VideoUploader,
+        rate_limiter: TokenBucketLimiter,
+        debounce: float = DEFAULT_DEBOUNCE_SECONDS,
+    ):
+        self.config = config
+        self.link_handler = link_handler
+        self.uploader = uploader
+        self.rate_limiter = rate_limiter
+        self.debounce = debounce
+        # 用户 ID -> 正在处理的查询
+        self._pending: dict[int, asyncio.Task] = {}
+
+    async def handle_inline_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """处理内联查询：取消同一用户尚未完成的查询，延迟 debounce 秒后再解析"""
+        query = update.inline_query
+        user_id = query.from_user.id
+
+        if not self.config.is_user_allowed(user_id):
+            logger.warning(f"Unauthorized inline query from user_id: {user_id}")
+            await self._answer(query, [], cache_time=0)
+            return
+
+        previous = self._pending.pop(user_id, None)
+        if previous is not None:
+            previous.cancel()
+
+        text = query.query.strip()
+        if not is_x_video_url(text):
+            return
+
+        task = asyncio.create_task(self._resolve_and_answer(query, text))
+        self._pending[user_id] = task
+        task.add_done_callback(lambda t: self._pending.pop(user_id, None) if self._pending.get(user_id) is t else None)
+
+    async def _resolve_and_answer(self, query: InlineQuery, url: str) -> None:
+        await asyncio.sleep(self.debounce)
+
+        # 命中缓存的查询不计入频率限制
+        tweet_id = extract_tweet_id(url)
+        if tweet_id not in self.link_handler.cache:
+            allowed, _ = self.rate_limiter.check(query.from_user.id)
+            if not allowed:
+                await self._answer(query, [self._article("rate_limit", format_error_message("rate_limit"))],
+                                   cache_time=0)
+                return
+
+        try:
+            result = await self.link_handler.resolve(url)
+        except ServiceUnavailableError as e:
+            logger.warning(f"Inline query rejected: {e}")
+            await self._answer(query, [self._article("busy", format_unavailable_message(e))], cache_time=0)
+            return
+        except Exception as e:
+            logger.error(f"Inline query for {url[:50]} failed: {e}", exc_info=True)
+            await self._answer(query, [self._article("error", "❌ 处理失败，请稍后重试")], cache_time=0)
+            return
+
+        await self._answer(query, self.build_results(result, url))
+
+    def build_results(self, result: MediaResult, url: str) -> list:
+        """把解析结果转换成内联查询结果"""
+        key = result.tweet_id or "media"
+
+        if result.type == "video" and result.video:
+            video = result.video
+            file_id = self.uploader.file_ids.get(result.tweet_id) if result.tweet_id else None
+            if file_id:
+                return [InlineQueryResultCachedVideo(
+                    id=f"{key}-v", video_file_id=file_id, title=video.title[:256], caption=video.title[:1024],
+                )]
+            if not is_hls_url(video.url) and video.thumbnail:
+                return [InlineQueryResultVideo(
+                    id=f"{key}-v",
+                    video_url=video.url,
+                    mime_type="video/mp4",
+                    thumbnail_url=video.thumbnail,
+                    title=video.title[:256],
+                    caption=video.title[:1024],
+                    video_width=video.width or None,
+                    video_height=video.height or None,
+                    video_duration=video.duration or None,
+                )]
+            return [self._article(f"{key}-v", f"🎬 {video.title}\n\n🔗 {video.url}", title=video.title[:256])]
+
+        if result.type == "photos" and result.photos:
+            return [
+                InlineQueryResultPhoto(
+                    id=f"{key}-p{i}",
+                    photo_url=photo.url,
+                    thumbnail_url=photo.url,
+                    photo_width=photo.width or None,
+                    photo_height=photo.height or None,
+                )
+                for i, photo in enumerate(result.photos)
+            ]
+
+        return [self._article(f"{key}-none", "❌ 该推文不包含视频或图片")]
+
+    @staticmethod
+    def _article(result_id: str, text: str, title: str | None = None) -> InlineQueryResultArticle:
+        return InlineQueryResultArticle(
+            id=result_id,
+            title=title or text.split("\n", 1)[0],
+            input_message_content=InputTextMessageContent(text),
+        )
+
+    @staticmethod
+    async def _answer(query: InlineQuery, results: list, cache_time: int = RESULT_CACHE_SECONDS) -> None:
+        try:
+            await query.answer(results, cache_time=cache_time, is_personal=True)
+        except BadRequest as e:
+            # 查询超时（用户已经输入了新内容）时 Telegram 返回 "Query is too old"
+            logger.debug(f"Answering inline query failed: {e}")
+
+    async def close(self) -> None:
+        """取消尚未完成的查询"""
+        for task in list(self._pending.values()):
+            task.cancel()
+        self._pending.clear()
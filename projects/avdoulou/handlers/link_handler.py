@@ -1,31 +1,136 @@
-# handlers/link_handler.py
 import asyncio
 import logging
-import os
-import yt_dlp
-from dataclasses import dataclass
-from utils.validators import is_x_video_url
+import sqlite3
+import time
+from handlers.account_pool import AccountPool, DEFAULT_QUARANTINE_SECONDS
+from handlers.executor import ExtractionExecutor, DEFAULT_WORKERS, DEFAULT_MAX_QUEUE
+from handlers.models import MediaResult, PhotoInfo, VideoInfo
+from handlers.syndication import SyndicationResolver
+from handlers.ydl_pool import YoutubeDLPool, DEFAULT_MAX_IDLE, DEFAULT_MAX_USES
+from utils.cache import TTLCache
+from utils.circuit_breaker import CircuitBreaker, DEFAULT_FAILURE_THRESHOLD, DEFAULT_OPEN_SECONDS, DEFAULT_MAX_OPEN_SECONDS
+from utils.exceptions import ERROR_NOT_FOUND, ServiceUnavailableError, UpstreamError, classify_error
+from utils import metrics
+from utils.shared_state import SharedState
+from utils.singleflight import SingleFlight
+from utils.store import ResolutionStore
+from utils.hls import is_hls_url
+from utils.url_expiry import parse_url_expiry
+from utils.validators import is_x_video_url, extract_tweet_id
 
 
 logger = logging.getLogger(__name__)
 
-
-@dataclass
-class VideoInfo:
-    """视频信息"""
-    url: str
-    title: str
-    duration: int
-    width: int
-    height: int
-
-
-@dataclass
-class PhotoInfo:
-    """图片信息"""
-    url: str
-    width: int
-    height: int
+DEFAULT_CACHE_MAX_SIZE = 512
+DEFAULT_CACHE_TTL_SECONDS = 600
+DEFAULT_URL_EXPIRY_MARGIN_SECONDS = 60
+DEFAULT_REFRESH_AHEAD_SECONDS = 120
+DEFAULT_REFRESH_MIN_HITS = 3
+MAX_PHOTOS = 4
+
+# yt-dlp 提取参数，同时也是实例池的分组键
+YDL_OPTS = {
+    "quiet": True,
+    "no_warnings": True,
+    "extract_flat": True,  # 支持转推
+}
+
+
+def select_best_format(info: dict) -> dict | None:
+    """从 yt-dlp 的 formats 中选择分辨率最高的视频流"""
+    best_format = None
+    for f in info.get("formats") or []:
+        vcodec = f.get("vcodec", "none")
+        if vcodec and vcodec != "none" and f.get("url"):
+            height = f.get("height") or 0
+            if best_format is None or height > (best_format.get("height") or 0):
+                best_format = f
+    return best_format
+
+
+def select_photos(info: dict) -> list[PhotoInfo]:
+    """从 yt-dlp 的 thumbnails 中提取原图"""
+    photos = []
+    seen_urls = set()
+    for thumb in info.get("thumbnails") or []:
+        img_url = thumb.get("url")
+        if img_url and "?format=" not in img_url and img_url not in seen_urls:
+            # 过滤掉小尺寸预览图，只保留原图
+            if "orig" in img_url or "large" in img_url or "medium" in img_url:
+                seen_urls.add(img_url)
+                photos.append(PhotoInfo(
+                    url=img_url,
+                    width=thumb.get("width") or 0,
+                    height=thumb.get("height") or 0,
+                ))
+            if len(photos) >= MAX_PHOTOS:
+                break
+    return photos
+
+
+def _hls_manifest_url(url: str, fmt: dict) -> str | None:
+    """HLS 视频流对应的主播放列表地址"""
+    if not (str(fmt.get("protocol") or "").startswith("m3u8") or is_hls_url(url)):
+        return None
+    return fmt.get("manifest_url") or url
+
+
+def media_expiry(url: str, fmt: dict | None = None) -> float | None:
+    """视频地址的过期时间，同时参考格式中的 manifest_url / fragment_base_url，取最早的一个"""
+    candidates = [url]
+    if fmt:
+        candidates.extend(fmt.get(key) for key in ("manifest_url", "fragment_base_url"))
+    hints = [e for e in map(parse_url_expiry, candidates) if e is not None]
+    return min(hints) if hints else None
+
+
+def build_media_result(info: dict | None, tweet_id: str | None = None) -> MediaResult:
+    """把 yt-dlp 返回的 info 转换成统一的解析结果"""
+    if not info:
+        return MediaResult(type="unknown", tweet_id=tweet_id)
+
+    title = info.get("title") or "Unknown"
+    uploader = info.get("uploader") or ""
+
+    # 优先检查是否有视频（通过 formats 或 duration）
+    formats = info.get("formats") or []
+    has_video = any(f.get("vcodec") != "none" for f in formats if f.get("vcodec"))
+    if has_video or info.get("duration"):
+        # 如果 info 中有 url，直接使用；否则从 formats 中选择最佳格式
+        video_url = info.get("url")
+        width = info.get("width")
+        height = info.get("height")
+        best_format = None
+        if not video_url:
+            best_format = select_best_format(info)
+            if best_format:
+                video_url = best_format["url"]
+                width = width or best_format.get("width")
+                height = height or best_format.get("height")
+
+        if video_url:
+            return MediaResult(
+                type="video",
+                tweet_id=tweet_id,
+                title=title,
+                uploader=uploader,
+                video=VideoInfo(
+                    url=video_url,
+                    title=title,
+                    duration=int(info.get("duration") or 0),
+                    width=width or 0,
+                    height=height or 0,
+                    manifest_url=_hls_manifest_url(video_url, best_format or info),
+                    thumbnail=info.get("thumbnail"),
+                ),
+                expires_at=media_expiry(video_url, best_format),
+            )
+
+    photos = select_photos(info)
+    if photos:
+        return MediaResult(type="photos", tweet_id=tweet_id, title=title, uploader=uploader, photos=photos)
+
+    return MediaResult(type="unknown", tweet_id=tweet_id, title=title, uploader=uploader)
 
 
 class LinkHandler:
@@ -33,178 +138,320 @@ class LinkHandler:
 
     def __init__(self, config=None):
         self.config = config
+        # 解析结果缓存，键为推文 ID，x.com / twitter.com 等变体共用同一条目
+        self.cache = TTLCache(
+            maxsize=config.cache_max_size if config else DEFAULT_CACHE_MAX_SIZE,
+            ttl=config.cache_ttl_seconds if config else DEFAULT_CACHE_TTL_SECONDS,
+        )
+        # 同一推文的并发解析只执行一次 yt-dlp
+        self.inflight = SingleFlight()
+        # 签名地址在过期前 expiry_margin 秒失效；热门推文在失效前 refresh_ahead 秒内后台刷新
+        self.expiry_margin = config.url_expiry_margin_seconds if config else DEFAULT_URL_EXPIRY_MARGIN_SECONDS
+        self.refresh_ahead = config.refresh_ahead_seconds if config else DEFAULT_REFRESH_AHEAD_SECONDS
+        self.refresh_min_hits = config.refresh_min_hits if config else DEFAULT_REFRESH_MIN_HITS
+        self._refreshing: dict[str, asyncio.Task] = {}
+        # 后台预热任务；预热完成前的请求同样可以处理，只是第一次解析要等 yt-dlp 导入
+        self._warm_up_task: asyncio.Task | None = None
+        self.warmed_up = False
+        # 解析结果持久化（设置 STORE_PATH 时启用），重启后预加载热门条目
+        self.store = None
+        if config and config.store_path:
+            self.store = ResolutionStore(
+                config.store_path,
+                max_entries=config.store_max_entries,
+                flush_interval=config.store_flush_interval,
+            )
+        # 多进程共享的缓存和解析租约（server.py --workers 或设置 SHARED_STATE_PATH 时启用）
+        self.shared = SharedState(config.shared_state_path) if config and config.shared_state_path else None
+        # 复用 YoutubeDL 实例，避免每次请求都重新构造
+        self.ydl_pool = YoutubeDLPool(
+            max_idle=config.ydl_pool_size if config else DEFAULT_MAX_IDLE,
+            max_uses=config.ydl_max_uses if config else DEFAULT_MAX_USES,
+        )
+        # 轻量解析器（syndication 接口），未命中时回退到 yt-dlp；未传入配置时不启用
+        self.native = None
+        if config and config.native_resolver_enabled:
+            self.native = SyndicationResolver(
+                base_url=config.native_resolver_url,
+                timeout=config.native_resolver_timeout,
+            )
+        # 多账号 Cookie 池，每个账号的 Cookie 文件只生成一次
+        self.accounts = AccountPool(
+            config.get_twitter_cookies() if config else [],
+            quarantine_seconds=config.cookie_quarantine_seconds if config else DEFAULT_QUARANTINE_SECONDS,
+        )
+        # 专用解析线程池，队列满时快速拒绝
+        self.executor = ExtractionExecutor(
+            max_workers=config.extract_workers if config else DEFAULT_WORKERS,
+            max_queue=config.extract_queue_size if config else DEFAULT_MAX_QUEUE,
+        )
+        # X 连续限流 / 要求登录时熔断，不再占用解析线程
+        self.breaker = CircuitBreaker(
+            failure_threshold=config.circuit_failure_threshold if config else DEFAULT_FAILURE_THRESHOLD,
+            open_seconds=config.circuit_open_seconds if config else DEFAULT_OPEN_SECONDS,
+            max_open_seconds=config.circuit_max_open_seconds if config else DEFAULT_MAX_OPEN_SECONDS,
+        )
 
-    async def parse_x_video(self, url: str) -> VideoInfo | None:
-        """解析 X 视频链接，返回视频信息"""
+    def warm_up(self) -> int:
+        """生成 Cookie 文件并预先创建 YoutubeDL 实例（同步方法，应在线程池中调用）"""
+        created = 0
+        if not self.accounts:
+            created = self.ydl_pool.warm_up(YDL_OPTS)
+        for account in self.accounts.accounts:
+            account.cookies.path()
+            created += self.ydl_pool.warm_up(YDL_OPTS, account.cookies, count=1)
+        self.warmed_up = True
+        logger.info(f"Warmed up {created} YoutubeDL instance(s)")
+        return created
+
+    def start_warm_up(self) -> asyncio.Task:
+        """在后台线程中预热（yt-dlp 在这里第一次导入），不阻塞服务启动"""
+        if self._warm_up_task is None:
+            self._warm_up_task = asyncio.create_task(self._warm_up_in_background())
+        return self._warm_up_task
+
+    async def _warm_up_in_background(self) -> None:
+        start = time.perf_counter()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.warm_up)
+        except Exception as e:
+            logger.warning(f"Warming up YoutubeDL failed: {e}")
+            return
+        logger.info(f"YoutubeDL ready after {time.perf_counter() - start:.2f}s")
+
+    def rotate_cookies(self, cookies: list[str]) -> bool:
+        """更换账号 Cookie：删除旧的 Cookie 文件并关闭使用旧 Cookie 的空闲实例"""
+        if not self.accounts.rotate(cookies):
+            return False
+        self.ydl_pool.clear()
+        # 熔断多半由旧 Cookie 失效引起，换上新 Cookie 后立即恢复
+        self.breaker.reset()
+        logger.info(f"Twitter cookies rotated ({len(self.accounts)} account(s))")
+        return True
+
+    async def resolve(self, url: str) -> MediaResult:
+        """解析推文媒体（视频或图片），每条推文只调用一次 yt-dlp
+
+        Raises:
+            ServiceUnavailableError: 解析队列已满等暂时不可用的情况
+            UpstreamError: 提取失败（限流、认证失败、超时等），与没有媒体的推文区分
+        """
         if not is_x_video_url(url):
-            return None
-
-        video_data = await self._extract_video_info(url)
-        if not video_data:
-            return None
-
-        return VideoInfo(
-            url=video_data["url"],
-            title=video_data.get("title", "Unknown"),
-            duration=video_data.get("duration", 0),
-            width=video_data.get("width", 0),
-            height=video_data.get("height", 0),
+            return MediaResult(type="unknown")
+
+        tweet_id = extract_tweet_id(url)
+        cache_key = tweet_id or url
+        entry = self.cache.get_entry(cache_key)
+        if entry is not None:
+            cached, remaining, hits = entry
+            metrics.RESOLUTIONS.inc(source="cache", result=cached.type)
+            if self.store and tweet_id:
+                self.store.touch(tweet_id)
+            if remaining <= self.refresh_ahead and hits >= self.refresh_min_hits:
+                self._schedule_refresh(url, tweet_id, cache_key)
+            return cached
+
+        return await self.inflight.do(
+            cache_key,
+            lambda: self._resolve_shared(url, tweet_id, cache_key),
         )
 
-    async def _extract_video_info(self, url: str) -> dict | None:
-        """使用 yt-dlp 提取视频信息"""
-        # 第一步：使用 extract_flat 获取推文信息（支持转推）
-        ydl_opts_flat = {
-            "quiet": True,
-            "no_warnings": True,
-            "extract_flat": True,  # 支持转推，不解析格式
-        }
-
-        # 添加 Cookie 支持（用于 18+ 内容）
-        cookie_file = None
-        if self.config:
-            cookie_file = self.config.get_twitter_cookie_file()
-            if cookie_file:
-                ydl_opts_flat["cookiefile"] = cookie_file
+    async def _resolve_shared(self, url: str, tweet_id: str | None, cache_key: str) -> MediaResult:
+        """多进程模式：先查共享缓存，再用租约保证同一推文同时只由一个进程解析"""
+        if self.shared is None or not tweet_id:
+            return await self._resolve_uncached(url, tweet_id, cache_key)
 
+        deadline = time.monotonic() + self.shared.lease_seconds
         try:
-            loop = asyncio.get_event_loop()
-            with yt_dlp.YoutubeDL(ydl_opts_flat) as ydl:
-                info = await loop.run_in_executor(
-                    None,
-                    ydl.extract_info,
-                    url,
-                    False,
-                )
-
-                if not info:
-                    return None
-
-                # 第二步：如果找到了视频，获取最佳格式的 URL
-                # 如果 info 中有 url，直接使用；否则从 formats 中提取
-                video_url = info.get("url")
-                if not video_url:
-                    formats = info.get("formats", [])
-                    # 选择有视频流的最佳格式
-                    best_format = None
-                    for f in formats:
-                        vcodec = f.get("vcodec", "none")
-                        if vcodec and vcodec != "none":
-                            height = f.get("height", 0)
-                            if best_format is None or height > best_format.get("height", 0):
-                                best_format = f
-                    if best_format:
-                        video_url = best_format.get("url")
-
-                if not video_url:
-                    return None
-
-                return {
-                    "url": video_url,
-                    "title": info.get("title", "Unknown"),
-                    "duration": info.get("duration", 0),
-                    "width": info.get("width", 0),
-                    "height": info.get("height", 0),
-                }
+            while True:
+                cached = await self.shared.get(tweet_id)
+                if cached is not None:
+                    data, remaining = cached
+                    result = MediaResult.from_dict(data)
+                    self.cache.set(cache_key, result, ttl=remaining)
+                    metrics.RESOLUTIONS.inc(source="shared", result=result.type)
+                    return result
+                if await self.shared.acquire(tweet_id):
+                    break
+                if time.monotonic() >= deadline:
+                    # 持有租约的进程迟迟没有结果，自己解析
+                    break
+                await asyncio.sleep(self.shared.poll_interval)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared state unavailable, resolving locally: {e}")
+            return await self._resolve_uncached(url, tweet_id, cache_key)
+
+        try:
+            return await self._resolve_uncached(url, tweet_id, cache_key)
+        finally:
+            try:
+                await self.shared.release(tweet_id)
+            except sqlite3.Error as e:
+                logger.warning(f"Releasing lease for {tweet_id} failed: {e}")
+
+    async def _resolve_uncached(self, url: str, tweet_id: str | None, cache_key: str) -> MediaResult:
+        """先尝试轻量解析器，未命中时调用 yt-dlp，成功后写入缓存"""
+        result = None
+        if self.native and tweet_id:
+            with metrics.STAGE_LATENCY.time(stage="native_resolve"):
+                result = await self.native.resolve(tweet_id)
+            if result is not None:
+                metrics.RESOLUTIONS.inc(source="native", result=result.type)
+
+        if result is None:
+            info = await self._extract_info(url)
+            with metrics.STAGE_LATENCY.time(stage="format_selection"):
+                result = build_media_result(info, tweet_id)
+            metrics.RESOLUTIONS.inc(source="ytdlp", result=result.type)
+        # 只缓存成功的结果，失败时下次仍会重试
+        if result.found:
+            ttl = self._cache_ttl(result)
+            self.cache.set(cache_key, result, ttl=ttl)
+            ttl = self.cache.ttl if ttl is None else min(ttl, self.cache.ttl)
+            if tweet_id and ttl > 0:
+                if self.store:
+                    self.store.put(tweet_id, result, expires_at=time.time() + ttl)
+                if self.shared:
+                    try:
+                        await self.shared.set(tweet_id, result.to_dict(), ttl)
+                    except sqlite3.Error as e:
+                        logger.warning(f"Writing shared cache for {tweet_id} failed: {e}")
+        return result
+
+    async def invalidate(self, tweet_id: str) -> None:
+        """删除推文的缓存（包括多进程共享的缓存），例如签名地址提前失效时"""
+        self.cache.delete(tweet_id)
+        if self.shared:
+            try:
+                await self.shared.delete(tweet_id)
+            except sqlite3.Error as e:
+                logger.warning(f"Deleting shared cache for {tweet_id} failed: {e}")
+
+    async def restore(self) -> int:
+        """把持久化存储中命中最多的条目载入内存缓存（启动时调用），返回载入的条目数"""
+        if self.store is None or not self.cache.enabled:
+            return 0
+        limit = min(self.config.store_preload, self.cache.maxsize)
+        try:
+            stored = await self.store.load_hot(limit)
         except Exception as e:
-            logger.error(f"Error extracting video info from {url}: {e}", exc_info=True)
+            logger.warning(f"Loading resolution store failed: {e}")
+            return 0
+
+        loaded = 0
+        now = time.time()
+        # 最热的条目最后写入，在 LRU 中最晚被淘汰
+        for entry in reversed(stored):
+            ttl = entry.expires_at - now
+            if ttl > 0:
+                self.cache.set(entry.tweet_id, entry.result, ttl=ttl)
+                loaded += 1
+        logger.info(f"Restored {loaded} resolution(s) from {self.store.path}")
+        return loaded
+
+    def _cache_ttl(self, result: MediaResult) -> float | None:
+        """缓存有效期：签名地址在过期前 expiry_margin 秒失效，没有过期提示时使用默认值"""
+        if result.expires_at is None:
             return None
+        return result.expires_at - time.time() - self.expiry_margin
+
+    def _schedule_refresh(self, url: str, tweet_id: str | None, cache_key: str) -> None:
+        """在后台重新解析即将失效的热门条目，每个键同时只刷新一次"""
+        if cache_key in self._refreshing:
+            return
+        task = asyncio.create_task(self._refresh(url, tweet_id, cache_key))
+        self._refreshing[cache_key] = task
+
+    async def _refresh(self, url: str, tweet_id: str | None, cache_key: str) -> None:
+        try:
+            # 多进程模式下只有取得租约的进程刷新，共享缓存中的旧条目与本地的一样即将失效，不能使用
+            if self.shared and tweet_id and not await self.shared.acquire(tweet_id):
+                return
+            try:
+                await self.inflight.do(cache_key, lambda: self._resolve_uncached(url, tweet_id, cache_key))
+            finally:
+                if self.shared and tweet_id:
+                    await self.shared.release(tweet_id)
+        except Exception as e:
+            # 刷新失败时旧条目保留到过期
+            logger.warning(f"Background refresh of {cache_key} failed: {e}")
         finally:
-            # 清理临时 cookie 文件
-            if cookie_file:
-                try:
-                    import os
-                    os.remove(cookie_file)
-                    logger.debug(f"Cleaned up cookie file: {cookie_file}")
-                except PermissionError as e:
-                    logger.warning(f"Permission denied removing cookie file: {e}")
-                except FileNotFoundError:
-                    pass  # 文件已被删除，忽略
-                except Exception as e:
-                    logger.error(f"Failed to remove cookie file {cookie_file}: {e}")
-
-
-    async def extract_x_content(self, url: str) -> dict:
-        """提取 X 推文内容（视频或图片）
-
-        Args:
-            url: X/Twitter 推文链接
-
-        Returns:
-            包含内容的字典: {"type": "video"|"photos", "items": [...]}
+            self._refreshing.pop(cache_key, None)
+
+    def collect_metrics(self) -> None:
+        """把缓存和解析线程池的当前状态写入指标（输出 /metrics 前调用）"""
+        cache_stats = self.cache.stats()
+        metrics.CACHE_HIT_RATIO.set(cache_stats["hit_ratio"])
+        metrics.CACHE_SIZE.set(cache_stats["size"])
+        executor_stats = self.executor.stats()
+        metrics.EXECUTOR_SATURATION.set(self.executor.saturation)
+        metrics.EXECUTOR_IN_FLIGHT.set(executor_stats["in_flight"])
+        metrics.EXECUTOR_QUEUED.set(executor_stats["queued"])
+        metrics.EXECUTOR_REJECTED.set(executor_stats["rejected"])
+        breaker_stats = self.breaker.stats()
+        metrics.CIRCUIT_OPEN.set(1 if breaker_stats["state"] != "closed" else 0)
+        metrics.CIRCUIT_REJECTED.set(breaker_stats["rejected"])
+
+    async def close(self) -> None:
+        """取消后台刷新，释放网络连接，提交尚未写入的持久化数据"""
+        for task in list(self._refreshing.values()):
+            task.cancel()
+        if self._warm_up_task is not None:
+            self._warm_up_task.cancel()
+        if self.native:
+            await self.native.close()
+        if self.store:
+            await self.store.close()
+        if self.shared:
+            self.shared.close()
+
+    async def parse_x_video(self, url: str) -> VideoInfo | None:
+        """解析 X 视频链接，返回视频信息"""
+        result = await self.resolve(url)
+        return result.video
+
+    async def _extract_info(self, url: str) -> dict | None:
+        """使用 yt-dlp 提取推文信息，推文不存在或没有媒体时返回 None
+
+        Raises:
+            CircuitOpenError: X 连续出错，熔断中
+            ServiceUnavailableError: 解析队列已满
+            UpstreamError: 限流、认证失败、超时等提取失败
         """
-        if not is_x_video_url(url):
-            return {"type": "unknown", "items": []}
-
-        ydl_opts = {
-            "quiet": True,
-            "no_warnings": True,
-            "extract_flat": True,  # 支持转推
-        }
-
-        # 添加 Cookie 支持
-        cookie_file = None
-        if self.config:
-            cookie_file = self.config.get_twitter_cookie_file()
-            if cookie_file:
-                ydl_opts["cookiefile"] = cookie_file
-
-        info = None
+        self.breaker.before_call()
         try:
-            loop = asyncio.get_event_loop()
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = await loop.run_in_executor(
-                    None,
-                    ydl.extract_info,
-                    url,
-                    False,  # download=False
-                )
+            info = await self.executor.run(self._extract_info_sync, url)
+        except ServiceUnavailableError:
+            # 解析队列已满，请求没有到达 X
+            self.breaker.release()
+            raise
         except Exception as e:
-            logger.error(f"Error extracting content from {url}: {e}")
-        finally:
-            # 清理临时 cookie 文件
-            if cookie_file:
-                try:
-                    os.remove(cookie_file)
-                    logger.debug(f"Cleaned up cookie file: {cookie_file}")
-                except PermissionError as e:
-                    logger.warning(f"Permission denied removing cookie file: {e}")
-                except FileNotFoundError:
-                    pass  # 文件已被删除，忽略
-                except Exception as e:
-                    logger.error(f"Failed to remove cookie file {cookie_file}: {e}")
-
-        if not info:
-            return {"type": "unknown", "items": []}
-
-        # 优先检查是否有视频（通过 formats）
-        formats = info.get("formats", [])
-        has_video = any(f.get("vcodec") != "none" for f in formats if f.get("vcodec"))
-        if has_video or info.get("duration"):
-            return {"type": "video", "items": [info]}
-
-        # 检查是否有图片
-        thumbnails = info.get("thumbnails")
-        if thumbnails:
-            # 提取高质量图片
-            photos = []
-            seen_urls = set()
-            for thumb in thumbnails:
-                img_url = thumb.get("url")
-                if img_url and "?format=" not in img_url and img_url not in seen_urls:
-                    # 过滤掉小尺寸预览图，只保留原图
-                    if "orig" in img_url or "large" in img_url or "medium" in img_url:
-                        seen_urls.add(img_url)
-                        photos.append(PhotoInfo(
-                            url=img_url,
-                            width=thumb.get("width", 0),
-                            height=thumb.get("height", 0)
-                        ))
-                    if len(photos) >= 4:  # 最多4张图
-                        break
-
-            if photos:
-                return {"type": "photos", "items": photos}
-
-        return {"type": "unknown", "items": []}
+            kind = classify_error(e)
+            self.breaker.record_failure(kind)
+            if kind == ERROR_NOT_FOUND:
+                logger.info(f"No media at {url}: {e}")
+                return None
+            logger.error(f"Error extracting info from {url}: {e}", exc_info=True)
+            metrics.RESOLUTIONS.inc(source="ytdlp", result="error")
+            raise UpstreamError(str(e), kind) from e
+        except BaseException:
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        return info
+
+    def _extract_info_sync(self, url: str) -> dict | None:
+        """在工作线程中借出 YoutubeDL 实例并提取信息"""
+        account = self.accounts.acquire()
+        try:
+            with self.ydl_pool.checkout(YDL_OPTS, account.cookies if account else None) as ydl:
+                with metrics.STAGE_LATENCY.time(stage="extract_info"):
+                    info = ydl.extract_info(url, download=False)
+        except Exception as e:
+            if account:
+                self.accounts.report_failure(account, classify_error(e))
+            raise
 
+        if account:
+            self.accounts.report_success(account)
+        return info
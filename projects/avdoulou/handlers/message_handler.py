@@ -1,11 +1,22 @@
 # handlers/message_handler.py
+import asyncio
 import logging
+import time
 from telegram import Update
 from telegram.ext import ContextTypes
 from config import Config
-from handlers.link_handler import LinkHandler, PhotoInfo
-from utils.validators import is_x_video_url
-from utils.formatter import format_error_message
+from handlers.link_handler import LinkHandler, PhotoInfo, VideoInfo
+from handlers.video_uploader import VideoUploader
+from utils.validators import extract_tweet_id, extract_x_urls
+from utils import metrics
+from utils.exceptions import ServiceUnavailableError
+from utils.rate_limiter import TokenBucketLimiter
+from utils.shared_state import SharedTokenBucketLimiter
+from utils.formatter import format_error_message, format_multi_results, format_unavailable_message
+
+
+# 一条消息最多处理的推文链接数
+MAX_LINKS_PER_MESSAGE = 10
 
 
 class MessageHandler:
@@ -13,9 +24,26 @@ class MessageHandler:
 
     logger = logging.getLogger(__name__)
 
-    def __init__(self, config: Config | None = None):
+    def __init__(self, config: Config | None = None, link_handler: LinkHandler | None = None):
         self.config = config or Config()
-        self.link_handler = LinkHandler(self.config)
+        # webhook 模式下与 API 服务共用解析器，由 API 服务负责关闭
+        self._owns_link_handler = link_handler is None
+        self.link_handler = link_handler or LinkHandler(self.config)
+        # 每个用户一个令牌桶，按链接数消耗，webhook 挂在多进程 API 服务上时各进程共用；
+        # 容量至少为 MAX_LINKS_PER_MESSAGE，一条消息的链接可以一次提交
+        capacity = max(self.config.rate_limit_per_minute, MAX_LINKS_PER_MESSAGE)
+        if self.link_handler.shared:
+            self.rate_limiter = SharedTokenBucketLimiter(
+                self.link_handler.shared, self.config.rate_limit_per_minute, namespace="bot", capacity=capacity
+            )
+        else:
+            self.rate_limiter = TokenBucketLimiter(self.config.rate_limit_per_minute, capacity=capacity)
+        # 小于上传上限的视频直接发送文件，并按推文 ID 缓存 file_id
+        self.uploader = VideoUploader(
+            file_id_cache_size=self.config.file_id_cache_size,
+            hls_window=self.config.hls_window,
+            store=self.link_handler.store,
+        )
 
     def _check_whitelist(self, update: Update) -> bool:
         """检查用户是否在白名单中"""
@@ -39,7 +67,9 @@ class MessageHandler:
 
 支持的链接格式：
 • https://x.com/user/status/123456
-• https://twitter.com/user/status/123456"""
+• https://twitter.com/user/status/123456
+
+一条消息可以包含多个链接（最多 10 个）"""
 
         await update.message.reply_text(welcome_message)
 
@@ -57,7 +87,7 @@ class MessageHandler:
 • 只支持公开推文
 • 私密推文无法解析
 • 自动选择最高画质
-• 视频返回 MP4 直链
+• 50MB 以内的视频直接发送，更大的返回 MP4 直链
 • 图片返回原图链接
 
 如有问题请联系管理员。"""
@@ -65,49 +95,112 @@ class MessageHandler:
         await update.message.reply_text(help_message)
 
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        """处理普通消息"""
+        """处理普通消息，并记录处理结果和耗时"""
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            outcome = await self._process_message(update)
+        finally:
+            metrics.BOT_MESSAGES.inc(outcome=outcome)
+            metrics.BOT_LATENCY.observe(time.perf_counter() - start)
+
+    async def _process_message(self, update: Update) -> str:
+        """处理普通消息，返回处理结果（用于指标统计）"""
         if not self._check_whitelist(update):
             await update.message.reply_text("❌ 你没有权限使用此 Bot")
-            return
+            return "unauthorized"
 
         # 获取消息文本
         text = update.message.text
 
         if not text:
-            return
+            return "empty"
 
-        # 检查是否为 X 链接
-        if not is_x_video_url(text):
+        # 提取消息中的所有推文链接
+        urls = extract_x_urls(text)
+        if not urls:
             await update.message.reply_text(format_error_message("invalid_url"))
-            return
+            return "invalid_url"
+
+        # 检查频率限制（每个链接消耗一个令牌，与 /extract/batch 一致）
+        urls = urls[:MAX_LINKS_PER_MESSAGE]
+        allowed, retry_after = self.rate_limiter.check(update.effective_user.id, cost=len(urls))
+        if not allowed:
+            await update.message.reply_text(format_error_message("rate_limit"))
+            self.logger.info(f"Rate limited user_id {update.effective_user.id}, retry after {retry_after:.0f}s")
+            return "rate_limited"
+
+        if len(urls) == 1:
+            # 发送过的视频直接用 file_id 回复，不需要解析（解析缓存过期或 X 无法访问时同样可用）
+            tweet_id = extract_tweet_id(urls[0])
+            if tweet_id and await self._send_cached_video(update, tweet_id):
+                return "video"
 
         # 发送处理中消息
         processing_msg = await update.message.reply_text("⏳ 正在解析...")
 
+        if len(urls) > 1:
+            return await self._handle_multiple(update, processing_msg, urls)
+
+        url = urls[0]
         try:
-            # 先检查内容类型
-            content = await self.link_handler.extract_x_content(text)
+            # 一次解析同时得到内容类型和直链
+            result = await self.link_handler.resolve(url)
 
             await processing_msg.delete()
 
-            if content["type"] == "video":
+            if result.type == "video":
                 # 处理视频 - 返回直链
-                await self._handle_video(update, text)
-            elif content["type"] == "photos":
+                await self._handle_video(update, result.video, result.tweet_id)
+                return "video"
+            elif result.type == "photos":
                 # 处理图片 - 返回直链
-                await self._handle_photos(update, content["items"])
+                await self._handle_photos(update, result.photos)
+                return "photos"
             else:
                 await update.message.reply_text("❌ 该推文不包含视频或图片")
+                return "no_media"
 
+        except ServiceUnavailableError as e:
+            await processing_msg.delete()
+            await update.message.reply_text(format_unavailable_message(e))
+            self.logger.warning(f"Rejected {url[:50]}...: {e}")
+            return "busy"
         except Exception as e:
             await processing_msg.delete()
             await update.message.reply_text("❌ 处理失败，请稍后重试")
-            self.logger.error(f"Failed to handle {text[:50]}...: {e}", exc_info=True)
+            self.logger.error(f"Failed to handle {url[:50]}...: {e}", exc_info=True)
+            return "error"
+
+    async def _send_cached_video(self, update: Update, tweet_id: str) -> bool:
+        """用缓存的 file_id 发送视频，失败时返回 False 继续正常解析"""
+        try:
+            return await self.uploader.send_cached(update.message, tweet_id)
+        except Exception as e:
+            self.logger.warning(f"Sending cached video for {tweet_id} failed: {e}")
+            return False
 
-    async def _handle_video(self, update: Update, url: str) -> None:
-        """处理视频 - 返回直链"""
+    async def _handle_multiple(self, update: Update, processing_msg, urls: list[str]) -> str:
+        """并发解析多条推文，按原始顺序合并成一条回复"""
+        results = await asyncio.gather(
+            *(self.link_handler.resolve(url) for url in urls),
+            return_exceptions=True,
+        )
+        for url, result in zip(urls, results):
+            if isinstance(result, BaseException) and not isinstance(result, ServiceUnavailableError):
+                self.logger.error(f"Failed to handle {url[:50]}...: {result}", exc_info=result)
+
+        await processing_msg.delete()
+        for message in format_multi_results(list(zip(urls, results))):
+            await update.message.reply_text(message, disable_web_page_preview=True)
+        return "multiple"
+
+    async def _handle_video(self, update: Update, video_info: VideoInfo | None, tweet_id: str | None = None) -> None:
+        """处理视频 - 小于 50MB 直接发送视频，否则返回直链"""
         try:
-            video_info = await self.link_handler.parse_x_video(url)
+            if video_info and await self.uploader.send(update.message, video_info, tweet_id):
+                return
+
             if video_info:
                 message = f"""🎬 视频直链
 
@@ -124,6 +217,12 @@ class MessageHandler:
             await update.message.reply_text("❌ 处理失败，请稍后重试")
             self.logger.error(f"Failed to handle video: {e}", exc_info=True)
 
+    async def close(self) -> None:
+        """释放网络连接"""
+        await self.uploader.close()
+        if self._owns_link_handler:
+            await self.link_handler.close()
+
     async def _handle_photos(self, update: Update, photos: list[PhotoInfo]) -> None:
         """处理图片 - 返回直链"""
         try:
@@ -0,0 +1,61 @@
+"""解析结果数据结构。"""
+from dataclasses import asdict, dataclass, field
+
+
+@dataclass
+class VideoInfo:
+    """视频信息
+
+    url 为 HLS 视频流时，manifest_url 为主播放列表（包含单独的音频轨道）；thumbnail 为封面图
+    """
+    url: str
+    title: str
+    duration: int
+    width: int
+    height: int
+    manifest_url: str | None = None
+    thumbnail: str | None = None
+
+
+@dataclass
+class PhotoInfo:
+    """图片信息"""
+    url: str
+    width: int
+    height: int
+
+
+@dataclass
+class MediaResult:
+    """推文媒体解析结果
+
+    type 为 "video" 时 video 有值，为 "photos" 时 photos 非空，否则为 "unknown"；
+    expires_at 为媒体签名地址的过期时间（Unix 时间戳），地址不会过期时为 None
+    """
+    type: str
+    tweet_id: str | None = None
+    title: str = ""
+    uploader: str = ""
+    video: VideoInfo | None = None
+    photos: list[PhotoInfo] = field(default_factory=list)
+    expires_at: float | None = None
+
+    @property
+    def found(self) -> bool:
+        return self.type != "unknown"
+
+    def to_dict(self) -> dict:
+        """转换成可以 JSON 序列化的字典（用于持久化）"""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MediaResult":
+        """从 to_dict() 的结果还原"""
+        data = dict(data)
+        video = data.pop("video", None)
+        photos = data.pop("photos", None) or []
+        return cls(
+            **data,
+            video=VideoInfo(**video) if video else None,
+            photos=[PhotoInfo(**photo) for photo in photos],
+        )
@@ -0,0 +1,137 @@
+"""视频流转发（/stream/{tweet_id}）。
+
+替代 Cloudflare 上的 twitter-proxy-worker.js：把 video.twimg.com 的 MP4 按块转发给客户端，
+支持 Range / 206（播放器拖动进度条），不在内存中缓冲整个文件，每个流占用的内存约为一个块的大小。
+到 CDN 的连接通过同一个 aiohttp 连接池复用，同时转发的流数量有上限。
+"""
+import asyncio
+import logging
+
+import aiohttp
+from aiohttp import web
+
+from utils import metrics
+from utils.exceptions import StreamLimitError
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_STREAMS = 16
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# 转发给 CDN 的请求头
+FORWARD_REQUEST_HEADERS = ("Range", "If-Range", "If-None-Match", "If-Modified-Since")
+# 转发给客户端的响应头
+RELAY_RESPONSE_HEADERS = (
+    "Content-Type", "Content-Length", "Content-Range", "Accept-Ranges",
+    "ETag", "Last-Modified", "Cache-Control",
+)
+RELAY_STATUSES = (200, 206, 304, 416)
+# 签名地址过期或失效时 CDN 返回的状态码，调用方应重新解析
+EXPIRED_STATUSES = (403, 404, 410)
+
+
+class StreamProxy:
+    """带连接池和并发上限的视频流转发"""
+
+    def __init__(
+        self,
+        max_streams: int = DEFAULT_MAX_STREAMS,
+        timeout: float = DEFAULT_TIMEOUT,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        self.max_streams = max_streams
+        # 只限制连接和两次读取之间的间隔，长视频的总耗时不设上限
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+        self.chunk_size = chunk_size
+        self.active = 0
+        self.total = 0
+        self.rejected = 0
+        self._session: aiohttp.ClientSession | None = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # 会话需要在事件循环中创建，因此延迟到第一次请求
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_streams),
+                timeout=self.timeout,
+                headers={
+                    "User-Agent": "Mozilla/5.0 (compatible; avdoulou)",
+                    "Referer": "https://x.com/",
+                    # 原样转发字节，Content-Length / Content-Range 才能与正文一致
+                    "Accept-Encoding": "identity",
+                },
+                auto_decompress=False,
+            )
+        return self._session
+
+    async def relay(self, request: web.Request, url: str) -> web.StreamResponse | None:
+        """把 url 的内容转发给客户端
+
+        返回 None 表示上游地址已失效（403 / 404 / 410），调用方应重新解析后重试。
+
+        Raises:
+            StreamLimitError: 同时转发的流已达上限
+            web.HTTPBadGateway: 无法连接上游或上游返回其他错误
+        """
+        if self.active >= self.max_streams:
+            self.rejected += 1
+            raise StreamLimitError(f"{self.active} streams in progress", retry_after=5.0)
+
+        self.active += 1
+        self.total += 1
+        metrics.STREAMS_ACTIVE.set(self.active)
+        try:
+            return await self._relay(request, url)
+        finally:
+            self.active -= 1
+            metrics.STREAMS_ACTIVE.set(self.active)
+
+    async def _relay(self, request: web.Request, url: str) -> web.StreamResponse | None:
+        headers = {name: request.headers[name] for name in FORWARD_REQUEST_HEADERS if name in request.headers}
+        method = "HEAD" if request.method == "HEAD" else "GET"
+        try:
+            async with self._get_session().request(method, url, headers=headers) as upstream:
+                if upstream.status in EXPIRED_STATUSES:
+                    logger.info(f"Upstream returned HTTP {upstream.status} for {url[:80]}")
+                    return None
+                if upstream.status not in RELAY_STATUSES:
+                    raise web.HTTPBadGateway(text=f"upstream returned HTTP {upstream.status}")
+
+                response = web.StreamResponse(
+                    status=upstream.status,
+                    headers={name: upstream.headers[name]
+                             for name in RELAY_RESPONSE_HEADERS if name in upstream.headers},
+                )
+                response.headers.setdefault("Accept-Ranges", "bytes")
+                await response.prepare(request)
+                try:
+                    if method == "GET":
+                        async for chunk in upstream.content.iter_chunked(self.chunk_size):
+                            await response.write(chunk)
+                            metrics.STREAM_BYTES.inc(len(chunk))
+                    await response.write_eof()
+                except ConnectionResetError:
+                    # 客户端断开（关闭播放器、拖动进度条），释放上游连接即可
+                    logger.debug(f"Client disconnected while streaming {url[:80]}")
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    # 响应头已发出，只能中断连接让客户端感知到正文不完整
+                    logger.warning(f"Upstream failed while streaming {url[:80]}: {e}")
+                    response.force_close()
+                return response
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Streaming {url[:80]} failed: {e}")
+            raise web.HTTPBadGateway(text="upstream unavailable")
+
+    def stats(self) -> dict:
+        return {
+            'active': self.active,
+            'max_streams': self.max_streams,
+            'total': self.total,
+            'rejected': self.rejected,
+        }
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
@@ -0,0 +1,202 @@
+"""轻量的 X 媒体解析器（syndication 接口）。
+
+公开推文只有一个 MP4 或几张图片时，直接请求嵌入推文用的 syndication JSON 接口即可拿到媒体地址，
+不需要走 yt-dlp 的提取器匹配和多次 HTTP 跳转。解析器完全异步，复用同一个 aiohttp 连接池。
+
+任何“未命中”（请求失败、推文不存在、只有 HLS、需要登录等）都返回 None，由调用方回退到 yt-dlp。
+"""
+import asyncio
+import logging
+import math
+import re
+
+import aiohttp
+
+from handlers.models import MediaResult, PhotoInfo, VideoInfo
+from utils.url_expiry import parse_url_expiry
+
+
+logger = logging.getLogger(__name__)
+
+SYNDICATION_URL = "https://cdn.syndication.twimg.com/tweet-result"
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_CONNECTION_LIMIT = 32
+MAX_PHOTOS = 4
+
+_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+_RESOLUTION_PATTERN = re.compile(r"/(\d+)x(\d+)/")
+
+
+def _float_to_base36(value: float) -> str:
+    """与 JavaScript Number.prototype.toString(36) 结果一致的浮点数转换（仅正数）"""
+    integer = math.floor(value)
+    fraction = value - integer
+    # 与 V8 的 DoubleToRadixCString 相同：只输出足以唯一确定该浮点数的位数
+    delta = max(0.5 * (math.nextafter(value, math.inf) - value), math.nextafter(0.0, 1.0))
+
+    digits: list[int] = []
+    if fraction >= delta:
+        while True:
+            fraction *= 36
+            delta *= 36
+            digit = int(fraction)
+            digits.append(digit)
+            fraction -= digit
+            if fraction > 0.5 or (fraction == 0.5 and (digit & 1)):
+                if fraction + delta > 1:
+                    # 向上进位
+                    while True:
+                        if not digits:
+                            integer += 1
+                            break
+                        last = digits.pop()
+                        if last + 1 < 36:
+                            digits.append(last + 1)
+                            break
+                    break
+            if fraction < delta:
+                break
+
+    integer_digits = ""
+    while True:
+        integer, remainder = divmod(integer, 36)
+        integer_digits = _DIGITS[remainder] + integer_digits
+        if integer == 0:
+            break
+
+    if not digits:
+        return integer_digits
+    return integer_digits + "." + "".join(_DIGITS[d] for d in digits)
+
+
+def syndication_token(tweet_id: str) -> str:
+    """计算 syndication 接口需要的 token
+
+    等价于 JS: ((Number(id) / 1e15) * Math.PI).toString(36).replace(/(0+|\\.)/g, '')
+    """
+    value = (int(tweet_id) / 1e15) * math.pi
+    return re.sub(r"(0+|\.)", "", _float_to_base36(value))
+
+
+def _video_size(variant_url: str, media: dict) -> tuple[int, int]:
+    """从 MP4 地址（.../vid/avc1/1280x720/...）或 original_info 中获取分辨率"""
+    match = _RESOLUTION_PATTERN.search(variant_url)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    original = media.get("original_info") or {}
+    return original.get("width") or 0, original.get("height") or 0
+
+
+def parse_syndication_tweet(data: dict, tweet_id: str | None = None) -> MediaResult | None:
+    """把 syndication 接口返回的 JSON 转换成解析结果，没有可直接使用的媒体时返回 None"""
+    if not data or data.get("__typename") not in (None, "Tweet"):
+        return None
+
+    user = data.get("user") or {}
+    text = (data.get("text") or "").strip()
+    title = f"{user.get('name')} - {text}" if user.get("name") and text else (text or user.get("name") or "Unknown")
+    uploader = user.get("name") or ""
+    tweet_id = tweet_id or data.get("id_str")
+
+    media_details = data.get("mediaDetails") or []
+
+    for media in media_details:
+        if media.get("type") not in ("video", "animated_gif"):
+            continue
+        video_info = media.get("video_info") or {}
+        variants = [
+            v for v in video_info.get("variants") or []
+            if v.get("content_type") == "video/mp4" and v.get("url")
+        ]
+        if not variants:
+            return None  # 只有 HLS，交给 yt-dlp
+        best = max(variants, key=lambda v: v.get("bitrate") or 0)
+        width, height = _video_size(best["url"], media)
+        return MediaResult(
+            type="video",
+            tweet_id=tweet_id,
+            title=title,
+            uploader=uploader,
+            video=VideoInfo(
+                url=best["url"],
+                title=title,
+                duration=int((video_info.get("duration_millis") or 0) / 1000),
+                width=width,
+                height=height,
+                thumbnail=media.get("media_url_https"),
+            ),
+            expires_at=parse_url_expiry(best["url"]),
+        )
+
+    photos = []
+    for media in media_details:
+        if media.get("type") != "photo" or not media.get("media_url_https"):
+            continue
+        original = media.get("original_info") or {}
+        photos.append(PhotoInfo(
+            url=f"{media['media_url_https']}?name=orig",
+            width=original.get("width") or 0,
+            height=original.get("height") or 0,
+        ))
+        if len(photos) >= MAX_PHOTOS:
+            break
+
+    if photos:
+        return MediaResult(type="photos", tweet_id=tweet_id, title=title, uploader=uploader, photos=photos)
+    return None
+
+
+class SyndicationResolver:
+    """基于 syndication 接口的异步解析器"""
+
+    def __init__(
+        self,
+        base_url: str = SYNDICATION_URL,
+        timeout: float = DEFAULT_TIMEOUT,
+        connection_limit: int = DEFAULT_CONNECTION_LIMIT,
+    ):
+        self.base_url = base_url
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.connection_limit = connection_limit
+        self._session: aiohttp.ClientSession | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # 会话需要在事件循环中创建，因此延迟到第一次请求
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connection_limit),
+                timeout=self.timeout,
+                headers={"User-Agent": "Mozilla/5.0 (compatible; avdoulou)"},
+            )
+        return self._session
+
+    async def resolve(self, tweet_id: str) -> MediaResult | None:
+        """解析推文媒体，未命中时返回 None"""
+        params = {"id": tweet_id, "token": syndication_token(tweet_id), "lang": "en"}
+        try:
+            async with self._get_session().get(self.base_url, params=params) as resp:
+                if resp.status != 200:
+                    logger.debug(f"Syndication lookup for {tweet_id} returned HTTP {resp.status}")
+                    self.misses += 1
+                    return None
+                data = await resp.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.debug(f"Syndication lookup for {tweet_id} failed: {e}")
+            self.misses += 1
+            return None
+
+        result = parse_syndication_tweet(data, tweet_id) if isinstance(data, dict) else None
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses}
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
@@ -0,0 +1,152 @@
+"""Telegram Bot 的两种运行方式共用的部分。
+
+- TelegramBot：创建消息 / 内联查询处理器并注册到 Application，bot.py（轮询）和 server.py（webhook）共用
+- TelegramWebhook：把 Telegram 的更新推送挂到 API 服务的 aiohttp 应用上（设置 WEBHOOK_URL 时启用），
+  Bot 与 /parse、/extract 共用同一个 LinkHandler（缓存、解析线程池、YoutubeDL 实例池）
+
+webhook 请求只校验密钥、解析 JSON 后放入 Application 的更新队列就立即返回 200，
+处理结果通过 Bot API 发送，不在 webhook 响应中返回。
+
+两种方式都并发处理更新（最多 CONCURRENT_UPDATES 条）：python-telegram-bot 默认逐条处理，
+一个用户的视频下载和上传（最长数分钟）会阻塞其他所有用户。
+"""
+import hashlib
+import hmac
+import logging
+
+from aiohttp import web
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import Application, CommandHandler, InlineQueryHandler, MessageHandler, filters
+
+from config import Config
+from handlers.inline_handler import InlineHandler
+from handlers.link_handler import LinkHandler
+from handlers.message_handler import MessageHandler as MsgHandler
+
+
+logger = logging.getLogger(__name__)
+
+# Telegram 随每次推送发送的密钥请求头
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+# 同时处理的更新数；每个上传最多占用 50MB 内存
+CONCURRENT_UPDATES = 16
+
+
+class TelegramBot:
+    """Bot 处理器集合"""
+
+    def __init__(self, config: Config, link_handler: LinkHandler | None = None):
+        self.config = config
+        # 传入 link_handler 时与 API 服务共用解析器，否则由消息处理器自行创建
+        self.msg_handler = MsgHandler(config, link_handler=link_handler)
+        # 内联查询与私聊共用解析器、file_id 缓存和频率限制
+        self.inline_handler = InlineHandler(
+            config,
+            self.msg_handler.link_handler,
+            self.msg_handler.uploader,
+            self.msg_handler.rate_limiter,
+            debounce=config.inline_debounce_seconds,
+        )
+
+    def register(self, application: Application) -> None:
+        """注册命令、消息和内联查询处理器"""
+        application.add_handler(CommandHandler("start", self.msg_handler.start_command))
+        application.add_handler(CommandHandler("help", self.msg_handler.help_command))
+        application.add_handler(
+            MessageHandler(filters.TEXT & ~filters.COMMAND, self.msg_handler.handle_message)
+        )
+        # 内联查询只创建后台任务后立即返回，不阻塞其他更新
+        application.add_handler(InlineQueryHandler(self.inline_handler.handle_inline_query))
+
+    async def close(self) -> None:
+        await self.inline_handler.close()
+        await self.msg_handler.close()
+
+
+def webhook_secret(config: Config) -> str:
+    """webhook 密钥：未配置 WEBHOOK_SECRET 时由 BOT_TOKEN 派生，多个进程得到同一个值"""
+    if config.webhook_secret:
+        return config.webhook_secret
+    return hashlib.sha256(f"avdoulou-webhook:{config.bot_token}".encode()).hexdigest()
+
+
+class TelegramWebhook:
+    """挂在 aiohttp 应用上的 Telegram webhook"""
+
+    def __init__(self, config: Config, link_handler: LinkHandler, application: Application | None = None):
+        self.config = config
+        self.secret = webhook_secret(config)
+        self.bot = TelegramBot(config, link_handler)
+        # 更新由 webhook 推送，不需要 Updater
+        self.application = application or (
+            Application.builder()
+            .token(config.bot_token)
+            .updater(None)
+            .concurrent_updates(CONCURRENT_UPDATES)
+            .build()
+        )
+        self.bot.register(self.application)
+        self.received = 0
+        self.rejected = 0
+
+    @property
+    def url(self) -> str:
+        return self.config.webhook_url.rstrip("/") + self.config.webhook_path
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """接收 Telegram 推送的更新
+
+        POST {WEBHOOK_PATH}
+        """
+        token = request.headers.get(SECRET_TOKEN_HEADER, "")
+        if not hmac.compare_digest(token.encode(), self.secret.encode()):
+            self.rejected += 1
+            return web.Response(status=403)
+        if not self.application.running:
+            # 启动时连接 Telegram 失败；返回错误让 Telegram 稍后重发
+            return web.Response(status=503)
+
+        try:
+            data = await request.json()
+            update = Update.de_json(data, self.application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Invalid webhook update: {e}")
+            return web.Response(status=400)
+        if update is None:
+            return web.Response(status=400)
+
+        self.received += 1
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def on_startup(self, app: web.Application) -> None:
+        """载入持久化的 file_id，启动 Application 并向 Telegram 注册 webhook 地址"""
+        try:
+            await self.bot.msg_handler.uploader.restore()
+            await self.application.initialize()
+            await self.application.start()
+            await self.application.bot.set_webhook(
+                url=self.url,
+                secret_token=self.secret,
+                allowed_updates=Update.ALL_TYPES,
+            )
+        except TelegramError as e:
+            # 连接 Telegram 失败或地址被拒绝时 API 服务照常运行，修正配置后重启即可
+            logger.error(f"Setting Telegram webhook to {self.url} failed: {e}")
+            return
+        logger.info(f"Telegram webhook: {self.url}")
+
+    async def on_cleanup(self, app: web.Application) -> None:
+        """停止处理更新；不删除 webhook，重启期间 Telegram 会保留并重发未送达的更新"""
+        if self.application.running:
+            await self.application.stop()
+        await self.application.shutdown()
+        await self.bot.close()
+
+    def stats(self) -> dict:
+        return {
+            'received': self.received,
+            'rejected': self.rejected,
+            'queued': self.application.update_queue.qsize(),
+        }
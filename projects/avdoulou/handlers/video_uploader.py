@@ -0,0 +1,197 @@
+"""把视频直接发送到 Telegram。
+
+- 小于上传上限（Bot API 为 50MB）的 MP4 从 CDN 按块读入内存后调用 send_video，不写临时文件
+- 只有 HLS 的视频并发下载分片，需要 ffmpeg 合并音频，因此使用临时目录
+- 发送成功后记录 Telegram 返回的 file_id（按推文 ID），再次请求同一条推文时直接发送 file_id，
+  不需要重新下载和上传；调用方可以在解析前用 send_cached() 发送，不依赖解析结果
+- 超过上限或下载失败时返回 False，由调用方回复直链
+- 传入 ResolutionStore 时 file_id 同时写入持久化存储，重启后由 restore() 载入
+
+python-telegram-bot 上传前会把文件内容整个读入内存，因此这里同样先读入内存（上限即上传上限），
+边下边传并不能进一步降低内存占用。
+"""
+import asyncio
+import io
+import logging
+import tempfile
+from pathlib import Path
+
+import aiohttp
+from telegram import Message
+from telegram.error import BadRequest, TelegramError
+
+from handlers.models import VideoInfo
+from utils import metrics
+from utils.cache import TTLCache
+from utils.hls import DEFAULT_WINDOW, HLSError, HLSFetcher, is_hls_url
+from utils.store import ResolutionStore
+
+
+logger = logging.getLogger(__name__)
+
+# Bot API 上传文件大小上限
+TELEGRAM_UPLOAD_LIMIT = 50 * 1024 * 1024
+DEFAULT_FILE_ID_CACHE_SIZE = 2048
+# file_id 长期有效，只用缓存上限控制内存
+FILE_ID_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_TIMEOUT = 30.0
+CHUNK_SIZE = 256 * 1024
+# 上传大文件需要的时间远超 python-telegram-bot 默认的 20 秒写超时
+UPLOAD_TIMEOUT = 300
+
+
+class UploadSkippedError(Exception):
+    """视频无法直接上传（超过上传上限或下载失败）"""
+    pass
+
+
+class VideoUploader:
+    """下载视频并发送到 Telegram，缓存 file_id"""
+
+    def __init__(
+        self,
+        max_upload_bytes: int = TELEGRAM_UPLOAD_LIMIT,
+        file_id_cache_size: int = DEFAULT_FILE_ID_CACHE_SIZE,
+        hls_window: int = DEFAULT_WINDOW,
+        timeout: float = DEFAULT_TIMEOUT,
+        store: ResolutionStore | None = None,
+    ):
+        self.max_upload_bytes = max_upload_bytes
+        self.file_ids = TTLCache(maxsize=file_id_cache_size, ttl=FILE_ID_TTL_SECONDS)
+        self.store = store
+        self.hls_fetcher = HLSFetcher(window=hls_window, timeout=timeout)
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+        self._session: aiohttp.ClientSession | None = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # 会话需要在事件循环中创建，因此延迟到第一次请求
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=self.timeout,
+                headers={
+                    "User-Agent": "Mozilla/5.0 (compatible; avdoulou)",
+                    "Referer": "https://x.com/",
+                    "Accept-Encoding": "identity",
+                },
+                auto_decompress=False,
+            )
+        return self._session
+
+    async def send(self, message: Message, video: VideoInfo, tweet_id: str | None = None) -> bool:
+        """回复视频文件，成功返回 True；超过上传上限或下载失败返回 False"""
+        if tweet_id and await self.send_cached(message, tweet_id, video):
+            return True
+
+        try:
+            if is_hls_url(video.url):
+                sent = await self._send_hls(message, video)
+                source = "hls"
+            else:
+                data = await self.fetch(video.url)
+                sent = await self._reply_video(message, video, data, filename=f"{tweet_id or 'video'}.mp4")
+                source = "cdn"
+        except (UploadSkippedError, HLSError) as e:
+            logger.info(f"Not uploading {video.url[:80]}: {e}")
+            metrics.BOT_UPLOADS.inc(source="skipped")
+            return False
+        except TelegramError as e:
+            # 上传失败（超时、Telegram 拒绝等）时退回直链
+            logger.warning(f"Uploading {video.url[:80]} failed: {e}")
+            metrics.BOT_UPLOADS.inc(source="skipped")
+            return False
+
+        metrics.BOT_UPLOADS.inc(source=source)
+        self._remember(tweet_id, sent)
+        return True
+
+    async def send_cached(self, message: Message, tweet_id: str, video: VideoInfo | None = None) -> bool:
+        """用缓存的 file_id 发送，没有缓存或 file_id 失效（同时删除缓存）时返回 False
+
+        不传 video（尚未解析）时发送的视频不带标题。
+        """
+        file_id = self.file_ids.get(tweet_id)
+        if file_id is None:
+            return False
+        try:
+            await self._reply_video(message, video, file_id)
+        except BadRequest as e:
+            logger.info(f"Cached file_id for {tweet_id} rejected: {e}")
+            self.file_ids.delete(tweet_id)
+            if self.store:
+                self.store.delete_file_id(tweet_id)
+            return False
+        metrics.BOT_UPLOADS.inc(source="file_id")
+        return True
+
+    async def fetch(self, url: str) -> bytes:
+        """把视频读入内存
+
+        Raises:
+            UploadSkippedError: 超过上传上限（按 Content-Length 或实际读取的大小）或下载失败
+        """
+        try:
+            async with self._get_session().get(url) as resp:
+                if resp.status != 200:
+                    raise UploadSkippedError(f"HTTP {resp.status}")
+                if resp.content_length and resp.content_length > self.max_upload_bytes:
+                    raise UploadSkippedError(f"{resp.content_length} bytes")
+                # 写入 BytesIO 后用 getvalue() 取出，不复制整段数据（bytes(bytearray) 会使内存占用翻倍）
+                buffer = io.BytesIO()
+                async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                    buffer.write(chunk)
+                    if buffer.tell() > self.max_upload_bytes:
+                        raise UploadSkippedError(f"more than {self.max_upload_bytes} bytes")
+                return buffer.getvalue()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise UploadSkippedError(f"download failed: {e}") from e
+
+    async def _send_hls(self, message: Message, video: VideoInfo) -> Message:
+        """并发下载 HLS 分片后上传"""
+        with tempfile.TemporaryDirectory(prefix="avdoulou-hls-") as tmp_dir:
+            path = Path(tmp_dir) / "video.mp4"
+            await self.hls_fetcher.fetch(video.manifest_url or video.url, path, max_bytes=self.max_upload_bytes)
+            with open(path, "rb") as f:
+                return await self._reply_video(message, video, f)
+
+    @staticmethod
+    async def _reply_video(message: Message, video: VideoInfo | None, data, filename: str | None = None) -> Message:
+        if video is None:
+            return await message.reply_video(video=data, supports_streaming=True)
+        return await message.reply_video(
+            video=data,
+            caption=video.title[:1024],
+            duration=video.duration or None,
+            width=video.width or None,
+            height=video.height or None,
+            supports_streaming=True,
+            filename=filename,
+            write_timeout=UPLOAD_TIMEOUT,
+            read_timeout=UPLOAD_TIMEOUT,
+        )
+
+    def _remember(self, tweet_id: str | None, sent: Message | None) -> None:
+        if tweet_id and sent is not None and sent.video is not None:
+            self.file_ids.set(tweet_id, sent.video.file_id)
+            if self.store:
+                self.store.put_file_id(tweet_id, sent.video.file_id)
+
+    async def restore(self) -> int:
+        """从持久化存储载入最近的 file_id（启动时调用），返回载入的数量"""
+        if self.store is None or not self.file_ids.enabled:
+            return 0
+        try:
+            rows = await self.store.load_file_ids(self.file_ids.maxsize)
+        except Exception as e:
+            logger.warning(f"Loading stored file_ids failed: {e}")
+            return 0
+        # 按更新时间从旧到新写入，最近的条目在 LRU 中最晚被淘汰
+        for tweet_id, file_id in reversed(rows):
+            self.file_ids.set(tweet_id, file_id)
+        return len(rows)
+
+    def stats(self) -> dict:
+        return {'file_ids': self.file_ids.stats()}
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
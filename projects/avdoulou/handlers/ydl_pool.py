@@ -0,0 +1,176 @@
+"""可复用的 YoutubeDL 实例池。
+
+构造 YoutubeDL 需要解析参数、加载提取器、创建网络 opener，每次请求都新建开销不小。
+实例池按 (参数, Cookie 指纹) 分组缓存空闲实例，请求时借出、用完归还：
+
+- 实例使用 max_uses 次后关闭并重建，避免长期持有的状态越积越多
+- 提取出错的实例直接丢弃，不再放回池中
+- 每组最多保留 max_idle 个空闲实例，多出来的归还时直接关闭
+
+实例本身不是线程安全的，同一时间只会借给一个调用者。
+
+yt-dlp 在第一次创建实例时才导入，并且只注册 Twitter 相关的提取器，不加载完整的提取器列表；
+格式化消息、命令行脚本等用不到解析的场景不需要承担导入开销。
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Iterator
+
+from utils.cookies import CookieFile
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_IDLE = 4
+DEFAULT_MAX_USES = 50
+# 只注册这些提取器；其他提取器在被引用（url_result）时由 yt-dlp 按需加载
+TWITTER_EXTRACTORS = ("TwitterIE", "TwitterCardIE", "TwitterBroadcastIE", "TwitterShortenerIE", "TwitterAmplifyIE")
+
+
+@dataclass
+class _PooledYDL:
+    """池中的一个实例"""
+    key: Hashable
+    ydl: Any
+    uses: int = 0
+
+
+def load_extractors(names: tuple[str, ...] = TWITTER_EXTRACTORS) -> list[type]:
+    """导入 yt-dlp 并返回指定的提取器类（只有第一次调用需要导入）"""
+    from yt_dlp.extractor import twitter
+    return [getattr(twitter, name) for name in names]
+
+
+def create_youtube_dl(opts: dict, cookie_path: str | None = None):
+    """创建 YoutubeDL 实例
+
+    Cookie 在构造时一次性载入内存中的 cookiejar，随后移除 cookiefile 参数，
+    避免 close() 时把 cookie 写回共享的 Cookie 文件。
+    """
+    from yt_dlp import YoutubeDL
+
+    params = dict(opts)
+    if cookie_path:
+        params["cookiefile"] = cookie_path
+
+    # auto_init=False 不注册默认的提取器列表
+    ydl = YoutubeDL(params, auto_init=False)
+    for extractor in load_extractors():
+        ydl.add_info_extractor(extractor)
+    if cookie_path:
+        ydl.cookiejar  # noqa: B018 - 触发 cookiejar 加载
+        ydl.params.pop("cookiefile", None)
+    return ydl
+
+
+class YoutubeDLPool:
+    """YoutubeDL 实例池（线程安全）"""
+
+    def __init__(
+        self,
+        max_idle: int = DEFAULT_MAX_IDLE,
+        max_uses: int = DEFAULT_MAX_USES,
+        factory: Callable[[dict, str | None], Any] = create_youtube_dl,
+    ):
+        self.max_idle = max_idle
+        self.max_uses = max_uses
+        self._factory = factory
+        self._idle: dict[Hashable, list[_PooledYDL]] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.recycled = 0
+        self.discarded = 0
+
+    @staticmethod
+    def make_key(opts: dict, cookies: CookieFile | None = None) -> Hashable:
+        """分组键：参数 + Cookie 指纹（不直接使用 Cookie 内容）"""
+        return tuple(sorted(opts.items())), cookies.identity if cookies else None
+
+    @contextmanager
+    def checkout(self, opts: dict, cookies: CookieFile | None = None) -> Iterator[Any]:
+        """借出一个实例，退出上下文时自动归还；出现异常时丢弃该实例"""
+        entry = self._acquire(opts, cookies)
+        try:
+            yield entry.ydl
+        except BaseException:
+            self._discard(entry)
+            raise
+        else:
+            self._release(entry)
+
+    def warm_up(self, opts: dict, cookies: CookieFile | None = None, count: int | None = None) -> int:
+        """预先创建空闲实例，返回新建的数量"""
+        key = self.make_key(opts, cookies)
+        target = self.max_idle if count is None else min(count, self.max_idle)
+        created = 0
+        while True:
+            with self._lock:
+                if len(self._idle.get(key, [])) >= target:
+                    break
+            entry = self._create(key, opts, cookies)
+            with self._lock:
+                self._idle.setdefault(key, []).append(entry)
+            created += 1
+        return created
+
+    def clear(self) -> None:
+        """关闭所有空闲实例（例如 Cookie 轮换后）"""
+        with self._lock:
+            entries = [entry for entries in self._idle.values() for entry in entries]
+            self._idle.clear()
+        for entry in entries:
+            self._close(entry)
+
+    def stats(self) -> dict:
+        with self._lock:
+            idle = sum(len(entries) for entries in self._idle.values())
+        return {
+            'idle': idle,
+            'created': self.created,
+            'reused': self.reused,
+            'recycled': self.recycled,
+            'discarded': self.discarded,
+        }
+
+    def _acquire(self, opts: dict, cookies: CookieFile | None) -> _PooledYDL:
+        key = self.make_key(opts, cookies)
+        with self._lock:
+            entries = self._idle.get(key)
+            if entries:
+                self.reused += 1
+                return entries.pop()
+        return self._create(key, opts, cookies)
+
+    def _release(self, entry: _PooledYDL) -> None:
+        entry.uses += 1
+        if entry.uses >= self.max_uses:
+            self.recycled += 1
+            self._close(entry)
+            return
+
+        with self._lock:
+            entries = self._idle.setdefault(entry.key, [])
+            if len(entries) < self.max_idle:
+                entries.append(entry)
+                return
+        self._close(entry)
+
+    def _discard(self, entry: _PooledYDL) -> None:
+        self.discarded += 1
+        self._close(entry)
+
+    def _create(self, key: Hashable, opts: dict, cookies: CookieFile | None) -> _PooledYDL:
+        ydl = self._factory(opts, cookies.path() if cookies else None)
+        with self._lock:
+            self.created += 1
+        return _PooledYDL(key=key, ydl=ydl)
+
+    @staticmethod
+    def _close(entry: _PooledYDL) -> None:
+        try:
+            entry.ydl.close()
+        except Exception as e:
+            logger.warning(f"Failed to close YoutubeDL instance: {e}")
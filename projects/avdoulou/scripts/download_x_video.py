@@ -5,15 +5,27 @@ X/Twitter 视频下载脚本
 使用方法:
     python3 scripts/download_x_video.py <推文链接>
     python3 scripts/download_x_video.py <推文链接> --output /path/to/save
+    python3 scripts/download_x_video.py <推文链接> --segments 8
+    python3 scripts/download_x_video.py --batch urls.txt --output /data/archive
 
 示例:
     python3 scripts/download_x_video.py https://x.com/user/status/123456
     python3 scripts/download_x_video.py https://x.com/user/status/123456 --output ~/Downloads
+    cat bookmarks.txt | python3 scripts/download_x_video.py --batch - -o /data/archive --concurrency 8
+
+MP4 直链默认分 4 段并发下载，中断后重新运行同一命令会从上次的位置继续；
+只有 HLS（m3u8）的视频并发下载分片后合并；--segments 0 改用 yt-dlp 下载。
+
+批量模式（--batch）不会交互提问：文件保存为 <推文 ID>.mp4，已下载、没有视频或已删除的推文
+记录在清单（默认 <输出目录>/manifest.jsonl）中，下次运行时跳过；每条推文的结果写入 JSONL 报告。
+适合放在 cron 中定时归档：有推文解析或下载失败（包括 X 无法访问）时退出码为 1。
 """
 import argparse
 import asyncio
 import os
 import sys
+import time
+from collections import Counter
 from pathlib import Path
 
 # 添加项目根目录到路径
@@ -21,9 +33,61 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import Config
 from handlers.link_handler import LinkHandler
+from utils.archive import DEFAULT_CONCURRENCY, STATUS_ERROR, Manifest, read_urls, run_batch
+from utils.downloader import DEFAULT_SEGMENTS, DownloadError, SegmentedDownloader
+from utils.exceptions import ServiceUnavailableError, UpstreamError
+from utils.hls import HLSError, HLSFetcher, is_hls_url
+
+
+def _print_progress(downloaded: int, total: int) -> None:
+    if total:
+        print(f"\r   {downloaded / total:6.1%}  {downloaded / 1048576:.1f}/{total / 1048576:.1f} MB", end="", flush=True)
+    else:
+        print(f"\r   {downloaded / 1048576:.1f} MB", end="", flush=True)
+
+
+async def download_segmented(video_url: str, full_path: Path, segments: int) -> bool:
+    """分段并发下载 MP4 直链"""
+    part_state = full_path.with_name(full_path.name + '.part.json')
+    if part_state.exists():
+        print("♻️  发现未完成的下载，继续下载")
+
+    try:
+        size = await SegmentedDownloader(segments=segments).download(video_url, full_path, _print_progress)
+    except DownloadError as e:
+        print()
+        print(f"❌ 下载失败: {e}")
+        print("💡 重新运行相同命令可继续下载")
+        return False
+
+    print()
+    print("✅ 下载完成!")
+    print(f"📁 文件位置: {full_path}")
+    print(f"📊 文件大小: {size / (1024 * 1024):.2f} MB")
+    return True
+
 
+async def download_hls(video_info, full_path: Path, window: int) -> bool | None:
+    """并发下载 HLS 分片；播放列表不受支持时返回 None，由调用方改用 yt-dlp"""
+    def progress(done: int, total: int) -> None:
+        print(f"\r   {done}/{total} 个分片", end="", flush=True)
+
+    try:
+        await HLSFetcher(window=window).fetch(video_info.manifest_url or video_info.url, full_path, progress)
+    except HLSError as e:
+        print()
+        print(f"⚠️  HLS 下载失败，改用 yt-dlp: {e}")
+        return None
 
-async def download_video(url: str, output_dir: str = None):
+    print()
+    print("✅ 下载完成!")
+    print(f"📁 文件位置: {full_path}")
+    print(f"📊 文件大小: {full_path.stat().st_size / (1024 * 1024):.2f} MB")
+    return True
+
+
+async def download_video(url: str, output_dir: str = None, segments: int = DEFAULT_SEGMENTS,
+                         overwrite: bool = False):
     """下载 X 视频"""
     config = Config()
     handler = LinkHandler(config)
@@ -31,8 +95,15 @@ async def download_video(url: str, output_dir: str = None):
     print(f"🔍 正在解析: {url}")
     print("-" * 60)
 
-    # 解析视频信息
-    video_info = await handler.parse_x_video(url)
+    # 解析视频信息，解析完成后即可释放解析线程池和 syndication 连接
+    try:
+        video_info = await handler.parse_x_video(url)
+    except (UpstreamError, ServiceUnavailableError) as e:
+        print(f"❌ 解析失败，请稍后重试: {e}")
+        return False
+    finally:
+        await handler.close()
+        handler.executor.shutdown()
 
     if not video_info:
         print("❌ 未找到视频，可能是一条纯文字推文")
@@ -60,8 +131,11 @@ async def download_video(url: str, output_dir: str = None):
     filename = f"{safe_title}.mp4"
     full_path = output_path / filename
 
-    # 检查文件是否已存在
-    if full_path.exists():
+    # 检查文件是否已存在（非交互环境中不提问，直接跳过）
+    if full_path.exists() and not overwrite:
+        if not sys.stdin.isatty():
+            print(f"❌ 文件已存在: {full_path}（使用 --overwrite 覆盖）")
+            return False
         response = input(f"⚠️  文件已存在: {full_path}\n是否覆盖? (y/N): ")
         if response.lower() != 'y':
             print("❌ 取消下载")
@@ -71,6 +145,14 @@ async def download_video(url: str, output_dir: str = None):
     print(f"📥 正在下载到: {full_path}")
     print()
 
+    # MP4 直链分段下载，HLS 并发下载分片；--segments 0 或失败时交给 yt-dlp
+    if segments > 0 and is_hls_url(video_info.url):
+        success = await download_hls(video_info, full_path, config.hls_window)
+        if success is not None:
+            return success
+    elif segments > 0:
+        return await download_segmented(video_info.url, full_path, segments)
+
     try:
         import yt_dlp
 
@@ -133,6 +215,120 @@ async def download_video(url: str, output_dir: str = None):
         return False
 
 
+def ytdlp_download(video_url: str, target: Path, cookie_file: str | None) -> Path:
+    """用 yt-dlp 下载（HLS 等非 MP4 直链），返回实际保存的文件"""
+    import yt_dlp
+
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'noprogress': True,
+        'outtmpl': f'{target.with_suffix("")}.%(ext)s',
+        'merge_output_format': 'mp4',
+        'overwrite': True,
+    }
+    if cookie_file:
+        ydl_opts['cookiefile'] = cookie_file
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        ydl.download([video_url])
+
+    if target.exists():
+        return target
+    for candidate in sorted(target.parent.glob(f"{target.stem}.*")):
+        if not candidate.name.endswith(('.part', '.part.json', '.ytdl')):
+            return candidate
+    raise DownloadError(f"yt-dlp did not produce {target}")
+
+
+STATUS_ICONS = {
+    "downloaded": "✅",
+    "skipped": "⏭️ ",
+    "exists": "📁",
+    "no_video": "➖",
+    "not_found": "🚫",
+    "error": "❌",
+}
+
+
+async def download_batch(
+    source: str,
+    output_dir: str = None,
+    segments: int = DEFAULT_SEGMENTS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    manifest_path: str = None,
+    report_path: str = None,
+    overwrite: bool = False,
+) -> bool:
+    """批量下载，链接从文件或标准输入（-）读取；没有解析或下载失败的推文时返回 True"""
+    if source == '-':
+        entries, invalid = read_urls(sys.stdin)
+    else:
+        with open(source, encoding='utf-8') as f:
+            entries, invalid = read_urls(f)
+    for line in invalid:
+        print(f"⚠️  跳过无效链接: {line}", file=sys.stderr)
+
+    output_path = Path(output_dir) if output_dir else Path.home() / "Downloads"
+    output_path.mkdir(parents=True, exist_ok=True)
+    manifest = Manifest(manifest_path or output_path / "manifest.jsonl")
+    report_file = Path(report_path) if report_path else \
+        output_path / f"archive-report-{time.strftime('%Y%m%d-%H%M%S')}.jsonl"
+
+    pending = sum(1 for entry in entries if entry.tweet_id not in manifest)
+    print(f"📋 共 {len(entries)} 条推文，{len(entries) - pending} 条已在清单中，{pending} 条待处理")
+
+    config = Config()
+    handler = LinkHandler(config)
+    downloader = SegmentedDownloader(segments=segments) if segments > 0 else None
+    hls_fetcher = HLSFetcher(window=config.hls_window) if segments > 0 else None
+    cookie_file = config.get_twitter_cookie_file()
+    loop = asyncio.get_running_loop()
+
+    async def download(video, target: Path) -> Path:
+        if hls_fetcher and is_hls_url(video.url):
+            try:
+                return await hls_fetcher.fetch(video.manifest_url or video.url, target)
+            except HLSError as e:
+                print(f"⚠️  {target.stem}: HLS 下载失败，改用 yt-dlp: {e}")
+        elif downloader:
+            await downloader.download(video.url, target)
+            return target
+        return await loop.run_in_executor(None, ytdlp_download, video.url, target, cookie_file)
+
+    def on_result(result) -> None:
+        detail = result.error or result.file or ""
+        print(f"{STATUS_ICONS.get(result.status, '•')} {result.tweet_id} {result.status} {detail}")
+
+    try:
+        with open(report_file, 'a', encoding='utf-8') as report:
+            results = await run_batch(
+                entries,
+                resolve=handler.resolve,
+                download=download,
+                output_dir=output_path,
+                manifest=manifest,
+                report=report,
+                concurrency=concurrency,
+                overwrite=overwrite,
+                on_result=on_result,
+            )
+    finally:
+        await handler.close()
+        handler.executor.shutdown()
+        if cookie_file:
+            try:
+                os.remove(cookie_file)
+            except OSError:
+                pass
+
+    counts = Counter(result.status for result in results)
+    print("-" * 60)
+    print("📊 " + "，".join(f"{status}: {count}" for status, count in sorted(counts.items())))
+    print(f"📝 报告: {report_file}")
+    return counts[STATUS_ERROR] == 0 and not invalid
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="下载 X/Twitter 视频到本地",
@@ -142,10 +338,14 @@ def main():
   %(prog)s https://x.com/user/status/123456
   %(prog)s https://x.com/user/status/123456 --output ~/Downloads
   %(prog)s https://twitter.com/user/status/123456 -o /tmp
+  %(prog)s https://x.com/user/status/123456 --segments 8
+  %(prog)s --batch bookmarks.txt -o /data/archive --concurrency 8
+  cat bookmarks.txt | %(prog)s --batch - -o /data/archive
         """
     )
     parser.add_argument(
         "url",
+        nargs="?",
         help="X/Twitter 推文链接"
     )
     parser.add_argument(
@@ -154,10 +354,50 @@ def main():
         default=None
     )
 
+    parser.add_argument(
+        "-s", "--segments",
+        type=int,
+        default=DEFAULT_SEGMENTS,
+        help=f"并发下载的分段数，0 表示使用 yt-dlp（默认: {DEFAULT_SEGMENTS}）"
+    )
+
+    parser.add_argument(
+        "-b", "--batch",
+        metavar="FILE",
+        help="批量模式：从文件读取链接（每行一个，- 表示标准输入）"
+    )
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"批量模式同时处理的推文数（默认: {DEFAULT_CONCURRENCY}）"
+    )
+    parser.add_argument(
+        "--manifest",
+        help="批量模式的已下载清单（默认: <输出目录>/manifest.jsonl）"
+    )
+    parser.add_argument(
+        "--report",
+        help="批量模式的 JSONL 报告（默认: <输出目录>/archive-report-<时间>.jsonl）"
+    )
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="覆盖已存在的文件，不再询问"
+    )
+
     args = parser.parse_args()
+    if bool(args.url) == bool(args.batch):
+        parser.error("需要提供推文链接或 --batch 其中之一")
 
     # 运行下载
-    success = asyncio.run(download_video(args.url, args.output))
+    if args.batch:
+        success = asyncio.run(download_batch(
+            args.batch, args.output, args.segments, args.concurrency,
+            args.manifest, args.report, args.overwrite,
+        ))
+    else:
+        success = asyncio.run(download_video(args.url, args.output, args.segments, args.overwrite))
     sys.exit(0 if success else 1)
 
 
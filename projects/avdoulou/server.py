@@ -4,14 +4,29 @@ X 视频解析 API 服务
 
 为 iOS 快捷指令提供简单的 HTTP API
 """
+import asyncio
+import ipaddress
+import json
 import logging
+import math
+import multiprocessing
+import os
+import signal
+import socket
+import tempfile
+import time
 import argparse
 
 from aiohttp import web
 from aiohttp.web import Request, Response
 
 from config import Config
-from handlers.link_handler import LinkHandler
+from handlers.link_handler import LinkHandler, MediaResult
+from handlers.stream_proxy import StreamProxy
+from utils import metrics
+from utils.exceptions import CircuitOpenError, ServiceUnavailableError, UpstreamError
+from utils.rate_limiter import TokenBucketLimiter
+from utils.shared_state import SharedTokenBucketLimiter
 
 
 # 配置日志
@@ -22,12 +37,55 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# 提取失败时的错误信息
+UPSTREAM_ERROR = '解析失败，X 暂时无法访问或 Cookie 已失效，请稍后重试'
+
+
+def unavailable_error(e: ServiceUnavailableError) -> str:
+    """503 响应中的错误信息"""
+    if isinstance(e, CircuitOpenError):
+        return 'X 暂时限制了访问，请稍后重试'
+    return '服务繁忙，请稍后重试'
+
+
+def _is_loopback(address: str | None) -> bool:
+    try:
+        return address is not None and ipaddress.ip_address(address).is_loopback
+    except ValueError:
+        return False
+
+
 class VideoAPI:
     """视频解析 API"""
 
     def __init__(self):
         self.config = Config()
         self.handler = LinkHandler(self.config)
+        # 每个客户端 IP 一个令牌桶，多进程模式下各进程共用
+        self.rate_limiter = self._make_limiter(self.config.rate_limit_per_minute, "api")
+        # /extract/batch 按链接数消耗单独的令牌桶，最多一次提交 BATCH_MAX_URLS 个
+        self.batch_rate_limiter = self._make_limiter(
+            self.config.batch_urls_per_minute, "batch",
+            capacity=max(self.config.batch_urls_per_minute, self.config.batch_max_urls),
+        )
+        # /stream 视频转发
+        self.stream_proxy = StreamProxy(
+            max_streams=self.config.stream_max_concurrent,
+            timeout=self.config.stream_timeout,
+        )
+        # Telegram webhook（设置 WEBHOOK_URL 时启用），Bot 与 API 共用同一个 LinkHandler
+        self.webhook = None
+        if self.config.webhook_url:
+            # 只在启用时导入，纯 API 部署不加载 python-telegram-bot
+            from handlers.telegram_bot import TelegramWebhook
+            self.webhook = TelegramWebhook(self.config, self.handler)
+            if not self.config.get_allowed_user_ids():
+                logger.warning("ALLOWED_USER_IDS 为空，Bot 不会响应任何用户")
+
+    def _make_limiter(self, rate_per_minute: int, namespace: str, capacity: float | None = None):
+        if self.handler.shared:
+            return SharedTokenBucketLimiter(self.handler.shared, rate_per_minute, namespace, capacity=capacity)
+        return TokenBucketLimiter(rate_per_minute, capacity=capacity)
 
     async def parse(self, request: Request) -> Response:
         """解析视频 API
@@ -35,6 +93,10 @@ class VideoAPI:
         POST /parse
         Body: {"url": "https://x.com/user/status/123456"}
         """
+        limited = self._check_rate_limit(request)
+        if limited is not None:
+            return limited
+
         try:
             data = await request.json()
             url = data.get('url', '')
@@ -48,7 +110,8 @@ class VideoAPI:
             logger.info(f"解析请求: {url}")
 
             # 解析视频
-            video_info = await self.handler.parse_x_video(url)
+            result = await self.handler.resolve(url)
+            video_info = result.video
 
             if not video_info:
                 return web.json_response(
@@ -56,18 +119,23 @@ class VideoAPI:
                     status=404
                 )
 
-            return web.json_response({
-                'success': True,
-                'data': {
-                    'title': video_info.title,
-                    'duration': video_info.duration,
-                    'width': video_info.width,
-                    'height': video_info.height,
-                    'url': video_info.url,
-                    'original_url': url
-                }
-            })
-
+            with metrics.STAGE_LATENCY.time(stage="serialize"):
+                return web.json_response({
+                    'success': True,
+                    'data': {
+                        'title': video_info.title,
+                        'duration': video_info.duration,
+                        'width': video_info.width,
+                        'height': video_info.height,
+                        'url': video_info.url,
+                        'original_url': url
+                    }
+                })
+
+        except ServiceUnavailableError as e:
+            return self._unavailable_response(e)
+        except UpstreamError as e:
+            return self._upstream_response(e)
         except Exception as e:
             logger.error(f"解析失败: {e}", exc_info=True)
             return web.json_response(
@@ -80,6 +148,10 @@ class VideoAPI:
 
         GET /extract?url=https://x.com/user/status/123456
         """
+        limited = self._check_rate_limit(request)
+        if limited is not None:
+            return limited
+
         try:
             url = request.query.get('url', '')
 
@@ -92,39 +164,21 @@ class VideoAPI:
             logger.info(f"提取请求: {url}")
 
             # 提取内容
-            content = await self.handler.extract_x_content(url)
+            content = await self.handler.resolve(url)
 
-            if content['type'] == 'unknown':
+            if not content.found:
                 return web.json_response(
                     {'error': '未找到媒体内容'},
                     status=404
                 )
 
-            result = {
-                'success': True,
-                'type': content['type'],
-                'original_url': url
-            }
-
-            if content['type'] == 'video':
-                item = content['items'][0]
-                # 从 yt-dlp 返回的数据中提取 URL
-                video_url = item.get('url') or item.get('webpage_url', '')
-                result['video'] = {
-                    'title': item.get('title', ''),
-                    'url': video_url,
-                    'duration': item.get('duration', 0),
-                    'width': item.get('width', 0),
-                    'height': item.get('height', 0)
-                }
-            elif content['type'] == 'photos':
-                result['photos'] = [
-                    {'url': photo.url, 'width': photo.width, 'height': photo.height}
-                    for photo in content['items']
-                ]
-
-            return web.json_response(result)
+            with metrics.STAGE_LATENCY.time(stage="serialize"):
+                return web.json_response(self._serialize_content(content, url))
 
+        except ServiceUnavailableError as e:
+            return self._unavailable_response(e)
+        except UpstreamError as e:
+            return self._upstream_response(e)
         except Exception as e:
             logger.error(f"提取失败: {e}", exc_info=True)
             return web.json_response(
@@ -132,38 +186,419 @@ class VideoAPI:
                 status=500
             )
 
+    async def extract_batch(self, request: Request) -> web.StreamResponse:
+        """批量提取 API，以 NDJSON 流式返回
+
+        POST /extract/batch
+        Body: {"urls": ["https://x.com/user/status/1", ...]}
+
+        每个链接解析完成后立即输出一行 JSON（带 index 表示在请求中的位置），
+        完成顺序与请求顺序无关。并发数不超过解析线程数；每个链接消耗批量令牌桶中的一个令牌。
+        """
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        urls = data.get('urls') if isinstance(data, dict) else None
+        if not isinstance(urls, list) or not urls or not all(isinstance(u, str) for u in urls):
+            return web.json_response(
+                {'error': 'urls 必须是非空的链接数组'},
+                status=400
+            )
+        if len(urls) > self.config.batch_max_urls:
+            return web.json_response(
+                {'error': f'一次最多提交 {self.config.batch_max_urls} 个链接'},
+                status=400
+            )
+        limited = self._check_rate_limit(request, self.batch_rate_limiter, cost=len(urls))
+        if limited is not None:
+            return limited
+
+        logger.info(f"批量提取请求: {len(urls)} 个链接")
+
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson; charset=utf-8'})
+        await response.prepare(request)
+
+        semaphore = asyncio.Semaphore(self.handler.executor.max_workers)
+        tasks = [
+            asyncio.ensure_future(self._extract_batch_item(semaphore, index, url))
+            for index, url in enumerate(urls)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                with metrics.STAGE_LATENCY.time(stage="serialize"):
+                    chunk = json.dumps(line, ensure_ascii=False).encode('utf-8') + b'\n'
+                await response.write(chunk)
+            await response.write_eof()
+        finally:
+            # 客户端提前断开时取消尚未完成的解析
+            for task in tasks:
+                task.cancel()
+
+        return response
+
+    async def _extract_batch_item(self, semaphore: asyncio.Semaphore, index: int, url: str) -> dict:
+        """解析批量请求中的一个链接，错误也以一行结果返回"""
+        async with semaphore:
+            try:
+                content = await self.handler.resolve(url)
+            except ServiceUnavailableError as e:
+                return {'index': index, 'original_url': url, 'success': False,
+                        'status': 503, 'error': unavailable_error(e), 'retry_after': math.ceil(e.retry_after)}
+            except UpstreamError as e:
+                return {'index': index, 'original_url': url, 'success': False,
+                        'status': 502, 'error': UPSTREAM_ERROR, 'kind': e.kind}
+            except Exception as e:
+                logger.error(f"批量提取失败 {url}: {e}", exc_info=True)
+                return {'index': index, 'original_url': url, 'success': False,
+                        'status': 500, 'error': str(e)}
+
+        if not content.found:
+            return {'index': index, 'original_url': url, 'success': False,
+                    'status': 404, 'error': '未找到媒体内容'}
+        return {'index': index, **self._serialize_content(content, url)}
+
+    async def stream(self, request: Request) -> web.StreamResponse:
+        """转发推文视频（支持 Range），用于无法直接访问 video.twimg.com 的客户端
+
+        GET /stream/{tweet_id}
+
+        播放器拖动进度时会发出大量 Range 请求，因此不计入频率限制；
+        解析结果走缓存，并发流数量由 STREAM_MAX_CONCURRENT 限制。
+        """
+        tweet_id = request.match_info['tweet_id']
+        url = f'https://x.com/i/status/{tweet_id}'
+
+        # 签名地址失效时删除缓存重新解析一次
+        for _ in range(2):
+            try:
+                content = await self.handler.resolve(url)
+            except ServiceUnavailableError as e:
+                return self._unavailable_response(e)
+            except UpstreamError as e:
+                return self._upstream_response(e)
+
+            if content.type != 'video':
+                return web.json_response(
+                    {'error': '未找到视频'},
+                    status=404
+                )
+
+            try:
+                response = await self.stream_proxy.relay(request, content.video.url)
+            except ServiceUnavailableError as e:
+                return self._unavailable_response(e)
+            if response is not None:
+                return response
+
+            logger.info(f"视频地址已失效，重新解析: {tweet_id}")
+            await self.handler.invalidate(tweet_id)
+
+        return web.json_response(
+            {'error': '视频地址不可用'},
+            status=502
+        )
+
+    def _client_ip(self, request: Request) -> str:
+        """客户端 IP：请求来自本机（同一台机器上的 nginx）或 TRUST_PROXY_HEADERS=true 时读取 X-Real-IP"""
+        if self.config.trust_proxy_headers or _is_loopback(request.remote):
+            real_ip = request.headers.get('X-Real-IP')
+            if real_ip:
+                return real_ip.strip()
+            forwarded = request.headers.get('X-Forwarded-For')
+            if forwarded:
+                return forwarded.split(',')[0].strip()
+        return request.remote or 'unknown'
+
+    def _check_rate_limit(self, request: Request, limiter=None, cost: float = 1.0) -> Response | None:
+        """超过频率限制时返回 429 响应，否则返回 None"""
+        client_ip = self._client_ip(request)
+        if limiter is None:
+            limiter = self.rate_limiter
+        allowed, retry_after = limiter.check(client_ip, cost)
+        if allowed:
+            return None
+
+        logger.info(f"限流: {client_ip}，{retry_after:.0f} 秒后重试")
+        return web.json_response(
+            {'error': '请求过于频繁，请稍后再试'},
+            status=429,
+            headers={'Retry-After': str(math.ceil(retry_after))}
+        )
+
+    @staticmethod
+    def _upstream_response(e: UpstreamError) -> Response:
+        """提取失败（X 限流、Cookie 失效、超时等）时返回 502，与“未找到视频”的 404 区分"""
+        return web.json_response(
+            {'error': UPSTREAM_ERROR, 'kind': e.kind},
+            status=502
+        )
+
+    @staticmethod
+    def _unavailable_response(e: ServiceUnavailableError) -> Response:
+        """解析服务繁忙或 X 熔断时快速返回 503"""
+        logger.warning(f"拒绝请求: {e}")
+        return web.json_response(
+            {'error': unavailable_error(e)},
+            status=503,
+            headers={'Retry-After': str(math.ceil(e.retry_after))}
+        )
+
+    @staticmethod
+    def _serialize_content(content: MediaResult, url: str) -> dict:
+        """把解析结果转换成 /extract 的响应格式"""
+        result = {
+            'success': True,
+            'type': content.type,
+            'original_url': url
+        }
+
+        if content.type == 'video':
+            video = content.video
+            result['video'] = {
+                'title': video.title,
+                'url': video.url,
+                'duration': video.duration,
+                'width': video.width,
+                'height': video.height
+            }
+        elif content.type == 'photos':
+            result['photos'] = [
+                {'url': photo.url, 'width': photo.width, 'height': photo.height}
+                for photo in content.photos
+            ]
+
+        return result
+
+    async def on_startup(self, app: web.Application) -> None:
+        """注册 SIGHUP 重新加载 Cookie，载入持久化的热门条目，并在后台预热 YoutubeDL 实例池
+
+        预热（包括导入 yt-dlp）不阻塞启动，服务立即开始监听，健康检查不用等待 yt-dlp 加载完成。
+        """
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, self.reload_cookie)
+        except (NotImplementedError, AttributeError, RuntimeError):
+            pass  # Windows 或非主线程不支持
+        await self.handler.restore()
+        self.handler.start_warm_up()
+        if self.webhook is not None:
+            await self.webhook.on_startup(app)
+
+    async def on_cleanup(self, app: web.Application) -> None:
+        """停止处理 Telegram 更新，关闭解析线程池、网络连接并删除 Cookie 文件"""
+        if self.webhook is not None:
+            await self.webhook.on_cleanup(app)
+        await self.stream_proxy.close()
+        await self.handler.close()
+        self.handler.executor.shutdown()
+        self.handler.accounts.invalidate()
+
+    def reload_cookie(self) -> None:
+        """重新读取配置中的 Cookie（收到 SIGHUP 时调用）"""
+        try:
+            config = Config()
+        except Exception as e:
+            logger.error(f"重新加载配置失败: {e}")
+            return
+        if self.handler.rotate_cookies(config.get_twitter_cookies()):
+            self.config = config
+            logger.info("Cookie 已更新")
+
+    async def metrics(self, request: Request) -> Response:
+        """Prometheus 指标"""
+        self.handler.collect_metrics()
+        return web.Response(
+            body=metrics.REGISTRY.render().encode('utf-8'),
+            headers={'Content-Type': metrics.CONTENT_TYPE}
+        )
+
     async def health(self, request: Request) -> Response:
         """健康检查"""
-        return web.json_response({'status': 'ok'})
+        return web.json_response({
+            'status': 'ok',
+            'pid': os.getpid(),
+            'warmed_up': self.handler.warmed_up,
+            'cache': self.handler.cache.stats(),
+            'ydl_pool': self.handler.ydl_pool.stats(),
+            'executor': self.handler.executor.stats(),
+            'circuit': self.handler.breaker.stats(),
+            'accounts': self.handler.accounts.stats(),
+            'native': self.handler.native.stats() if self.handler.native else None,
+            'streams': self.stream_proxy.stats(),
+            'store': self.handler.store.stats() if self.handler.store else None,
+            'shared': self.handler.shared.stats() if self.handler.shared else None,
+            'webhook': self.webhook.stats() if self.webhook else None,
+        })
+
+
+@web.middleware
+async def metrics_middleware(request: Request, handler):
+    """按路由统计请求数、状态码和耗时"""
+    resource = request.match_info.route.resource
+    path = resource.canonical if resource is not None else 'unmatched'
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - start, path=path)
+        metrics.HTTP_REQUESTS.inc(path=path, method=request.method, status=str(status))
 
 
 def create_app() -> web.Application:
     """创建 aiohttp 应用"""
     api = VideoAPI()
 
-    app = web.Application()
+    app = web.Application(middlewares=[metrics_middleware])
+    app.on_startup.append(api.on_startup)
+    app.on_cleanup.append(api.on_cleanup)
     app.router.add_post('/parse', api.parse)
     app.router.add_get('/extract', api.extract)
+    app.router.add_post('/extract/batch', api.extract_batch)
+    app.router.add_get(r'/stream/{tweet_id:\d+}', api.stream)
     app.router.add_get('/health', api.health)
+    app.router.add_get('/metrics', api.metrics)
+    if api.webhook is not None:
+        app.router.add_post(api.config.webhook_path, api.webhook.handle)
 
     return app
 
 
+# 工作进程在启动后这么多秒内退出视为启动失败
+WORKER_START_GRACE = 5.0
+# 连续启动失败多少次后不再重启
+WORKER_MAX_FAILURES = 5
+# 停止时等待工作进程处理完请求的最长时间（秒）
+WORKER_STOP_TIMEOUT = 30.0
+
+
+def default_shared_state_path() -> str:
+    """多进程共享状态文件的默认位置：优先放在共享内存中"""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, f'avdoulou-{os.getpid()}.db')
+
+
+def serve(host: str, port: int, reuse_port: bool = False) -> None:
+    """在当前进程中运行 API 服务"""
+    web.run_app(create_app(), host=host, port=port, reuse_port=reuse_port or None)
+
+
+def serve_worker(host: str, port: int) -> None:
+    """工作进程入口：不沿用主进程的信号处理，启动完成前收到的 SIGHUP 直接忽略"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    serve(host, port, reuse_port=True)
+
+
+def run_workers(host: str, port: int, workers: int) -> None:
+    """启动 workers 个进程监听同一端口（SO_REUSEPORT，由内核分配连接）
+
+    各进程通过 SHARED_STATE_PATH 共用解析缓存、频率限制和解析租约。主进程只负责
+    转发停止信号和 SIGHUP（重新加载 Cookie），以及重启意外退出的工作进程。
+    """
+    if not hasattr(socket, 'SO_REUSEPORT'):
+        raise SystemExit("--workers 需要系统支持 SO_REUSEPORT（Linux / macOS / BSD）")
+
+    created_path = None
+    path = Config().shared_state_path
+    if not path:
+        path = created_path = default_shared_state_path()
+        os.environ['SHARED_STATE_PATH'] = path
+    logger.info(f"🧵 {workers} 个工作进程，共享状态: {path}")
+
+    stopping = False
+    processes: list[tuple[multiprocessing.Process, float]] = []
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    def reload(signum, frame):
+        # docker kill -s HUP 只发给主进程，由主进程转发给每个工作进程
+        logger.info("收到 SIGHUP，通知工作进程重新加载 Cookie")
+        for process, _ in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGHUP)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, reload)
+
+    def start() -> tuple[multiprocessing.Process, float]:
+        process = multiprocessing.Process(target=serve_worker, args=(host, port), daemon=False)
+        process.start()
+        return process, time.monotonic()
+
+    processes.extend(start() for _ in range(workers))
+    failures = 0
+    try:
+        while not stopping:
+            time.sleep(1.0)
+            for i, (process, started) in enumerate(processes):
+                if process.is_alive() or stopping:
+                    continue
+                if time.monotonic() - started < WORKER_START_GRACE:
+                    failures += 1
+                    if failures >= WORKER_MAX_FAILURES:
+                        logger.error(f"工作进程连续 {failures} 次启动失败，停止服务")
+                        stopping = True
+                        break
+                else:
+                    failures = 0
+                logger.warning(f"工作进程 {process.pid} 退出（{process.exitcode}），重新启动")
+                processes[i] = start()
+    finally:
+        # SIGTERM 让 aiohttp 执行 on_cleanup 后退出
+        for process, _ in processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + WORKER_STOP_TIMEOUT
+        for process, _ in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+        if created_path:
+            for suffix in ('', '-wal', '-shm'):
+                try:
+                    os.remove(created_path + suffix)
+                except FileNotFoundError:
+                    pass
+
+
 def main():
     """启动服务器"""
     parser = argparse.ArgumentParser(description="X 视频解析 API 服务")
     parser.add_argument('--host', default='0.0.0.0', help='监听地址')
     parser.add_argument('--port', type=int, default=8080, help='监听端口')
+    parser.add_argument('--workers', type=int, default=1, help='工作进程数（大于 1 时使用 SO_REUSEPORT）')
     args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers 必须大于等于 1")
 
     logger.info(f"🚀 启动服务: http://{args.host}:{args.port}")
     logger.info(f"📝 API 端点:")
     logger.info(f"   POST   /parse   - 解析视频 (JSON Body)")
     logger.info(f"   GET    /extract - 提取内容 (URL 参数)")
+    logger.info(f"   POST   /extract/batch - 批量提取 (NDJSON 流式返回)")
+    logger.info(f"   GET    /stream/<id> - 转发推文视频 (支持 Range)")
     logger.info(f"   GET    /health  - 健康检查")
-
-    app = create_app()
-    web.run_app(app, host=args.host, port=args.port)
+    logger.info(f"   GET    /metrics - Prometheus 指标")
+
+    config = Config()
+    if config.webhook_url:
+        logger.info(f"   POST   {config.webhook_path} - Telegram webhook")
+    if args.workers > 1:
+        run_workers(args.host, args.port, args.workers)
+    else:
+        serve(args.host, args.port)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,17 @@
+"""测试共用的辅助对象"""
+import pytest
+
+
+class FakeClock:
+    """可手动推进的时钟，替代 time.monotonic"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_clock():
+    return FakeClock()
@@ -0,0 +1,133 @@
+from handlers.account_pool import AccountPool
+from utils.exceptions import ERROR_AUTH, ERROR_NOT_FOUND, ERROR_RATE_LIMITED, classify_error
+from tests.conftest import FakeClock
+
+
+def make_pool(tmp_path, cookies=("auth_token=a", "auth_token=b"), **kwargs):
+    clock = FakeClock()
+    pool = AccountPool(list(cookies), clock=clock, directory=str(tmp_path), **kwargs)
+    return pool, clock
+
+
+def test_acquire_without_accounts(tmp_path):
+    """测试未配置账号时匿名访问"""
+    pool, _ = make_pool(tmp_path, cookies=())
+    assert pool.acquire() is None
+
+
+def test_acquire_least_recently_used(tmp_path):
+    """测试按最久未使用轮换账号"""
+    pool, clock = make_pool(tmp_path)
+
+    first = pool.acquire()
+    clock.now += 1
+    second = pool.acquire()
+    clock.now += 1
+    third = pool.acquire()
+
+    assert first is not second
+    assert third is first
+
+
+def test_rate_limited_account_quarantined(tmp_path):
+    """测试限流账号被隔离，隔离期结束后恢复"""
+    pool, clock = make_pool(tmp_path, quarantine_seconds=60)
+
+    bad = pool.acquire()
+    pool.report_failure(bad, ERROR_RATE_LIMITED)
+
+    for _ in range(3):
+        clock.now += 1
+        assert pool.acquire() is not bad
+
+    clock.now += 60
+    assert bad in [pool.acquire(), pool.acquire()]
+
+
+def test_quarantine_backoff_doubles(tmp_path):
+    """测试连续出错时隔离时间翻倍，成功后重置"""
+    pool, clock = make_pool(tmp_path, cookies=("auth_token=a",), quarantine_seconds=10)
+    account = pool.acquire()
+
+    pool.report_failure(account, ERROR_AUTH)
+    assert account.quarantined_until == clock.now + 10
+    pool.report_failure(account, ERROR_AUTH)
+    assert account.quarantined_until == clock.now + 20
+
+    pool.report_success(account)
+    assert account.strikes == 0
+
+
+def test_other_errors_do_not_quarantine(tmp_path):
+    """测试推文不存在等错误不会隔离账号"""
+    pool, _ = make_pool(tmp_path, cookies=("auth_token=a",))
+    account = pool.acquire()
+
+    pool.report_failure(account, ERROR_NOT_FOUND)
+    assert pool.acquire() is account
+
+
+def test_all_quarantined_falls_back_to_anonymous(tmp_path):
+    """测试所有账号都被隔离时匿名访问"""
+    pool, _ = make_pool(tmp_path, cookies=("auth_token=a",))
+    pool.report_failure(pool.acquire(), ERROR_RATE_LIMITED)
+
+    assert pool.acquire() is None
+
+
+def test_rotate_replaces_accounts(tmp_path):
+    """测试替换账号列表"""
+    pool, _ = make_pool(tmp_path)
+    old_path = pool.accounts[0].cookies.path()
+
+    assert pool.rotate(["auth_token=c"]) is True
+    assert len(pool) == 1
+    assert not (tmp_path / old_path).exists()
+    assert pool.rotate(["auth_token=c"]) is False
+
+
+def test_classify_error():
+    """测试上游错误分类"""
+    assert classify_error("ERROR: HTTP Error 429: Too Many Requests") == ERROR_RATE_LIMITED
+    assert classify_error("NSFW tweet requires authentication") == ERROR_AUTH
+    assert classify_error("HTTP Error 404: Not Found") == ERROR_NOT_FOUND
+    assert classify_error("HTTP Error 503: Service Unavailable") == "upstream"
+    assert classify_error("something odd") == "other"
+
+
+def test_classify_error_ignores_digits_in_tweet_id():
+    """测试推文 ID 中的 429 / 403 / 50x 不会被当成 HTTP 状态码"""
+    assert classify_error(
+        "ERROR: [twitter] 1845029384756120429: No video could be found in this tweet") == ERROR_NOT_FOUND
+    assert classify_error(
+        "ERROR: [twitter] 1845029384756403503: No status found with that ID.") == ERROR_NOT_FOUND
+    assert classify_error(
+        "ERROR: [twitter] 1845029384756120500: Error(s) while querying API: Dependency: Unspecified") == "other"
+    assert classify_error(
+        "ERROR: [twitter] 1845029384756120404: Unable to download JSON metadata: HTTP Error 429: "
+        "Too Many Requests (caused by <HTTPError 429: Too Many Requests>)") == ERROR_RATE_LIMITED
+    assert classify_error(
+        "ERROR: [twitter] 1845029384756120429: NSFW tweet requires authentication. "
+        "Use --cookies, --cookies-from-browser, --username and --password") == ERROR_AUTH
+
+
+def test_classify_error_uses_http_status_of_cause():
+    """测试优先使用异常链中 HTTPError 的状态码"""
+    class HTTPError(Exception):
+        def __init__(self, status):
+            super().__init__(f"HTTP Error {status}")
+            self.status = status
+
+    class DownloadError(Exception):
+        def __init__(self, msg, exc_info):
+            super().__init__(msg)
+            self.exc_info = exc_info
+
+    cause = HTTPError(403)
+    error = DownloadError("ERROR: [twitter] 1845029384756120429: Unable to download JSON metadata",
+                          (HTTPError, cause, None))
+    assert classify_error(error) == ERROR_AUTH
+    try:
+        raise RuntimeError("extraction failed") from HTTPError(502)
+    except RuntimeError as e:
+        assert classify_error(e) == "upstream"
@@ -0,0 +1,119 @@
+# tests/test_archive.py
+import asyncio
+import io
+import json
+
+import pytest
+
+from handlers.models import MediaResult, VideoInfo
+from utils.archive import Manifest, read_urls, run_batch
+
+
+def video_result(tweet_id: str) -> MediaResult:
+    return MediaResult(type="video", tweet_id=tweet_id, video=VideoInfo(
+        url=f"https://video.twimg.com/{tweet_id}.mp4", title="t", duration=1, width=1, height=1))
+
+
+async def fake_download(video, target):
+    target.write_bytes(video.url.encode())
+    return target
+
+
+def test_read_urls_dedupes_by_tweet_id():
+    """测试按推文 ID 去重并跳过注释和无效行"""
+    entries, invalid = read_urls([
+        "# bookmarks",
+        "https://x.com/a/status/1",
+        "https://twitter.com/b/status/1?s=20",
+        "",
+        "https://x.com/c/status/2/video/1",
+        "not a url",
+    ])
+
+    assert [e.tweet_id for e in entries] == ["1", "2"]
+    assert entries[0].url == "https://x.com/a/status/1"
+    assert invalid == ["not a url"]
+
+
+def test_manifest_persists_and_tolerates_partial_lines(tmp_path):
+    """测试清单追加写入，并忽略中断时留下的半行"""
+    path = tmp_path / "manifest.jsonl"
+    path.write_text('{"tweet_id": "1"}\n{"tweet_id": "2"')
+
+    manifest = Manifest(path)
+    assert "1" in manifest
+    assert "2" not in manifest
+
+
+@pytest.mark.asyncio
+async def test_run_batch_downloads_and_skips(tmp_path):
+    """测试批量下载：清单中的推文跳过，结果写入报告和清单"""
+    manifest_path = tmp_path / "manifest.jsonl"
+    manifest_path.write_text('{"tweet_id": "1"}\n')
+    manifest = Manifest(manifest_path)
+    entries, _ = read_urls([f"https://x.com/u/status/{i}" for i in (1, 2, 3, 4, 5)])
+
+    async def resolve(url):
+        tweet_id = url.rsplit("/", 1)[1]
+        if tweet_id == "3":
+            return MediaResult(type="photos")
+        if tweet_id == "4":
+            raise RuntimeError("boom")
+        if tweet_id == "5":
+            return MediaResult(type="unknown")
+        return video_result(tweet_id)
+
+    report = io.StringIO()
+    results = await run_batch(entries, resolve, fake_download, tmp_path / "out", manifest, report)
+
+    statuses = {r.tweet_id: r.status for r in results}
+    assert statuses == {"1": "skipped", "2": "downloaded", "3": "no_video", "4": "error", "5": "not_found"}
+    assert (tmp_path / "out" / "2.mp4").read_bytes() == b"https://video.twimg.com/2.mp4"
+    lines = [json.loads(line) for line in report.getvalue().splitlines()]
+    assert {line["tweet_id"] for line in lines} == {"1", "2", "3", "4", "5"}
+    # 没有视频和不存在的推文同样记入清单，只有失败的推文下次重试
+    manifest = Manifest(manifest_path)
+    assert manifest.done == {"1", "2", "3", "5"}
+
+    results = await run_batch(entries, resolve, fake_download, tmp_path / "out", manifest)
+    statuses = {r.tweet_id: r.status for r in results}
+    assert statuses == {"1": "skipped", "2": "skipped", "3": "skipped", "4": "error", "5": "skipped"}
+
+
+@pytest.mark.asyncio
+async def test_run_batch_respects_concurrency(tmp_path):
+    """测试同时处理的推文数不超过 concurrency"""
+    entries, _ = read_urls([f"https://x.com/u/status/{i}" for i in range(10)])
+    running = 0
+    peak = 0
+
+    async def resolve(url):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return video_result(url.rsplit("/", 1)[1])
+
+    results = await run_batch(entries, resolve, fake_download, tmp_path, Manifest(tmp_path / "m.jsonl"),
+                              concurrency=3)
+
+    assert len(results) == 10
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_run_batch_keeps_existing_files(tmp_path):
+    """测试目标文件已存在时不覆盖，并记入清单"""
+    (tmp_path / "5.mp4").write_bytes(b"old")
+    entries, _ = read_urls(["https://x.com/u/status/5"])
+    manifest = Manifest(tmp_path / "m.jsonl")
+
+    async def resolve(url):
+        raise AssertionError("should not resolve")
+
+    results = await run_batch(entries, resolve, fake_download, tmp_path, manifest)
+
+    assert results[0].status == "exists"
+    assert (tmp_path / "5.mp4").read_bytes() == b"old"
+    assert "5" in manifest
@@ -0,0 +1,27 @@
+import pytest
+
+from benchmarks.cases import CASES
+from benchmarks.run import compare, run_case
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", list(CASES))
+async def test_benchmark_case_runs(name):
+    """测试每个基准用例都能离线运行，并输出吞吐量、延迟和内存分配"""
+    result = await run_case(name, iterations=3, warmup=1, alloc_iterations=2)
+
+    assert result["ops_per_sec"] > 0
+    assert result["p99_us"] >= result["p50_us"] > 0
+    assert result["alloc_kib"] >= 0
+
+
+def test_compare_reports_regressions():
+    """测试超过容差的指标被报告，过短的耗时不参与比较"""
+    baseline = {"p50_us": 100.0, "alloc_kib": 10.0}
+
+    assert compare("case", {"p50_us": 140.0, "alloc_kib": 12.0}, baseline, 0.5, check_timing=True) == []
+    regressions = compare("case", {"p50_us": 200.0, "alloc_kib": 20.0}, baseline, 0.5, check_timing=True)
+    assert len(regressions) == 2
+    # 默认只比较内存分配
+    assert len(compare("case", {"p50_us": 200.0, "alloc_kib": 10.0}, baseline, 0.5, check_timing=False)) == 0
+    assert compare("case", {"p50_us": 4.0}, {"p50_us": 1.0}, 0.5, check_timing=True) == []
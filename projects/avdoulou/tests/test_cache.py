@@ -0,0 +1,77 @@
+from utils.cache import TTLCache
+
+
+def test_cache_hit_and_miss():
+    """测试命中与未命中计数"""
+    cache = TTLCache(maxsize=10, ttl=60)
+
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+    assert cache.hits == 1
+    assert cache.misses == 1
+    assert cache.stats()["hit_ratio"] == 0.5
+
+
+def test_cache_expires_after_ttl(fake_clock):
+    """测试过期条目被视为未命中"""
+    cache = TTLCache(maxsize=10, ttl=60, clock=fake_clock)
+
+    cache.set("a", 1)
+    fake_clock.now += 59
+    assert cache.get("a") == 1
+
+    fake_clock.now += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_cache_evicts_least_recently_used():
+    """测试超过容量时淘汰最久未使用的条目"""
+    cache = TTLCache(maxsize=2, ttl=60)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # a 变为最近使用
+    cache.set("c", 3)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+
+
+def test_cache_disabled():
+    """测试 maxsize 为 0 时不缓存"""
+    cache = TTLCache(maxsize=0, ttl=60)
+
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_cache_per_entry_ttl(fake_clock):
+    """测试单个条目可以使用更短的 ttl，但不超过默认值"""
+    cache = TTLCache(maxsize=10, ttl=60, clock=fake_clock)
+
+    cache.set("short", 1, ttl=10)
+    cache.set("long", 2, ttl=600)
+    cache.set("expired", 3, ttl=0)
+
+    assert "expired" not in cache
+    fake_clock.now += 11
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+    fake_clock.now += 50
+    assert cache.get("long") is None
+
+
+def test_cache_get_entry(fake_clock):
+    """测试返回剩余有效期和命中次数"""
+    cache = TTLCache(maxsize=10, ttl=60, clock=fake_clock)
+
+    cache.set("a", 1)
+    fake_clock.now += 15
+    assert cache.get_entry("a") == (1, 45, 1)
+    assert cache.get_entry("a") == (1, 45, 2)
+    assert cache.get_entry("b") is None
@@ -0,0 +1,158 @@
+import pytest
+
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from utils.exceptions import (
+    ERROR_AUTH, ERROR_NOT_FOUND, ERROR_OTHER, ERROR_RATE_LIMITED, ERROR_UPSTREAM, CircuitOpenError,
+)
+from tests.conftest import FakeClock
+
+
+def make_breaker(**kwargs):
+    clock = FakeClock()
+    kwargs.setdefault("failure_threshold", 3)
+    kwargs.setdefault("open_seconds", 10)
+    kwargs.setdefault("max_open_seconds", 35)
+    return CircuitBreaker(clock=clock, **kwargs), clock
+
+
+def test_opens_after_consecutive_tripping_errors():
+    """测试连续的限流 / 认证 / 上游错误达到阈值后熔断，熔断期间直接拒绝"""
+    breaker, _ = make_breaker()
+    for kind in (ERROR_RATE_LIMITED, ERROR_AUTH):
+        breaker.before_call()
+        breaker.record_failure(kind)
+    assert breaker.state == CLOSED
+
+    breaker.before_call()
+    breaker.record_failure(ERROR_UPSTREAM)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as exc_info:
+        breaker.before_call()
+    assert exc_info.value.retry_after == pytest.approx(10)
+    assert breaker.stats()["rejected"] == 1
+    assert breaker.stats()["last_error"] == ERROR_UPSTREAM
+
+
+def test_not_found_resets_failures():
+    """测试推文不存在等错误说明 X 正常响应，清零连续失败次数"""
+    breaker, _ = make_breaker()
+    for kind in (ERROR_RATE_LIMITED, ERROR_RATE_LIMITED, ERROR_NOT_FOUND, ERROR_RATE_LIMITED, ERROR_OTHER):
+        breaker.before_call()
+        breaker.record_failure(kind)
+
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+
+
+def test_half_open_allows_single_probe_and_closes_on_success():
+    """测试到期后只放行一个探测请求，探测成功后恢复"""
+    breaker, clock = make_breaker(failure_threshold=1)
+    breaker.record_failure(ERROR_RATE_LIMITED)
+    clock.now += 10
+
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_doubles_open_time_up_to_max():
+    """测试探测失败后再次熔断，熔断时间翻倍且不超过上限"""
+    breaker, clock = make_breaker(failure_threshold=1)
+    breaker.record_failure(ERROR_AUTH)
+    durations = []
+    for _ in range(3):
+        durations.append(breaker.open_until - clock.now)
+        clock.now = breaker.open_until
+        breaker.before_call()
+        breaker.record_failure(ERROR_AUTH)
+
+    assert durations == [10, 20, 35]
+    assert breaker.state == OPEN
+
+
+def test_in_flight_failures_do_not_extend_open_time():
+    """测试熔断时仍在进行的提取陆续失败，不会叠加熔断时间"""
+    breaker, clock = make_breaker(failure_threshold=5, open_seconds=30, max_open_seconds=600)
+    for _ in range(10):
+        breaker.before_call()
+    for _ in range(10):
+        breaker.record_failure(ERROR_RATE_LIMITED)
+
+    assert breaker.state == OPEN
+    assert breaker.strikes == 1
+    assert breaker.opened == 1
+    assert breaker.failures == 10
+    assert breaker.open_until - clock.now == pytest.approx(30)
+
+
+def test_released_probe_does_not_change_state():
+    """测试探测请求没有到达 X（被取消、队列已满）时只释放探测名额"""
+    breaker, clock = make_breaker(failure_threshold=1)
+    breaker.record_failure(ERROR_UPSTREAM)
+    clock.now += 10
+    breaker.before_call()
+    breaker.release()
+
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+
+
+def test_disabled_breaker_never_opens():
+    """测试阈值为 0 时不熔断"""
+    breaker, _ = make_breaker(failure_threshold=0)
+    for _ in range(10):
+        breaker.before_call()
+        breaker.record_failure(ERROR_RATE_LIMITED)
+
+    assert breaker.state == CLOSED
+
+
+def test_reset_closes_open_circuit():
+    """测试更换 Cookie 后立即恢复"""
+    breaker, _ = make_breaker(failure_threshold=1)
+    breaker.record_failure(ERROR_AUTH)
+    breaker.reset()
+
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+# yt-dlp 的真实错误信息，推文 ID 中含有 429 / 403 / 50x
+NOT_FOUND_ERRORS = (
+    "ERROR: [twitter] 1845029384756120429: No video could be found in this tweet",
+    "ERROR: [twitter] 1845029384756403503: No status found with that ID.",
+    "ERROR: [twitter] 1845029384756120502: No video could be found in this tweet",
+)
+RATE_LIMIT_ERROR = ("ERROR: [twitter] 1845029384756120001: Unable to download JSON metadata: "
+                    "HTTP Error 429: Too Many Requests (caused by <HTTPError 429: Too Many Requests>)")
+
+
+def test_not_found_tweets_with_status_like_ids_do_not_open():
+    """测试推文 ID 中含有状态码数字的“没有视频”错误不会触发熔断"""
+    from utils.exceptions import classify_error
+
+    breaker, _ = make_breaker()
+    for message in NOT_FOUND_ERRORS * 3:
+        breaker.before_call()
+        breaker.record_failure(classify_error(message))
+
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+
+
+def test_real_rate_limit_errors_open():
+    """测试 yt-dlp 报告的 HTTP 429 连续出现时熔断"""
+    from utils.exceptions import classify_error
+
+    breaker, _ = make_breaker()
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure(classify_error(RATE_LIMIT_ERROR))
+
+    assert breaker.state == OPEN
+    assert breaker.last_error == ERROR_RATE_LIMITED
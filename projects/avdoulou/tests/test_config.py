@@ -197,3 +197,44 @@ def test_config_is_user_allowed_empty_whitelist(monkeypatch):
     from config import Config
     config = Config()
     assert config.is_user_allowed(123) is False
+
+
+def test_config_get_twitter_cookies(monkeypatch, tmp_path):
+    """测试合并多账号 Cookie 并去重"""
+    cookies_file = tmp_path / "cookies.txt"
+    cookies_file.write_text("# comment\nauth_token=c\n\nauth_token=a\n")
+    monkeypatch.setenv("BOT_TOKEN", "test_token")
+    monkeypatch.setenv("TWITTER_COOKIE", "auth_token=a")
+    monkeypatch.setenv("TWITTER_COOKIES", "auth_token=b | auth_token=a")
+    monkeypatch.setenv("TWITTER_COOKIES_FILE", str(cookies_file))
+
+    from config import Config
+    config = Config()
+    assert config.get_twitter_cookies() == ["auth_token=a", "auth_token=b", "auth_token=c"]
+
+
+def test_config_get_twitter_cookies_empty(monkeypatch):
+    """测试未配置 Cookie 时返回空列表"""
+    monkeypatch.setenv("BOT_TOKEN", "test_token")
+    monkeypatch.setenv("TWITTER_COOKIE", "")
+
+    from config import Config
+    assert Config().get_twitter_cookies() == []
+
+
+def test_config_webhook_validation(monkeypatch):
+    """测试 webhook 路径必须以 / 开头，密钥只能包含 Telegram 允许的字符"""
+    from config import Config
+
+    monkeypatch.setenv("BOT_TOKEN", "test_token")
+    monkeypatch.setenv("WEBHOOK_PATH", "telegram")
+    with pytest.raises(ValidationError):
+        Config()
+
+    monkeypatch.setenv("WEBHOOK_PATH", "/telegram")
+    monkeypatch.setenv("WEBHOOK_SECRET", "not allowed!")
+    with pytest.raises(ValidationError):
+        Config()
+
+    monkeypatch.setenv("WEBHOOK_SECRET", "abc_DEF-123")
+    assert Config().webhook_secret == "abc_DEF-123"
@@ -0,0 +1,66 @@
+import os
+import stat
+from utils.cookies import CookieFile, cookie_identity, parse_cookie_string
+
+
+def test_parse_cookie_string_skips_empty():
+    """测试跳过空 name 或 value"""
+    assert parse_cookie_string("auth_token=abc; =x; name_only=; ; ct0=a=b") == [
+        ("auth_token", "abc"),
+        ("ct0", "a=b"),
+    ]
+
+
+def test_cookie_identity():
+    """测试 Cookie 指纹不包含原文且忽略首尾空白"""
+    identity = cookie_identity("auth_token=abc")
+    assert identity == cookie_identity("  auth_token=abc  ")
+    assert "abc" not in identity
+    assert cookie_identity("") is None
+
+
+def test_cookie_file_written_once(tmp_path):
+    """测试 Cookie 文件只生成一次并复用"""
+    cookies = CookieFile("auth_token=abc123", str(tmp_path))
+
+    path = cookies.path()
+    assert cookies.path() == path
+    assert len(list(tmp_path.iterdir())) == 1
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    cookies.invalidate()
+    assert not os.path.exists(path)
+
+
+def test_cookie_file_empty(tmp_path):
+    """测试未配置 Cookie 时不生成文件"""
+    cookies = CookieFile("", str(tmp_path))
+
+    assert cookies.path() is None
+    assert not cookies
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cookie_file_update_rotates(tmp_path):
+    """测试更换 Cookie 后删除旧文件并重新生成"""
+    cookies = CookieFile("auth_token=old", str(tmp_path))
+    old_path = cookies.path()
+    old_identity = cookies.identity
+
+    assert cookies.update("auth_token=new") is True
+    assert not os.path.exists(old_path)
+    assert cookies.identity != old_identity
+
+    with open(cookies.path()) as f:
+        assert "auth_token\tnew" in f.read()
+    assert cookies.update("auth_token=new") is False
+    cookies.invalidate()
+
+
+def test_cookie_file_recreated_if_deleted(tmp_path):
+    """测试文件被外部删除后自动重新生成"""
+    cookies = CookieFile("auth_token=abc123", str(tmp_path))
+    os.remove(cookies.path())
+
+    assert os.path.exists(cookies.path())
+    cookies.invalidate()
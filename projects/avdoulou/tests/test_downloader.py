@@ -0,0 +1,129 @@
+# tests/test_downloader.py
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from utils.downloader import DownloadError, SegmentedDownloader, split_ranges
+
+
+DATA = bytes(range(256)) * 4096  # 1 MiB
+
+
+async def start_server(support_range: bool = True, fail_ranges: set[int] | None = None, etag: str = '"v1"'):
+    """启动假 CDN，fail_ranges 中起始偏移的 Range 请求返回 500"""
+    requests = []
+    fail_ranges = fail_ranges if fail_ranges is not None else set()
+
+    async def video(request):
+        range_header = request.headers.get("Range")
+        requests.append(range_header)
+        if not support_range or not range_header:
+            return web.Response(body=DATA, headers={"ETag": etag})
+        start, end = (int(v) for v in range_header.removeprefix("bytes=").split("-"))
+        if start in fail_ranges:
+            return web.Response(status=500)
+        return web.Response(
+            status=206,
+            body=DATA[start:end + 1],
+            headers={"Content-Range": f"bytes {start}-{end}/{len(DATA)}", "ETag": etag},
+        )
+
+    app = web.Application()
+    app.router.add_get("/video.mp4", video)
+    server = TestServer(app)
+    await server.start_server()
+    return server, requests
+
+
+def make_downloader(**kwargs) -> SegmentedDownloader:
+    return SegmentedDownloader(segments=4, min_segment_size=64 * 1024, chunk_size=16 * 1024, **kwargs)
+
+
+def test_split_ranges():
+    """测试按段数切分字节范围，且每段不小于最小长度"""
+    assert split_ranges(100, 4, min_size=10) == [[0, 24], [25, 49], [50, 74], [75, 99]]
+    assert split_ranges(100, 4, min_size=60) == [[0, 99]]
+    assert split_ranges(0, 4) == []
+
+
+@pytest.mark.asyncio
+async def test_download_segmented(tmp_path):
+    """测试分段并发下载"""
+    server, requests = await start_server()
+    target = tmp_path / "video.mp4"
+    progress = []
+    try:
+        size = await make_downloader().download(
+            server.make_url("/video.mp4"), target, lambda done, total: progress.append((done, total)))
+    finally:
+        await server.close()
+
+    assert size == len(DATA)
+    assert target.read_bytes() == DATA
+    assert not (tmp_path / "video.mp4.part").exists()
+    assert not (tmp_path / "video.mp4.part.json").exists()
+    # 探测请求 + 4 个分段
+    assert requests[0] == "bytes=0-0"
+    assert len(requests) == 5
+    assert progress[-1] == (len(DATA), len(DATA))
+
+
+@pytest.mark.asyncio
+async def test_download_resumes_after_failure(tmp_path):
+    """测试中断后只重新下载未完成的分段"""
+    target = tmp_path / "video.mp4"
+    failing = {len(DATA) // 2}
+    server, requests = await start_server(fail_ranges=failing)
+    try:
+        with pytest.raises(DownloadError):
+            await make_downloader(retries=0).download(server.make_url("/video.mp4"), target)
+
+        state = json.loads((tmp_path / "video.mp4.part.json").read_text())
+        done = [s for s in state["segments"] if s[2] > s[1]]
+        assert len(done) == 3
+        assert not target.exists()
+
+        failing.clear()
+        requests.clear()
+        await make_downloader().download(server.make_url("/video.mp4"), target)
+    finally:
+        await server.close()
+
+    assert target.read_bytes() == DATA
+    assert requests == ["bytes=0-0", f"bytes={len(DATA) // 2}-{len(DATA) * 3 // 4 - 1}"]
+
+
+@pytest.mark.asyncio
+async def test_download_restarts_when_remote_changed(tmp_path):
+    """测试远程文件变化（ETag 不同）时放弃旧进度重新下载"""
+    target = tmp_path / "video.mp4"
+    (tmp_path / "video.mp4.part").write_bytes(b"\0" * len(DATA))
+    (tmp_path / "video.mp4.part.json").write_text(json.dumps({
+        "size": len(DATA), "validator": '"old"', "segments": [[0, len(DATA) - 1, len(DATA)]],
+    }))
+
+    server, requests = await start_server()
+    try:
+        await make_downloader().download(server.make_url("/video.mp4"), target)
+    finally:
+        await server.close()
+
+    assert target.read_bytes() == DATA
+    assert len(requests) == 5
+
+
+@pytest.mark.asyncio
+async def test_download_without_range_support(tmp_path):
+    """测试服务器不支持 Range 时顺序下载"""
+    server, requests = await start_server(support_range=False)
+    target = tmp_path / "video.mp4"
+    try:
+        size = await make_downloader().download(server.make_url("/video.mp4"), target)
+    finally:
+        await server.close()
+
+    assert size == len(DATA)
+    assert target.read_bytes() == DATA
+    assert requests == ["bytes=0-0", None]
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import pytest
+from handlers.executor import ExtractionExecutor
+from utils.exceptions import ExtractorBusyError
+
+
+@pytest.mark.asyncio
+async def test_run_returns_result():
+    """测试在线程池中执行并返回结果"""
+    executor = ExtractionExecutor(max_workers=2, max_queue=2)
+
+    assert await executor.run(lambda x: x * 2, 21) == 42
+    stats = executor.stats()
+    assert stats["completed"] == 1
+    assert stats["queued"] == 0
+    assert stats["in_flight"] == 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_run_rejects_when_queue_full():
+    """测试队列已满时快速拒绝"""
+    executor = ExtractionExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    running = asyncio.ensure_future(executor.run(release.wait))
+    while executor.in_flight == 0:
+        await asyncio.sleep(0.001)
+    queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(ExtractorBusyError) as exc_info:
+        await executor.run(lambda: "rejected")
+    assert exc_info.value.retry_after >= 1
+
+    release.set()
+    assert await running is True
+    assert await queued == "queued"
+    assert executor.stats()["rejected"] == 1
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_queued_task_releases_slot():
+    """测试排队中的任务被取消后归还队列名额"""
+    executor = ExtractionExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    running = asyncio.ensure_future(executor.run(release.wait))
+    while executor.in_flight == 0:
+        await asyncio.sleep(0.001)
+    queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+    await asyncio.sleep(0)
+    queued.cancel()
+    await asyncio.sleep(0)
+
+    assert executor.queued == 0
+    release.set()
+    await running
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_exception_propagates():
+    """测试任务异常会传递给调用方"""
+    executor = ExtractionExecutor(max_workers=1, max_queue=1)
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        await executor.run(fail)
+    assert executor.in_flight == 0
+    executor.shutdown()
@@ -90,3 +90,48 @@ def test_format_error_message_unknown():
     message = format_error_message("unknown_error")
 
     assert "未知错误" in message or "unknown" in message.lower()
+
+
+def test_format_multi_results_keeps_order():
+    """测试多条推文的结果按原始顺序合并"""
+    from handlers.link_handler import MediaResult, PhotoInfo
+    from utils.exceptions import ExtractorBusyError
+    from utils.formatter import format_multi_results
+
+    video = VideoInfo(url="https://video.twimg.com/a.mp4", title="A", duration=5, width=1280, height=720)
+    items = [
+        ("https://x.com/u/status/1", MediaResult(type="video", video=video)),
+        ("https://x.com/u/status/2", MediaResult(type="photos", photos=[PhotoInfo("https://pbs.twimg.com/p.jpg", 1, 1)])),
+        ("https://x.com/u/status/3", ExtractorBusyError("busy")),
+        ("https://x.com/u/status/4", MediaResult(type="unknown")),
+    ]
+
+    messages = format_multi_results(items)
+
+    assert len(messages) == 1
+    text = messages[0]
+    assert text.index("a.mp4") < text.index("p.jpg") < text.index("服务繁忙") < text.index("status/4")
+
+
+def test_format_multi_results_splits_long_messages():
+    """测试超过 Telegram 长度上限时拆分成多条消息"""
+    from handlers.link_handler import MediaResult
+    from utils.formatter import format_multi_results
+
+    video = VideoInfo(url="https://video.twimg.com/" + "v" * 900 + ".mp4", title="T", duration=1, width=1, height=1)
+    messages = format_multi_results([(f"https://x.com/u/status/{i}", MediaResult(type="video", video=video))
+                                     for i in range(10)])
+
+    assert len(messages) > 1
+    assert all(len(m) <= 4096 for m in messages)
+
+
+def test_format_unavailable_message():
+    """测试 X 熔断与本地繁忙的提示不同，熔断时给出大致等待时间"""
+    from utils.exceptions import CircuitOpenError, ExtractorBusyError
+    from utils.formatter import format_unavailable_message
+
+    assert format_unavailable_message(ExtractorBusyError("busy")) == format_error_message("busy")
+    message = format_unavailable_message(CircuitOpenError("open", retry_after=29.5))
+    assert "X 暂时限制了访问" in message
+    assert "30 秒" in message
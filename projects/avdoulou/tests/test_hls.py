@@ -0,0 +1,147 @@
+# tests/test_hls.py
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from utils.hls import (
+    HLSError, HLSFetcher, HLSTooLargeError, is_hls_url,
+    parse_master_playlist, parse_media_playlist, select_variant,
+)
+
+
+MASTER = """#EXTM3U
+#EXT-X-INDEPENDENT-SEGMENTS
+#EXT-X-MEDIA:NAME="Audio",TYPE=AUDIO,GROUP-ID="audio-64000",AUTOSELECT=YES,URI="/amplify_video/1/pl/mp4a/64000/a.m3u8"
+#EXT-X-MEDIA:NAME="Audio",TYPE=AUDIO,GROUP-ID="audio-128000",AUTOSELECT=YES,URI="/amplify_video/1/pl/mp4a/128000/a.m3u8"
+#EXT-X-STREAM-INF:AVERAGE-BANDWIDTH=400000,BANDWIDTH=500000,RESOLUTION=480x270,CODECS="mp4a.40.2,avc1.4d001e",AUDIO="audio-64000"
+/amplify_video/1/pl/avc1/480x270/v.m3u8
+#EXT-X-STREAM-INF:AVERAGE-BANDWIDTH=2000000,BANDWIDTH=2500000,RESOLUTION=1280x720,CODECS="mp4a.40.2,avc1.640020",AUDIO="audio-128000"
+/amplify_video/1/pl/avc1/1280x720/v.m3u8
+"""
+
+MEDIA = """#EXTM3U
+#EXT-X-VERSION:6
+#EXT-X-TARGETDURATION:3
+#EXT-X-MAP:URI="init.mp4"
+#EXTINF:3.000,
+seg0.m4s
+#EXTINF:3.000,
+seg1.m4s
+#EXTINF:1.500,
+seg2.m4s
+#EXT-X-ENDLIST
+"""
+
+
+def test_is_hls_url():
+    assert is_hls_url("https://video.twimg.com/amplify_video/1/pl/v.m3u8?tag=14")
+    assert not is_hls_url("https://video.twimg.com/amplify_video/1/vid/720x1280/v.mp4")
+    assert not is_hls_url(None)
+
+
+def test_parse_master_playlist_and_select_variant():
+    """测试解析主播放列表并选择最高分辨率及其音频轨道"""
+    variants, audio_groups = parse_master_playlist(MASTER, "https://video.twimg.com/amplify_video/1/pl/master.m3u8")
+
+    best = select_variant(variants)
+    assert (best.width, best.height, best.bandwidth) == (1280, 720, 2500000)
+    assert best.url == "https://video.twimg.com/amplify_video/1/pl/avc1/1280x720/v.m3u8"
+    assert audio_groups[best.audio_group] == "https://video.twimg.com/amplify_video/1/pl/mp4a/128000/a.m3u8"
+
+
+def test_parse_media_playlist():
+    """测试解析初始化片段和分片地址"""
+    playlist = parse_media_playlist(MEDIA, "https://video.twimg.com/pl/avc1/v.m3u8")
+
+    assert playlist.init_url == "https://video.twimg.com/pl/avc1/init.mp4"
+    assert playlist.segments == [f"https://video.twimg.com/pl/avc1/seg{i}.m4s" for i in range(3)]
+
+
+def test_parse_media_playlist_rejects_encryption():
+    """测试加密的播放列表抛出 HLSError"""
+    with pytest.raises(HLSError):
+        parse_media_playlist('#EXTM3U\n#EXT-X-KEY:METHOD=AES-128,URI="k"\nseg0.ts\n', "https://a/v.m3u8")
+
+
+async def start_hls_server(segment_count: int = 20, delays: dict | None = None, master: str | None = None):
+    """启动提供播放列表和分片的假 CDN，记录同时处理中的请求数"""
+    stats = {"active": 0, "peak": 0}
+    delays = delays or {}
+
+    media = "#EXTM3U\n#EXT-X-MAP:URI=\"init.mp4\"\n" + "".join(
+        f"#EXTINF:1.0,\nseg{i}.m4s\n" for i in range(segment_count)) + "#EXT-X-ENDLIST\n"
+
+    async def playlist(request):
+        return web.Response(text=media)
+
+    async def master_playlist(request):
+        return web.Response(text=master)
+
+    async def segment(request):
+        name = request.match_info["name"]
+        stats["active"] += 1
+        stats["peak"] = max(stats["peak"], stats["active"])
+        try:
+            await asyncio.sleep(delays.get(name, 0.005))
+            return web.Response(body=name.encode() + b";")
+        finally:
+            stats["active"] -= 1
+
+    app = web.Application()
+    app.router.add_get("/pl/v.m3u8", playlist)
+    app.router.add_get("/pl/a.m3u8", playlist)
+    app.router.add_get("/master.m3u8", master_playlist)
+    app.router.add_get("/pl/{name}", segment)
+    server = TestServer(app)
+    await server.start_server()
+    return server, stats
+
+
+@pytest.mark.asyncio
+async def test_fetch_writes_segments_in_order(tmp_path):
+    """测试并发下载分片并按顺序写入，同时请求数不超过窗口大小"""
+    # 前面的分片更慢，后面的分片先完成
+    server, stats = await start_hls_server(delays={"seg0.m4s": 0.05, "seg1.m4s": 0.03})
+    target = tmp_path / "video.mp4"
+    progress = []
+    try:
+        await HLSFetcher(window=4).fetch(
+            str(server.make_url("/pl/v.m3u8")), target, lambda done, total: progress.append((done, total)))
+    finally:
+        await server.close()
+
+    expected = b"init.mp4;" + b"".join(f"seg{i}.m4s;".encode() for i in range(20))
+    assert target.read_bytes() == expected
+    assert stats["peak"] == 4
+    assert progress[-1] == (21, 21)
+
+
+@pytest.mark.asyncio
+async def test_fetch_enforces_max_bytes(tmp_path):
+    """测试超过 max_bytes 时中止并删除不完整的文件"""
+    server, _ = await start_hls_server()
+    target = tmp_path / "video.mp4"
+    try:
+        with pytest.raises(HLSTooLargeError):
+            await HLSFetcher(window=4).fetch(str(server.make_url("/pl/v.m3u8")), target, max_bytes=50)
+    finally:
+        await server.close()
+
+    assert not target.exists()
+
+
+@pytest.mark.asyncio
+async def test_fetch_separate_audio_requires_ffmpeg(tmp_path):
+    """测试音频为单独轨道且没有 ffmpeg 时抛出 HLSError"""
+    master = ('#EXTM3U\n#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="a",URI="/pl/a.m3u8"\n'
+              '#EXT-X-STREAM-INF:BANDWIDTH=1,RESOLUTION=2x2,AUDIO="a"\n/pl/v.m3u8\n')
+    server, _ = await start_hls_server(master=master)
+    fetcher = HLSFetcher()
+    fetcher.ffmpeg = None
+    try:
+        with pytest.raises(HLSError):
+            await fetcher.fetch(str(server.make_url("/master.m3u8")), tmp_path / "video.mp4")
+    finally:
+        await server.close()
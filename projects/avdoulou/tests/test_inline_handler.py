@@ -0,0 +1,121 @@
+# tests/test_inline_handler.py
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from telegram import InlineQueryResultArticle, InlineQueryResultCachedVideo, InlineQueryResultPhoto, InlineQueryResultVideo
+
+from handlers.inline_handler import InlineHandler
+from handlers.link_handler import LinkHandler
+from handlers.models import MediaResult, PhotoInfo, VideoInfo
+from handlers.video_uploader import VideoUploader
+from utils.rate_limiter import TokenBucketLimiter
+
+
+VIDEO_RESULT = MediaResult(type="video", tweet_id="123", title="t", video=VideoInfo(
+    url="https://video.twimg.com/v.mp4", title="Test Video", duration=10, width=1280, height=720,
+    thumbnail="https://pbs.twimg.com/thumb.jpg"))
+
+
+def make_handler(resolve=None, allowed=True, rate=60):
+    config = MagicMock()
+    config.is_user_allowed.return_value = allowed
+    link_handler = LinkHandler()
+    link_handler.resolve = resolve or AsyncMock(return_value=VIDEO_RESULT)
+    return InlineHandler(config, link_handler, VideoUploader(), TokenBucketLimiter(rate), debounce=0.02)
+
+
+def make_update(text: str, user_id: int = 1):
+    query = MagicMock()
+    query.query = text
+    query.from_user = SimpleNamespace(id=user_id)
+    query.answer = AsyncMock()
+    return SimpleNamespace(inline_query=query), query
+
+
+async def wait_pending(handler: InlineHandler) -> None:
+    while handler._pending:
+        await asyncio.gather(*handler._pending.values(), return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_inline_query_debounces_keystrokes():
+    """测试同一用户连续输入时只解析最后一次查询"""
+    handler = make_handler()
+    queries = []
+    for text in ("https://x.com/u/status/1", "https://x.com/u/status/12", "https://x.com/u/status/123"):
+        update, query = make_update(text)
+        queries.append(query)
+        await handler.handle_inline_query(update, None)
+        await asyncio.sleep(0.005)
+    await wait_pending(handler)
+
+    handler.link_handler.resolve.assert_awaited_once_with("https://x.com/u/status/123")
+    queries[0].answer.assert_not_awaited()
+    queries[1].answer.assert_not_awaited()
+    results = queries[2].answer.await_args.args[0]
+    assert isinstance(results[0], InlineQueryResultVideo)
+    assert results[0].video_url == "https://video.twimg.com/v.mp4"
+
+
+@pytest.mark.asyncio
+async def test_inline_query_ignores_non_links():
+    """测试非推文链接不触发解析"""
+    handler = make_handler()
+    update, query = make_update("hello")
+    await handler.handle_inline_query(update, None)
+    await wait_pending(handler)
+
+    handler.link_handler.resolve.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_inline_query_unauthorized():
+    """测试非白名单用户得到空结果"""
+    handler = make_handler(allowed=False)
+    update, query = make_update("https://x.com/u/status/123")
+    await handler.handle_inline_query(update, None)
+
+    query.answer.assert_awaited_once()
+    assert query.answer.await_args.args[0] == []
+    handler.link_handler.resolve.assert_not_awaited()
+
+
+def test_build_results_prefers_cached_file_id():
+    """测试已发送过的视频返回缓存的 file_id"""
+    handler = make_handler()
+    handler.uploader.file_ids.set("123", "FILE_ID")
+
+    results = handler.build_results(VIDEO_RESULT, "https://x.com/u/status/123")
+
+    assert isinstance(results[0], InlineQueryResultCachedVideo)
+    assert results[0].video_file_id == "FILE_ID"
+
+
+def test_build_results_photos_and_hls():
+    """测试图片返回多个结果，HLS 视频退回文本链接"""
+    handler = make_handler()
+    photos = MediaResult(type="photos", tweet_id="9", photos=[
+        PhotoInfo(url="https://pbs.twimg.com/a.jpg?name=orig", width=1, height=1),
+        PhotoInfo(url="https://pbs.twimg.com/b.jpg?name=orig", width=1, height=1),
+    ])
+    hls = MediaResult(type="video", tweet_id="8", video=VideoInfo(
+        url="https://video.twimg.com/pl/v.m3u8", title="HLS", duration=1, width=1, height=1))
+
+    photo_results = handler.build_results(photos, "")
+    assert [type(r) for r in photo_results] == [InlineQueryResultPhoto, InlineQueryResultPhoto]
+    assert len({r.id for r in photo_results}) == 2
+    assert isinstance(handler.build_results(hls, "")[0], InlineQueryResultArticle)
+
+
+@pytest.mark.asyncio
+async def test_inline_query_cache_hit_skips_rate_limit():
+    """测试命中缓存的查询不消耗频率限制"""
+    handler = make_handler(rate=1)
+    handler.link_handler.cache.set("123", VIDEO_RESULT)
+    for _ in range(3):
+        update, query = make_update("https://x.com/u/status/123")
+        await handler.handle_inline_query(update, None)
+        await wait_pending(handler)
+        assert isinstance(query.answer.await_args.args[0][0], InlineQueryResultVideo)
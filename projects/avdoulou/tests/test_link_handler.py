@@ -1,23 +1,41 @@
 # tests/test_link_handler.py
+import asyncio
 import pytest
-from handlers.link_handler import LinkHandler, VideoInfo
+from handlers.link_handler import LinkHandler, build_media_result, select_best_format
 from unittest.mock import AsyncMock, patch, MagicMock
 
 
+VIDEO_INFO = {
+    "id": "123456789",
+    "title": "Test Video",
+    "uploader": "user",
+    "duration": 60,
+    "formats": [
+        {"format_id": "hls-480", "vcodec": "avc1", "height": 480, "width": 854,
+         "url": "https://video.twimg.com/480.m3u8"},
+        {"format_id": "http-1080", "vcodec": "avc1", "height": 1080, "width": 1920,
+         "url": "https://video.twimg.com/test.mp4"},
+        {"format_id": "audio", "vcodec": "none", "url": "https://video.twimg.com/audio.mp4"},
+    ],
+}
+
+PHOTO_INFO = {
+    "id": "123456789",
+    "title": "Test Photos",
+    "thumbnails": [
+        {"url": "https://pbs.twimg.com/media/a.jpg?format=jpg&name=small"},
+        {"url": "https://pbs.twimg.com/media/a.jpg:orig", "width": 1200, "height": 800},
+        {"url": "https://pbs.twimg.com/media/b.jpg:large", "width": 1024, "height": 768},
+    ],
+}
+
+
 @pytest.mark.asyncio
 async def test_parse_x_video_success():
     """测试成功解析 X 视频"""
     handler = LinkHandler()
 
-    mock_result = {
-        "url": "https://video.twimg.com/test.mp4",
-        "title": "Test Video",
-        "duration": 60,
-        "width": 1920,
-        "height": 1080,
-    }
-
-    with patch.object(handler, "_extract_video_info", AsyncMock(return_value=mock_result)):
+    with patch.object(handler, "_extract_info", AsyncMock(return_value=VIDEO_INFO)):
         result = await handler.parse_x_video("https://x.com/user/status/123456789")
 
         assert result.url == "https://video.twimg.com/test.mp4"
@@ -32,7 +50,7 @@ async def test_parse_x_video_no_video():
     """测试推文无视频"""
     handler = LinkHandler()
 
-    with patch.object(handler, "_extract_video_info", AsyncMock(return_value=None)):
+    with patch.object(handler, "_extract_info", AsyncMock(return_value=None)):
         result = await handler.parse_x_video("https://x.com/user/status/123456789")
 
         assert result is None
@@ -45,3 +63,385 @@ async def test_parse_x_video_invalid_url():
     result = await handler.parse_x_video("https://youtube.com/watch?v=123")
 
     assert result is None
+
+
+@pytest.mark.asyncio
+async def test_parse_x_video_uses_cache_across_url_variants():
+    """测试同一推文的不同域名变体共用缓存"""
+    handler = LinkHandler()
+
+    mock_extract = AsyncMock(return_value=VIDEO_INFO)
+    with patch.object(handler, "_extract_info", mock_extract):
+        first = await handler.parse_x_video("https://x.com/user/status/123456789")
+        second = await handler.parse_x_video("https://twitter.com/other/status/123456789")
+
+    assert first == second
+    assert mock_extract.await_count == 1
+    assert handler.cache.hits == 1
+    assert handler.cache.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_parse_x_video_failure_not_cached():
+    """测试解析失败的结果不会被缓存"""
+    handler = LinkHandler()
+
+    mock_extract = AsyncMock(return_value=None)
+    with patch.object(handler, "_extract_info", mock_extract):
+        await handler.parse_x_video("https://x.com/user/status/123456789")
+        await handler.parse_x_video("https://x.com/user/status/123456789")
+
+    assert mock_extract.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_resolve_video_single_extraction():
+    """测试视频推文只调用一次 yt-dlp 即可得到类型和直链"""
+    handler = LinkHandler()
+
+    mock_extract = AsyncMock(return_value=VIDEO_INFO)
+    with patch.object(handler, "_extract_info", mock_extract):
+        result = await handler.resolve("https://x.com/user/status/123456789")
+        video = await handler.parse_x_video("https://x.com/user/status/123456789")
+
+    assert result.type == "video"
+    assert result.tweet_id == "123456789"
+    assert result.video == video
+    assert mock_extract.await_count == 1
+
+
+def test_build_media_result_photos():
+    """测试图片推文只保留原图"""
+    result = build_media_result(PHOTO_INFO, "123456789")
+
+    assert result.type == "photos"
+    assert [p.url for p in result.photos] == [
+        "https://pbs.twimg.com/media/a.jpg:orig",
+        "https://pbs.twimg.com/media/b.jpg:large",
+    ]
+
+
+def test_build_media_result_unknown():
+    """测试无媒体时返回 unknown"""
+    assert build_media_result(None).type == "unknown"
+    assert build_media_result({"title": "text only"}).type == "unknown"
+
+
+def test_select_best_format_ignores_missing_height():
+    """测试缺少 height 的格式不会导致比较出错"""
+    info = {"formats": [
+        {"vcodec": "avc1", "height": None, "url": "https://video.twimg.com/a.mp4"},
+        {"vcodec": "avc1", "height": 720, "url": "https://video.twimg.com/b.mp4"},
+    ]}
+    assert select_best_format(info)["url"] == "https://video.twimg.com/b.mp4"
+
+
+@pytest.mark.asyncio
+async def test_resolve_coalesces_concurrent_lookups():
+    """测试同一推文的并发解析只调用一次 yt-dlp"""
+    handler = LinkHandler()
+    calls = 0
+
+    async def slow_extract(url):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return VIDEO_INFO
+
+    with patch.object(handler, "_extract_info", slow_extract):
+        results = await asyncio.gather(
+            handler.resolve("https://x.com/user/status/123456789"),
+            handler.resolve("https://twitter.com/user/status/123456789"),
+            handler.resolve("https://www.x.com/user/status/123456789/video/1"),
+        )
+
+    assert calls == 1
+    assert all(r.type == "video" for r in results)
+
+
+@pytest.mark.asyncio
+async def test_resolve_propagates_busy_error():
+    """测试解析队列已满时向调用方抛出 ExtractorBusyError"""
+    from utils.exceptions import ExtractorBusyError
+
+    handler = LinkHandler()
+
+    with patch.object(handler.executor, "run", AsyncMock(side_effect=ExtractorBusyError("busy"))):
+        with pytest.raises(ExtractorBusyError):
+            await handler.resolve("https://x.com/user/status/123456789")
+
+
+def test_rotate_cookies_clears_pool():
+    """测试更换 Cookie 后关闭旧的空闲实例"""
+    handler = LinkHandler()
+
+    with patch.object(handler.ydl_pool, "clear") as mock_clear:
+        assert handler.rotate_cookies(["auth_token=new"]) is True
+        assert handler.rotate_cookies(["auth_token=new"]) is False
+
+    mock_clear.assert_called_once()
+    handler.accounts.invalidate()
+
+
+def test_extract_info_sync_quarantines_rate_limited_account(tmp_path):
+    """测试账号遇到 429 后被隔离，下次请求换用其他账号"""
+    from handlers.account_pool import AccountPool
+
+    handler = LinkHandler()
+    handler.accounts = AccountPool(["auth_token=a", "auth_token=b"], directory=str(tmp_path))
+    used = []
+
+    def fake_factory(opts, cookie_path):
+        ydl = MagicMock()
+        with open(cookie_path) as f:
+            token = "a" if "auth_token\ta" in f.read() else "b"
+
+        def extract_info(url, download=False):
+            used.append(token)
+            if token == "a":
+                raise Exception("HTTP Error 429: Too Many Requests")
+            return VIDEO_INFO
+
+        ydl.extract_info.side_effect = extract_info
+        return ydl
+
+    handler.ydl_pool._factory = fake_factory
+
+    with pytest.raises(Exception):
+        handler._extract_info_sync("https://x.com/user/status/1")
+    assert handler._extract_info_sync("https://x.com/user/status/1") == VIDEO_INFO
+    assert handler._extract_info_sync("https://x.com/user/status/1") == VIDEO_INFO
+    assert used == ["a", "b", "b"]
+    handler.accounts.invalidate()
+
+
+def signed_video_info(expires: float) -> dict:
+    """带签名过期时间的视频信息"""
+    return {**VIDEO_INFO, "formats": [
+        {"format_id": "http-1080", "vcodec": "avc1", "height": 1080, "width": 1920,
+         "url": f"https://video.twimg.com/test.mp4?expires={int(expires)}&sig=abc"},
+    ]}
+
+
+@pytest.mark.asyncio
+async def test_resolve_caches_signed_url_until_expiry():
+    """测试签名地址只缓存到过期前 expiry_margin 秒"""
+    import time
+
+    handler = LinkHandler()
+    expires = time.time() + 200
+
+    with patch.object(handler, "_extract_info", AsyncMock(return_value=signed_video_info(expires))):
+        result = await handler.resolve("https://x.com/user/status/123456789")
+
+    assert result.expires_at == int(expires)
+    _, remaining, _ = handler.cache.get_entry("123456789")
+    assert 130 < remaining <= 200 - handler.expiry_margin
+
+
+@pytest.mark.asyncio
+async def test_resolve_does_not_cache_nearly_expired_url():
+    """测试即将过期的签名地址不写入缓存"""
+    import time
+
+    handler = LinkHandler()
+    mock_extract = AsyncMock(return_value=signed_video_info(time.time() + 30))
+    with patch.object(handler, "_extract_info", mock_extract):
+        await handler.resolve("https://x.com/user/status/123456789")
+        await handler.resolve("https://x.com/user/status/123456789")
+
+    assert mock_extract.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_resolve_refreshes_hot_entry_in_background():
+    """测试热门条目在即将失效时后台刷新，请求仍立即返回旧结果"""
+    import time
+
+    handler = LinkHandler()
+    handler.refresh_min_hits = 2
+    handler.refresh_ahead = 300
+    old = signed_video_info(time.time() + 200)
+    new = signed_video_info(time.time() + 3600)
+
+    mock_extract = AsyncMock(side_effect=[old, new])
+    with patch.object(handler, "_extract_info", mock_extract):
+        first = await handler.resolve("https://x.com/user/status/123456789")
+        await handler.resolve("https://x.com/user/status/123456789")
+        assert not handler._refreshing
+        # 第二次命中后达到热门阈值，触发一次后台刷新
+        second = await handler.resolve("https://x.com/user/status/123456789")
+        await handler.resolve("https://x.com/user/status/123456789")
+        assert second == first
+        assert len(handler._refreshing) == 1
+        await asyncio.gather(*handler._refreshing.values())
+
+    assert mock_extract.await_count == 2
+    refreshed = handler.cache.get("123456789")
+    assert refreshed.expires_at == int(new["formats"][0]["url"].split("expires=")[1].split("&")[0])
+    assert not handler._refreshing
+
+
+def test_build_media_result_keeps_hls_manifest():
+    """测试选中 HLS 视频流时保留主播放列表地址（包含单独的音频轨道）"""
+    info = {"duration": 10, "formats": [
+        {"vcodec": "avc1", "height": 720, "protocol": "m3u8_native",
+         "url": "https://video.twimg.com/pl/avc1/720/v.m3u8",
+         "manifest_url": "https://video.twimg.com/pl/master.m3u8"},
+    ]}
+
+    result = build_media_result(info, "1")
+
+    assert result.video.url == "https://video.twimg.com/pl/avc1/720/v.m3u8"
+    assert result.video.manifest_url == "https://video.twimg.com/pl/master.m3u8"
+    assert build_media_result(VIDEO_INFO).video.manifest_url is None
+
+
+@pytest.mark.asyncio
+async def test_start_warm_up_runs_in_background():
+    """测试预热在后台线程中进行，不阻塞调用方，完成后标记为已预热"""
+    import threading
+
+    release = threading.Event()
+    handler = LinkHandler()
+    handler.ydl_pool.warm_up = MagicMock(side_effect=lambda *args, **kwargs: release.wait(5) and 1)
+
+    task = handler.start_warm_up()
+    assert handler.start_warm_up() is task
+    await asyncio.sleep(0.05)
+    assert not task.done()
+    assert not handler.warmed_up
+
+    release.set()
+    await task
+    assert handler.warmed_up
+    await handler.close()
+
+
+@pytest.mark.asyncio
+async def test_resolution_store_restores_cache_after_restart(monkeypatch, tmp_path):
+    """测试解析结果写入持久化存储，重启后预加载到内存缓存，不再调用 yt-dlp"""
+    from config import Config
+
+    monkeypatch.setenv("BOT_TOKEN", "test_token")
+    monkeypatch.setenv("NATIVE_RESOLVER_ENABLED", "false")
+    monkeypatch.setenv("STORE_PATH", str(tmp_path / "store.db"))
+
+    handler = LinkHandler(Config())
+    with patch.object(handler, "_extract_info", AsyncMock(return_value=VIDEO_INFO)):
+        await handler.resolve("https://x.com/user/status/123456789")
+    await handler.close()
+
+    restarted = LinkHandler(Config())
+    assert await restarted.restore() == 1
+    with patch.object(restarted, "_extract_info", AsyncMock()) as extract:
+        result = await restarted.resolve("https://twitter.com/user/status/123456789")
+
+    extract.assert_not_called()
+    assert result.video.url == "https://video.twimg.com/test.mp4"
+    await restarted.close()
+
+
+@pytest.mark.asyncio
+async def test_shared_state_resolves_once_across_processes(monkeypatch, tmp_path):
+    """测试共用 SHARED_STATE_PATH 的两个进程同时请求同一条推文，只调用一次 yt-dlp"""
+    from config import Config
+
+    monkeypatch.setenv("BOT_TOKEN", "test_token")
+    monkeypatch.setenv("NATIVE_RESOLVER_ENABLED", "false")
+    monkeypatch.setenv("SHARED_STATE_PATH", str(tmp_path / "shared.db"))
+
+    async def slow_extract(url):
+        await asyncio.sleep(0.1)
+        return VIDEO_INFO
+
+    first, second = LinkHandler(Config()), LinkHandler(Config())
+    first.shared.poll_interval = second.shared.poll_interval = 0.01
+    with patch.object(first, "_extract_info", AsyncMock(side_effect=slow_extract)) as first_extract, \
+            patch.object(second, "_extract_info", AsyncMock(side_effect=slow_extract)) as second_extract:
+        results = await asyncio.gather(
+            first.resolve("https://x.com/user/status/123456789"),
+            second.resolve("https://twitter.com/user/status/123456789"),
+        )
+
+    assert first_extract.await_count + second_extract.await_count == 1
+    assert results[0].video.url == results[1].video.url == "https://video.twimg.com/test.mp4"
+    # 等待结果的进程也写入了自己的内存缓存
+    assert "123456789" in first.cache and "123456789" in second.cache
+
+    await first.invalidate("123456789")
+    assert await second.shared.get("123456789") is None
+    await first.close()
+    await second.close()
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_fails_fast_after_rate_limits(monkeypatch):
+    """测试 X 连续返回 429 后熔断，之后的请求不再占用解析线程，直接抛出 CircuitOpenError"""
+    from config import Config
+    from utils.exceptions import CircuitOpenError, UpstreamError
+
+    monkeypatch.setenv("BOT_TOKEN", "test_token")
+    monkeypatch.setenv("NATIVE_RESOLVER_ENABLED", "false")
+    monkeypatch.setenv("CIRCUIT_FAILURE_THRESHOLD", "2")
+
+    handler = LinkHandler(Config())
+    extract = MagicMock(side_effect=Exception("HTTP Error 429: Too Many Requests"))
+    with patch.object(handler, "_extract_info_sync", extract):
+        for tweet_id in ("1", "2"):
+            with pytest.raises(UpstreamError):
+                await handler.resolve(f"https://x.com/user/status/{tweet_id}")
+        with pytest.raises(CircuitOpenError) as exc_info:
+            await handler.resolve("https://x.com/user/status/3")
+
+    assert extract.call_count == 2
+    assert exc_info.value.retry_after > 0
+    assert handler.breaker.stats()["state"] == "open"
+    await handler.close()
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_ignores_missing_tweets(monkeypatch):
+    """测试 yt-dlp 对 ID 含 429 / 403 的推文报告“没有视频”时不熔断"""
+    from yt_dlp.utils import DownloadError
+    from config import Config
+
+    monkeypatch.setenv("BOT_TOKEN", "test_token")
+    monkeypatch.setenv("NATIVE_RESOLVER_ENABLED", "false")
+    monkeypatch.setenv("CIRCUIT_FAILURE_THRESHOLD", "2")
+
+    handler = LinkHandler(Config())
+    errors = [DownloadError(f"ERROR: [twitter] {tweet_id}: No video could be found in this tweet")
+              for tweet_id in ("1845029384756120429", "1845029384756120403", "1845029384756120503")]
+    with patch.object(handler, "_extract_info_sync", MagicMock(side_effect=errors)):
+        for error in errors:
+            tweet_id = str(error).split()[2].rstrip(":")
+            await handler.resolve(f"https://x.com/user/status/{tweet_id}")
+
+    assert handler.breaker.stats()["state"] == "closed"
+    await handler.close()
+
+
+@pytest.mark.asyncio
+async def test_extraction_failure_is_not_reported_as_missing_media(monkeypatch):
+    """测试超时等提取失败抛出 UpstreamError，只有推文不存在 / 没有视频时返回 unknown"""
+    from yt_dlp.utils import DownloadError
+    from config import Config
+    from utils.exceptions import UpstreamError
+
+    monkeypatch.setenv("BOT_TOKEN", "test_token")
+    monkeypatch.setenv("NATIVE_RESOLVER_ENABLED", "false")
+
+    handler = LinkHandler(Config())
+    errors = [
+        DownloadError("ERROR: [twitter] 1: Unable to download JSON metadata: The read operation timed out"),
+        DownloadError("ERROR: [twitter] 2: No video could be found in this tweet"),
+    ]
+    with patch.object(handler, "_extract_info_sync", MagicMock(side_effect=errors)):
+        with pytest.raises(UpstreamError) as exc_info:
+            await handler.resolve("https://x.com/user/status/1")
+        result = await handler.resolve("https://x.com/user/status/2")
+
+    assert exc_info.value.kind == "upstream"
+    assert result.type == "unknown"
+    await handler.close()
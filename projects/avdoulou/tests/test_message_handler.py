@@ -0,0 +1,90 @@
+# tests/test_message_handler.py
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from handlers.link_handler import MediaResult, VideoInfo
+
+
+@pytest.fixture
+def message_handler(monkeypatch):
+    monkeypatch.setenv("BOT_TOKEN", "test_token")
+    monkeypatch.setenv("ALLOWED_USER_IDS", "1")
+    from handlers.message_handler import MessageHandler
+    return MessageHandler()
+
+
+def make_update(text: str):
+    processing = MagicMock()
+    processing.delete = AsyncMock()
+    message = MagicMock()
+    message.text = text
+    message.reply_text = AsyncMock(side_effect=[processing] + [MagicMock()] * 5)
+    return SimpleNamespace(message=message, effective_user=SimpleNamespace(id=1))
+
+
+@pytest.mark.asyncio
+async def test_multiple_links_resolved_concurrently(message_handler):
+    """测试一条消息中的多个链接并发解析，并按原始顺序合并回复"""
+    running = 0
+    peak = 0
+
+    async def resolve(url):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        tweet_id = url.rsplit("/", 1)[1]
+        return MediaResult(type="video", tweet_id=tweet_id, video=VideoInfo(
+            url=f"https://video.twimg.com/{tweet_id}.mp4", title=tweet_id, duration=1, width=1, height=1))
+
+    message_handler.link_handler.resolve = resolve
+    update = make_update("https://x.com/u/status/3\nhttps://x.com/u/status/1 https://x.com/u/status/2")
+
+    outcome = await message_handler._process_message(update)
+
+    assert outcome == "multiple"
+    assert peak == 3
+    reply = update.message.reply_text.await_args_list[-1].args[0]
+    assert reply.index("3.mp4") < reply.index("1.mp4") < reply.index("2.mp4")
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_charges_per_link(message_handler):
+    """测试每个链接消耗一个令牌，多链接消息不能绕过频率限制"""
+    message_handler.link_handler.resolve = AsyncMock(return_value=MediaResult(type="unknown"))
+    links = " ".join(f"https://x.com/u/status/{i}" for i in range(1, 13))
+
+    # 超过 MAX_LINKS_PER_MESSAGE 的链接不处理也不计数，10 个令牌用完后被限流
+    assert await message_handler._process_message(make_update(links)) == "multiple"
+    assert message_handler.link_handler.resolve.await_count == 10
+    assert await message_handler._process_message(make_update("https://x.com/u/status/99")) == "rate_limited"
+
+
+@pytest.mark.asyncio
+async def test_cached_video_sent_without_resolving(message_handler):
+    """测试发送过的视频直接用 file_id 回复，不需要解析（X 无法访问时同样可用）"""
+    from utils.exceptions import UpstreamError
+
+    message_handler.link_handler.resolve = AsyncMock(side_effect=UpstreamError("down"))
+    message_handler.uploader.file_ids.set("123", "FILE_ID")
+    update = make_update("https://x.com/u/status/123")
+    update.message.reply_video = AsyncMock()
+
+    assert await message_handler._process_message(update) == "video"
+    message_handler.link_handler.resolve.assert_not_awaited()
+    update.message.reply_text.assert_not_awaited()
+    assert update.message.reply_video.await_args.kwargs["video"] == "FILE_ID"
+
+
+@pytest.mark.asyncio
+async def test_message_without_links_is_rejected(message_handler):
+    """测试没有推文链接的消息提示无效链接"""
+    message_handler.link_handler.resolve = AsyncMock()
+    update = make_update("hello")
+
+    assert await message_handler._process_message(update) == "invalid_url"
+    message_handler.link_handler.resolve.assert_not_awaited()
@@ -0,0 +1,63 @@
+from utils.metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_counter_render():
+    """测试计数器按标签累加并输出"""
+    registry = Registry()
+    counter = registry.register(Counter("requests_total", "Requests", ("status",)))
+
+    counter.inc(status="200")
+    counter.inc(2, status="200")
+    counter.inc(status="500")
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{status="200"} 3' in text
+    assert 'requests_total{status="500"} 1' in text
+
+
+def test_gauge_render():
+    """测试瞬时值输出"""
+    registry = Registry()
+    gauge = registry.register(Gauge("ratio", "Ratio"))
+
+    gauge.set(0.25)
+
+    assert "ratio 0.25" in registry.render()
+
+
+def test_histogram_buckets_are_cumulative():
+    """测试直方图的桶是累计计数，边界值计入对应的桶"""
+    registry = Registry()
+    histogram = registry.register(Histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0)))
+
+    histogram.observe(0.05, stage="extract")
+    histogram.observe(0.1, stage="extract")
+    histogram.observe(5, stage="extract")
+
+    text = registry.render()
+    assert 'latency_seconds_bucket{stage="extract",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{stage="extract",le="1"} 2' in text
+    assert 'latency_seconds_bucket{stage="extract",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{stage="extract"} 3' in text
+    assert 'latency_seconds_sum{stage="extract"} 5.15' in text
+
+
+def test_histogram_time():
+    """测试 time() 记录代码块耗时"""
+    histogram = Histogram("latency_seconds", "Latency")
+
+    with histogram.time():
+        pass
+
+    assert histogram.count() == 1
+
+
+def test_label_escaping():
+    """测试标签值转义"""
+    registry = Registry()
+    counter = registry.register(Counter("c", "C", ("path",)))
+
+    counter.inc(path='a"b\\c')
+
+    assert 'c{path="a\\"b\\\\c"} 1' in registry.render()
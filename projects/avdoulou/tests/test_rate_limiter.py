@@ -0,0 +1,55 @@
+from utils.rate_limiter import TokenBucketLimiter
+
+
+def test_allows_up_to_capacity(fake_clock):
+    """测试一分钟内最多允许 rate_per_minute 次"""
+    limiter = TokenBucketLimiter(5, clock=fake_clock)
+
+    results = [limiter.check("user")[0] for _ in range(6)]
+
+    assert results == [True] * 5 + [False]
+
+
+def test_retry_after_and_refill(fake_clock):
+    """测试返回等待时间，等待后令牌恢复"""
+    limiter = TokenBucketLimiter(6, clock=fake_clock)  # 每 10 秒一个令牌
+
+    for _ in range(6):
+        limiter.check("user")
+    allowed, retry_after = limiter.check("user")
+    assert allowed is False
+    assert retry_after == 10
+
+    fake_clock.now += 10
+    assert limiter.check("user") == (True, 0.0)
+
+
+def test_keys_are_independent(fake_clock):
+    """测试不同 key 互不影响"""
+    limiter = TokenBucketLimiter(1, clock=fake_clock)
+
+    assert limiter.check("a")[0] is True
+    assert limiter.check("a")[0] is False
+    assert limiter.check("b")[0] is True
+
+
+def test_idle_buckets_evicted(fake_clock):
+    """测试空闲的桶被淘汰"""
+    limiter = TokenBucketLimiter(60, clock=fake_clock)  # 60 秒补满
+
+    limiter.check("a")
+    limiter.check("b")
+    fake_clock.now += 61
+    limiter.check("c")
+
+    assert len(limiter) == 1
+
+
+def test_max_keys_bounded(fake_clock):
+    """测试桶的数量不超过 max_keys"""
+    limiter = TokenBucketLimiter(60, max_keys=3, clock=fake_clock)
+
+    for i in range(10):
+        limiter.check(i)
+
+    assert len(limiter) == 3
@@ -0,0 +1,449 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from aiohttp.test_utils import TestClient, TestServer
+
+from handlers.link_handler import LinkHandler, MediaResult, VideoInfo
+from utils.exceptions import CircuitOpenError, ExtractorBusyError, UpstreamError
+
+
+VIDEO_RESULT = MediaResult(
+    type="video",
+    tweet_id="123456789",
+    title="Test Video",
+    video=VideoInfo(url="https://video.twimg.com/test.mp4", title="Test Video",
+                    duration=60, width=1920, height=1080),
+)
+
+
+@pytest.fixture
+def server_env(monkeypatch):
+    monkeypatch.setenv("BOT_TOKEN", "test_token")
+    monkeypatch.setenv("RATE_LIMIT_PER_MINUTE", "2")
+    monkeypatch.setattr(LinkHandler, "warm_up", lambda self: 0)
+
+
+async def make_client():
+    from server import create_app
+    client = TestClient(TestServer(create_app()))
+    await client.start_server()
+    return client
+
+
+@pytest.mark.asyncio
+async def test_extract_video(server_env):
+    """测试 /extract 返回视频直链"""
+    client = await make_client()
+    try:
+        with patch.object(LinkHandler, "resolve", AsyncMock(return_value=VIDEO_RESULT)):
+            resp = await client.get("/extract", params={"url": "https://x.com/user/status/123456789"})
+            data = await resp.json()
+
+        assert resp.status == 200
+        assert data["type"] == "video"
+        assert data["video"]["url"] == "https://video.twimg.com/test.mp4"
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_extract_busy_returns_503(server_env):
+    """测试解析队列已满时返回 503"""
+    client = await make_client()
+    try:
+        with patch.object(LinkHandler, "resolve", AsyncMock(side_effect=ExtractorBusyError("busy", retry_after=3))):
+            resp = await client.post("/parse", json={"url": "https://x.com/user/status/123456789"})
+
+        assert resp.status == 503
+        assert resp.headers["Retry-After"] == "3"
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_extract_circuit_open_returns_503(server_env):
+    """测试 X 熔断期间返回 503、剩余熔断时间和明确的错误信息"""
+    client = await make_client()
+    try:
+        error = CircuitOpenError("open", retry_after=12.3)
+        with patch.object(LinkHandler, "resolve", AsyncMock(side_effect=error)):
+            resp = await client.get("/extract", params={"url": "https://x.com/user/status/123456789"})
+            data = await resp.json()
+        health = await (await client.get("/health")).json()
+
+        assert resp.status == 503
+        assert resp.headers["Retry-After"] == "13"
+        assert "X" in data["error"]
+        assert health["circuit"]["state"] == "closed"
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_upstream_failure_returns_502(server_env):
+    """测试提取失败（X 超时、Cookie 失效）返回 502，与没有媒体的 404 区分"""
+    client = await make_client()
+    try:
+        error = UpstreamError("HTTP Error 401: Unauthorized", "auth")
+        with patch.object(LinkHandler, "resolve", AsyncMock(side_effect=error)):
+            extract = await client.get("/extract", params={"url": "https://x.com/user/status/123456789"})
+            parse = await client.post("/parse", json={"url": "https://x.com/user/status/123456789"})
+        with patch.object(LinkHandler, "resolve", AsyncMock(return_value=MediaResult(type="unknown"))):
+            missing = await client.post("/parse", json={"url": "https://x.com/user/status/1"},
+                                        headers={"X-Real-IP": "203.0.113.9"})
+
+        assert extract.status == 502
+        assert (await extract.json())["kind"] == "auth"
+        assert parse.status == 502
+        assert missing.status == 404
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_returns_429(server_env):
+    """测试超过频率限制时返回 429 和 Retry-After"""
+    client = await make_client()
+    try:
+        with patch.object(LinkHandler, "resolve", AsyncMock(return_value=VIDEO_RESULT)):
+            statuses = []
+            for _ in range(3):
+                resp = await client.get("/extract", params={"url": "https://x.com/user/status/123456789"})
+                statuses.append(resp.status)
+
+        assert statuses == [200, 200, 429]
+        assert int(resp.headers["Retry-After"]) > 0
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_extract_batch_streams_ndjson(server_env):
+    """测试批量提取按完成顺序逐行返回，每行带 index"""
+    import asyncio
+    import json
+
+    async def fake_resolve(self, url):
+        if url.endswith("/1"):
+            await asyncio.sleep(0.05)  # 第一个链接最慢
+            return VIDEO_RESULT
+        if url.endswith("/3"):
+            raise ExtractorBusyError("busy")
+        return MediaResult(type="unknown")
+
+    client = await make_client()
+    try:
+        with patch.object(LinkHandler, "resolve", fake_resolve):
+            resp = await client.post("/extract/batch", json={"urls": [
+                "https://x.com/user/status/1",
+                "https://x.com/user/status/2",
+                "https://x.com/user/status/3",
+            ]})
+            body = await resp.text()
+
+        assert resp.status == 200
+        assert resp.headers["Content-Type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in body.splitlines()]
+        assert len(lines) == 3
+        assert lines[-1]["index"] == 0  # 最慢的最后返回
+        by_index = {line["index"]: line for line in lines}
+        assert by_index[0]["video"]["url"] == "https://video.twimg.com/test.mp4"
+        assert by_index[1]["status"] == 404
+        assert by_index[2]["status"] == 503
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_extract_batch_validates_body(server_env):
+    """测试批量提取参数校验"""
+    client = await make_client()
+    try:
+        resp = await client.post("/extract/batch", json={"urls": "https://x.com/user/status/1"})
+        assert resp.status == 400
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_per_real_ip_behind_local_proxy(server_env):
+    """测试经过本机 nginx 的请求按 X-Real-IP 分别限流，而不是共用一个令牌桶"""
+    client = await make_client()
+    try:
+        with patch.object(LinkHandler, "resolve", AsyncMock(return_value=VIDEO_RESULT)):
+            statuses = []
+            for ip in ("203.0.113.1", "203.0.113.1", "203.0.113.2", "203.0.113.1"):
+                resp = await client.get("/extract", params={"url": "https://x.com/user/status/123456789"},
+                                        headers={"X-Real-IP": ip})
+                statuses.append(resp.status)
+
+        assert statuses == [200, 200, 200, 429]
+    finally:
+        await client.close()
+
+
+def test_proxy_headers_ignored_for_remote_peers(server_env):
+    """测试来自其他地址的请求不读取 X-Real-IP（除非 TRUST_PROXY_HEADERS=true）"""
+    from aiohttp.test_utils import make_mocked_request
+    from server import VideoAPI
+
+    api = VideoAPI()
+    request = make_mocked_request("GET", "/extract", headers={"X-Real-IP": "203.0.113.1"})
+    request._transport_peername = ("198.51.100.7", 12345)
+
+    assert api._client_ip(request) == "198.51.100.7"
+    api.config.trust_proxy_headers = True
+    assert api._client_ip(request) == "203.0.113.1"
+
+
+@pytest.mark.asyncio
+async def test_extract_batch_charges_per_url(server_env, monkeypatch):
+    """测试批量提取按链接数消耗单独的令牌桶，不能用一个请求绕过频率限制"""
+    monkeypatch.setenv("BATCH_URLS_PER_MINUTE", "3")
+    monkeypatch.setenv("BATCH_MAX_URLS", "3")
+    urls = [f"https://x.com/user/status/{i}" for i in range(1, 4)]
+    client = await make_client()
+    try:
+        with patch.object(LinkHandler, "resolve", AsyncMock(return_value=VIDEO_RESULT)):
+            first = await client.post("/extract/batch", json={"urls": urls})
+            await first.text()
+            second = await client.post("/extract/batch", json={"urls": urls[:1]})
+            single = await client.get("/extract", params={"url": urls[0]})
+
+        assert first.status == 200
+        assert second.status == 429
+        assert int(second.headers["Retry-After"]) >= 1
+        # 单个请求的令牌桶不受影响
+        assert single.status == 200
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(server_env):
+    """测试 /metrics 输出请求数、阶段耗时、缓存命中率和线程池饱和度"""
+    client = await make_client()
+    try:
+        with patch.object(LinkHandler, "resolve", AsyncMock(return_value=VIDEO_RESULT)):
+            await client.get("/extract", params={"url": "https://x.com/user/status/123456789"})
+        resp = await client.get("/metrics")
+        text = await resp.text()
+
+        assert resp.status == 200
+        assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert 'avdoulou_http_requests_total{path="/extract",method="GET",status="200"}' in text
+        assert 'avdoulou_stage_duration_seconds_count{stage="serialize"}' in text
+        assert "avdoulou_cache_hit_ratio" in text
+        assert "avdoulou_executor_saturation 0" in text
+    finally:
+        await client.close()
+
+
+VIDEO_BYTES = bytes(range(256)) * 1024
+
+
+async def start_cdn(status_sequence=None):
+    """启动一个支持 Range 的假 CDN；status_sequence 依次指定前几次请求返回的错误码"""
+    from aiohttp import web
+
+    statuses = list(status_sequence or [])
+    requests = []
+
+    async def video(request):
+        requests.append(request.headers.get("Range"))
+        if statuses:
+            return web.Response(status=statuses.pop(0))
+        range_header = request.headers.get("Range")
+        if range_header:
+            start, end = range_header.removeprefix("bytes=").split("-")
+            start, end = int(start), int(end or len(VIDEO_BYTES) - 1)
+            return web.Response(
+                status=206,
+                body=VIDEO_BYTES[start:end + 1],
+                headers={"Content-Type": "video/mp4", "Accept-Ranges": "bytes",
+                         "Content-Range": f"bytes {start}-{end}/{len(VIDEO_BYTES)}"},
+            )
+        return web.Response(body=VIDEO_BYTES, headers={"Content-Type": "video/mp4"})
+
+    app = web.Application()
+    app.router.add_get("/video.mp4", video)
+    cdn = TestServer(app)
+    await cdn.start_server()
+    return cdn, requests
+
+
+def video_result(url: str) -> MediaResult:
+    return MediaResult(type="video", tweet_id="123456789", title="Test Video",
+                       video=VideoInfo(url=url, title="Test Video", duration=60, width=1920, height=1080))
+
+
+@pytest.mark.asyncio
+async def test_stream_relays_full_video(server_env):
+    """测试 /stream 完整转发视频"""
+    cdn, _ = await start_cdn()
+    client = await make_client()
+    try:
+        result = video_result(str(cdn.make_url("/video.mp4")))
+        with patch.object(LinkHandler, "resolve", AsyncMock(return_value=result)):
+            resp = await client.get("/stream/123456789")
+            body = await resp.read()
+
+        assert resp.status == 200
+        assert resp.headers["Content-Type"] == "video/mp4"
+        assert resp.headers["Accept-Ranges"] == "bytes"
+        assert body == VIDEO_BYTES
+    finally:
+        await client.close()
+        await cdn.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_supports_range(server_env):
+    """测试 /stream 转发 Range 请求并返回 206"""
+    cdn, requests = await start_cdn()
+    client = await make_client()
+    try:
+        result = video_result(str(cdn.make_url("/video.mp4")))
+        with patch.object(LinkHandler, "resolve", AsyncMock(return_value=result)):
+            resp = await client.get("/stream/123456789", headers={"Range": "bytes=100-199"})
+            body = await resp.read()
+
+        assert resp.status == 206
+        assert resp.headers["Content-Range"] == f"bytes 100-199/{len(VIDEO_BYTES)}"
+        assert resp.headers["Content-Length"] == "100"
+        assert body == VIDEO_BYTES[100:200]
+        assert requests == ["bytes=100-199"]
+    finally:
+        await client.close()
+        await cdn.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_re_resolves_expired_url(server_env):
+    """测试上游返回 403 时删除缓存并重新解析"""
+    cdn, requests = await start_cdn(status_sequence=[403])
+    client = await make_client()
+    try:
+        result = video_result(str(cdn.make_url("/video.mp4")))
+        mock_resolve = AsyncMock(return_value=result)
+        with patch.object(LinkHandler, "resolve", mock_resolve):
+            resp = await client.get("/stream/123456789")
+            body = await resp.read()
+
+        assert resp.status == 200
+        assert body == VIDEO_BYTES
+        assert mock_resolve.await_count == 2
+        assert len(requests) == 2
+    finally:
+        await client.close()
+        await cdn.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_not_video_returns_404(server_env):
+    """测试图片推文返回 404"""
+    client = await make_client()
+    try:
+        with patch.object(LinkHandler, "resolve", AsyncMock(return_value=MediaResult(type="photos"))):
+            resp = await client.get("/stream/123456789")
+
+        assert resp.status == 404
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_limit_returns_503(server_env, monkeypatch):
+    """测试同时转发的流达到上限时返回 503"""
+    import asyncio
+    from aiohttp import web
+
+    monkeypatch.setenv("STREAM_MAX_CONCURRENT", "1")
+    release = asyncio.Event()
+
+    async def slow_video(request):
+        await release.wait()
+        return web.Response(body=b"data")
+
+    app = web.Application()
+    app.router.add_get("/video.mp4", slow_video)
+    cdn = TestServer(app)
+    await cdn.start_server()
+    client = await make_client()
+    try:
+        result = video_result(str(cdn.make_url("/video.mp4")))
+        with patch.object(LinkHandler, "resolve", AsyncMock(return_value=result)):
+            first = asyncio.ensure_future(client.get("/stream/123456789"))
+            await asyncio.sleep(0.05)
+            resp = await client.get("/stream/123456789")
+            release.set()
+            first_resp = await first
+
+        assert resp.status == 503
+        assert "Retry-After" in resp.headers
+        assert first_resp.status == 200
+        assert await first_resp.read() == b"data"
+    finally:
+        await client.close()
+        await cdn.close()
+
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _health_pids(port: int, attempts: int) -> set[int]:
+    """多次请求 /health（每次新建连接），返回处理过请求的进程 ID"""
+    import json
+    import urllib.request
+
+    pids = set()
+    for _ in range(attempts):
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2) as resp:
+                pids.add(json.load(resp)["pid"])
+        except OSError:
+            pass
+    return pids
+
+
+@pytest.mark.skipif(not hasattr(__import__("socket"), "SO_REUSEPORT"), reason="需要 SO_REUSEPORT")
+def test_workers_survive_sighup(tmp_path):
+    """测试 --workers 模式下主进程收到 SIGHUP 后转发给工作进程，服务不中断、进程不重启"""
+    import os
+    import signal
+    import subprocess
+    import sys
+    import time
+
+    port = _free_port()
+    env = dict(os.environ, BOT_TOKEN="test_token", NATIVE_RESOLVER_ENABLED="false",
+               SHARED_STATE_PATH=str(tmp_path / "shared.db"))
+    master = subprocess.Popen(
+        [sys.executable, "server.py", "--host", "127.0.0.1", "--port", str(port), "--workers", "2"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        pids = set()
+        while len(pids) < 2 and time.monotonic() < deadline:
+            pids |= _health_pids(port, 10)
+            time.sleep(0.2)
+        assert len(pids) == 2
+
+        master.send_signal(signal.SIGHUP)
+        time.sleep(1.5)
+
+        assert master.poll() is None
+        assert _health_pids(port, 20) <= pids
+        assert _health_pids(port, 5)
+    finally:
+        master.send_signal(signal.SIGTERM)
+        output = master.communicate(timeout=30)[0]
+
+    assert master.returncode == 0
+    assert "收到 SIGHUP" in output
+    assert "重新启动" not in output
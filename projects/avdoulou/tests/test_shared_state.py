@@ -0,0 +1,102 @@
+import asyncio
+import sqlite3
+import time
+from unittest.mock import patch
+
+import pytest
+
+from utils.shared_state import SharedState, SharedTokenBucketLimiter
+
+
+@pytest.mark.asyncio
+async def test_cache_shared_between_instances(tmp_path):
+    """测试一个实例写入的缓存另一个实例可以读取，并返回剩余有效期"""
+    path = str(tmp_path / "shared.db")
+    first, second = SharedState(path), SharedState(path)
+
+    await first.set("123", {"type": "video"}, ttl=60)
+    data, remaining = await second.get("123")
+    assert data == {"type": "video"}
+    assert 0 < remaining <= 60
+
+    await second.delete("123")
+    assert await first.get("123") is None
+    # ttl <= 0 不保存
+    await first.set("456", {"type": "video"}, ttl=0)
+    assert await second.get("456") is None
+
+
+@pytest.mark.asyncio
+async def test_expired_cache_entry_not_returned(tmp_path):
+    """测试过期的共享缓存条目不返回"""
+    state = SharedState(str(tmp_path / "shared.db"))
+    await state.set("123", {"type": "video"}, ttl=0.05)
+    await asyncio.sleep(0.1)
+
+    assert await state.get("123") is None
+
+
+@pytest.mark.asyncio
+async def test_lease_is_exclusive_until_released_or_expired(tmp_path):
+    """测试租约同时只属于一个实例，释放或过期后其他实例可以取得"""
+    path = str(tmp_path / "shared.db")
+    first = SharedState(path, lease_seconds=0.1)
+    second = SharedState(path, lease_seconds=0.1)
+
+    assert await first.acquire("123") is True
+    assert await second.acquire("123") is False
+    assert await first.acquire("123") is False
+    # 只能释放自己持有的租约
+    await second.release("123")
+    assert await second.acquire("123") is False
+
+    await first.release("123")
+    assert await second.acquire("123") is True
+    await asyncio.sleep(0.15)
+    assert await first.acquire("123") is True
+
+
+def test_token_bucket_shared_between_instances(tmp_path):
+    """测试两个进程（实例）消耗同一个令牌桶"""
+    path = str(tmp_path / "shared.db")
+    first = SharedTokenBucketLimiter(SharedState(path), rate_per_minute=2, namespace="api")
+    second = SharedTokenBucketLimiter(SharedState(path), rate_per_minute=2, namespace="api")
+    other = SharedTokenBucketLimiter(SharedState(path), rate_per_minute=2, namespace="bot")
+
+    assert first.check("1.2.3.4")[0] is True
+    assert second.check("1.2.3.4")[0] is True
+    allowed, retry_after = first.check("1.2.3.4")
+    assert allowed is False
+    assert 0 < retry_after <= 30
+    # 不同命名空间、不同客户端互不影响
+    assert other.check("1.2.3.4")[0] is True
+    assert second.check("5.6.7.8")[0] is True
+
+
+def test_token_bucket_falls_back_when_locked(tmp_path):
+    """测试共享状态的写锁被占用时退回进程内的令牌桶，不阻塞请求"""
+    path = str(tmp_path / "shared.db")
+    limiter = SharedTokenBucketLimiter(SharedState(path, busy_timeout=0.01), rate_per_minute=1, namespace="api")
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        start = time.monotonic()
+        assert limiter.check("1.2.3.4")[0] is True
+        assert limiter.check("1.2.3.4")[0] is False
+        assert time.monotonic() - start < 1
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
+
+    assert limiter.fallbacks == 2
+
+
+def test_take_token_rolls_back_on_error(tmp_path):
+    """测试令牌桶更新失败时回滚事务，连接可以继续使用"""
+    state = SharedState(str(tmp_path / "shared.db"))
+    with patch("utils.shared_state.time.time", side_effect=[time.time(), RuntimeError("boom")]):
+        state.take_token("k", rate=1, capacity=1)
+        with pytest.raises(RuntimeError):
+            state.take_token("k", rate=1, capacity=1)
+
+    assert state.take_token("other", rate=1, capacity=1)[0] is True
@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import pytest
+
+from handlers.models import MediaResult, PhotoInfo, VideoInfo
+from utils.store import ResolutionStore
+
+
+VIDEO_RESULT = MediaResult(
+    type="video",
+    tweet_id="123",
+    title="Test Video",
+    uploader="user",
+    video=VideoInfo(url="https://video.twimg.com/test.mp4", title="Test Video", duration=60,
+                    width=1920, height=1080, thumbnail="https://pbs.twimg.com/thumb.jpg"),
+    expires_at=2_000_000_000.0,
+)
+
+PHOTO_RESULT = MediaResult(
+    type="photos",
+    tweet_id="456",
+    photos=[PhotoInfo(url="https://pbs.twimg.com/media/a.jpg:orig", width=1200, height=800)],
+)
+
+
+def test_media_result_round_trip():
+    """测试解析结果转换成字典后可以完整还原"""
+    assert MediaResult.from_dict(VIDEO_RESULT.to_dict()) == VIDEO_RESULT
+    assert MediaResult.from_dict(PHOTO_RESULT.to_dict()) == PHOTO_RESULT
+
+
+@pytest.mark.asyncio
+async def test_writes_are_batched_and_survive_reopen(tmp_path):
+    """测试写入先进入待写队列，批量提交后重新打开仍可读取"""
+    path = str(tmp_path / "store.db")
+    store = ResolutionStore(path, flush_interval=0.05)
+    store.put("123", VIDEO_RESULT, expires_at=time.time() + 600)
+    store.put("456", PHOTO_RESULT, expires_at=time.time() + 600)
+    store.put_file_id("123", "file-abc")
+
+    assert store.pending == 3
+    assert store.flushes == 0
+    await asyncio.sleep(0.2)
+    assert store.pending == 0
+    assert store.flushes == 1
+    await store.close()
+
+    reopened = ResolutionStore(path)
+    stored = {entry.tweet_id: entry.result for entry in await reopened.load_hot(10)}
+    assert stored == {"123": VIDEO_RESULT, "456": PHOTO_RESULT}
+    assert await reopened.load_file_ids(10) == [("123", "file-abc")]
+    await reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_load_hot_orders_by_hits_and_skips_expired(tmp_path):
+    """测试预加载按命中次数排序，不返回已过期的条目"""
+    store = ResolutionStore(str(tmp_path / "store.db"), flush_interval=60)
+    now = time.time()
+    for tweet_id in ("1", "2", "3"):
+        store.put(tweet_id, MediaResult(type="photos", tweet_id=tweet_id), expires_at=now + 600)
+    store.put("expired", MediaResult(type="photos", tweet_id="expired"), expires_at=now - 1)
+    await store.flush()
+    for _ in range(3):
+        store.touch("2")
+    store.touch("3")
+    await store.flush()
+
+    hot = await store.load_hot(2)
+
+    assert [entry.tweet_id for entry in hot] == ["2", "3"]
+    assert hot[0].hits == 3
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_store_is_bounded(tmp_path):
+    """测试条目数超过上限时删除命中最少的条目"""
+    store = ResolutionStore(str(tmp_path / "store.db"), max_entries=2, flush_interval=60)
+    now = time.time()
+    store.put("cold", MediaResult(type="photos", tweet_id="cold"), expires_at=now + 600)
+    store.put("hot", MediaResult(type="photos", tweet_id="hot"), expires_at=now + 600)
+    await store.flush()
+    store.touch("hot")
+    store.put("new", MediaResult(type="photos", tweet_id="new"), expires_at=now + 600)
+    await store.flush()
+
+    assert {entry.tweet_id for entry in await store.load_hot(10)} == {"hot", "new"}
+    assert store.stats()["evicted"] == 1
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_pending_writes(tmp_path):
+    """测试关闭时提交尚未写入的数据，删除的 file_id 不再返回"""
+    path = str(tmp_path / "store.db")
+    store = ResolutionStore(path, flush_interval=60)
+    store.put_file_id("1", "old")
+    await store.flush()
+    store.delete_file_id("1")
+    store.put_file_id("2", "new")
+    await store.close()
+
+    reopened = ResolutionStore(path)
+    assert await reopened.load_file_ids(10) == [("2", "new")]
+    await reopened.close()
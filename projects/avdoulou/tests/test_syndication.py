@@ -0,0 +1,137 @@
+import json
+from pathlib import Path
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from unittest.mock import AsyncMock, patch
+
+from handlers.link_handler import LinkHandler
+from handlers.syndication import SyndicationResolver, parse_syndication_tweet, syndication_token
+
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+# 推文 ID -> 录制的 syndication 响应
+RECORDED = {
+    "1863123456789012345": "syndication_video.json",
+    "1859000000000000001": "syndication_photos.json",
+    "1111111111111111111": "syndication_tombstone.json",
+}
+
+
+def load_fixture(name: str) -> dict:
+    return json.loads((FIXTURES / name).read_text())
+
+
+async def start_stub_server(requests: list):
+    """本地 stub 服务器，按推文 ID 回放录制的 JSON"""
+
+    async def tweet_result(request):
+        requests.append(dict(request.query))
+        name = RECORDED.get(request.query.get("id"))
+        if name is None:
+            return web.Response(status=404)
+        return web.Response(text=(FIXTURES / name).read_text(), content_type="application/json")
+
+    app = web.Application()
+    app.router.add_get("/tweet-result", tweet_result)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+def test_syndication_token_matches_javascript():
+    """测试 token 与 JS 实现一致"""
+    # 由 node 计算: ((Number(id) / 1e15) * Math.PI).toString(36).replace(/(0+|\.)/g, '')
+    assert syndication_token("1") == "bhi2ay3f28n"
+    assert syndication_token("1234567890123456789") == "2zqic77uqyk"
+    assert syndication_token("1867041249938530657") == "4ixhe2c37t9"
+
+
+def test_parse_video_picks_highest_bitrate_mp4():
+    """测试选择码率最高的 MP4"""
+    result = parse_syndication_tweet(load_fixture("syndication_video.json"))
+
+    assert result.type == "video"
+    assert result.tweet_id == "1863123456789012345"
+    assert result.video.url.endswith("/1280x720/high.mp4?tag=12")
+    assert (result.video.width, result.video.height) == (1280, 720)
+    assert result.video.duration == 30
+    assert result.uploader == "Example User"
+
+
+def test_parse_photos():
+    """测试图片推文返回原图"""
+    result = parse_syndication_tweet(load_fixture("syndication_photos.json"))
+
+    assert result.type == "photos"
+    assert [p.url for p in result.photos] == [
+        "https://pbs.twimg.com/media/GcAAAAAAAAA.jpg?name=orig",
+        "https://pbs.twimg.com/media/GcBBBBBBBBB.jpg?name=orig",
+    ]
+    assert result.photos[0].height == 2048
+
+
+def test_parse_misses():
+    """测试已删除或只有 HLS 的推文视为未命中"""
+    assert parse_syndication_tweet(load_fixture("syndication_tombstone.json")) is None
+
+    hls_only = load_fixture("syndication_video.json")
+    variants = hls_only["mediaDetails"][0]["video_info"]["variants"]
+    hls_only["mediaDetails"][0]["video_info"]["variants"] = variants[:1]
+    assert parse_syndication_tweet(hls_only) is None
+
+
+@pytest.mark.asyncio
+async def test_resolver_against_stub_server():
+    """测试解析器请求本地 stub 服务器"""
+    requests = []
+    server = await start_stub_server(requests)
+    resolver = SyndicationResolver(base_url=str(server.make_url("/tweet-result")))
+    try:
+        video = await resolver.resolve("1863123456789012345")
+        missing = await resolver.resolve("2222222222222222222")
+        tombstone = await resolver.resolve("1111111111111111111")
+    finally:
+        await resolver.close()
+        await server.close()
+
+    assert video.type == "video"
+    assert missing is None
+    assert tombstone is None
+    assert requests[0]["token"] == syndication_token("1863123456789012345")
+    assert resolver.stats() == {"hits": 1, "misses": 2}
+
+
+@pytest.mark.asyncio
+async def test_resolver_connection_error_is_miss():
+    """测试连接失败视为未命中"""
+    resolver = SyndicationResolver(base_url="http://127.0.0.1:9/tweet-result", timeout=1)
+    try:
+        assert await resolver.resolve("1863123456789012345") is None
+    finally:
+        await resolver.close()
+
+
+@pytest.mark.asyncio
+async def test_link_handler_native_first_then_fallback():
+    """测试 LinkHandler 先用轻量解析器，未命中时回退到 yt-dlp"""
+    requests = []
+    server = await start_stub_server(requests)
+    handler = LinkHandler()
+    handler.native = SyndicationResolver(base_url=str(server.make_url("/tweet-result")))
+    ytdlp_info = {"title": "fallback", "duration": 5,
+                  "formats": [{"vcodec": "avc1", "height": 720, "url": "https://video.twimg.com/yt.mp4"}]}
+    mock_extract = AsyncMock(return_value=ytdlp_info)
+    try:
+        with patch.object(handler, "_extract_info", mock_extract):
+            native = await handler.resolve("https://x.com/example/status/1863123456789012345")
+            fallback = await handler.resolve("https://x.com/example/status/1111111111111111111")
+    finally:
+        await handler.close()
+        await server.close()
+
+    assert native.video.url.endswith("high.mp4?tag=12")
+    assert fallback.video.url == "https://video.twimg.com/yt.mp4"
+    mock_extract.assert_awaited_once_with("https://x.com/example/status/1111111111111111111")
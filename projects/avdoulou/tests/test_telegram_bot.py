@@ -0,0 +1,175 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from telegram import User
+from telegram.ext import ExtBot
+
+from handlers.link_handler import LinkHandler, MediaResult
+
+
+UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 10,
+        "date": 1733040930,
+        "chat": {"id": 1, "type": "private"},
+        "from": {"id": 1, "is_bot": False, "first_name": "Test"},
+        "text": "https://x.com/user/status/123456789",
+    },
+}
+
+
+@pytest.fixture
+def webhook_env(monkeypatch):
+    monkeypatch.setenv("BOT_TOKEN", "123:test_token")
+    monkeypatch.setenv("ALLOWED_USER_IDS", "1")
+    monkeypatch.setenv("WEBHOOK_URL", "https://bot.example.com/")
+    monkeypatch.setenv("WEBHOOK_SECRET", "s3cret")
+    monkeypatch.setattr(LinkHandler, "warm_up", lambda self: 0)
+
+
+async def fake_get_me(self, *args, **kwargs):
+    """代替 getMe 请求，不访问 Telegram"""
+    self._bot_user = User(id=123, first_name="Test Bot", is_bot=True, username="test_bot")
+    return self._bot_user
+
+
+async def make_client():
+    from server import create_app
+    app = create_app()
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    return app, client
+
+
+@pytest.mark.asyncio
+async def test_webhook_rejects_wrong_secret(webhook_env):
+    """测试密钥不匹配的请求被拒绝，不进入更新队列"""
+    with patch.object(ExtBot, "get_me", fake_get_me), patch.object(ExtBot, "set_webhook", AsyncMock()):
+        app, client = await make_client()
+        try:
+            resp = await client.post("/telegram/webhook", json=UPDATE,
+                                     headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"})
+            missing = await client.post("/telegram/webhook", json=UPDATE)
+            health = await (await client.get("/health")).json()
+        finally:
+            await client.close()
+
+    assert resp.status == 403
+    assert missing.status == 403
+    assert health["webhook"]["rejected"] == 2
+    assert health["webhook"]["received"] == 0
+
+
+@pytest.mark.asyncio
+async def test_webhook_update_uses_shared_link_handler(webhook_env):
+    """测试 webhook 收到的消息经由 API 服务的 LinkHandler 解析，并注册了 webhook 地址"""
+    resolve = AsyncMock(return_value=MediaResult(type="unknown", tweet_id="123456789"))
+    send_message = AsyncMock(return_value=AsyncMock())
+    set_webhook = AsyncMock()
+    created = []
+    original_init = LinkHandler.__init__
+
+    def init(self, *args, **kwargs):
+        created.append(self)
+        original_init(self, *args, **kwargs)
+
+    with patch.object(LinkHandler, "__init__", init), \
+            patch.object(ExtBot, "get_me", fake_get_me), \
+            patch.object(ExtBot, "set_webhook", set_webhook), \
+            patch.object(ExtBot, "send_message", send_message), \
+            patch.object(LinkHandler, "resolve", resolve):
+        app, client = await make_client()
+        try:
+            resp = await client.post("/telegram/webhook", json=UPDATE,
+                                     headers={"X-Telegram-Bot-Api-Secret-Token": "s3cret"})
+            for _ in range(100):
+                if send_message.await_count >= 2:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await client.close()
+
+    assert resp.status == 200
+    assert set_webhook.await_args.kwargs["url"] == "https://bot.example.com/telegram/webhook"
+    assert set_webhook.await_args.kwargs["secret_token"] == "s3cret"
+    resolve.assert_awaited_once_with("https://x.com/user/status/123456789")
+    # 处理中提示 + 结果
+    assert send_message.await_count == 2
+    # Bot 与 API 共用一个 LinkHandler
+    assert len(created) == 1
+
+
+@pytest.mark.asyncio
+async def test_webhook_updates_processed_concurrently(webhook_env):
+    """测试一个用户的慢请求（下载、上传）不阻塞后续更新"""
+    second_started = asyncio.Event()
+
+    async def resolve(self, url):
+        if url.endswith("/1"):
+            # 第一条更新要等第二条开始处理后才完成，逐条处理时会卡住
+            await asyncio.wait_for(second_started.wait(), timeout=2)
+        else:
+            second_started.set()
+        return MediaResult(type="unknown")
+
+    send_message = AsyncMock(return_value=AsyncMock())
+    updates = []
+    for i in (1, 2):
+        update = {**UPDATE, "update_id": i, "message": {**UPDATE["message"], "message_id": i,
+                                                        "text": f"https://x.com/user/status/{i}"}}
+        updates.append(update)
+
+    with patch.object(ExtBot, "get_me", fake_get_me), \
+            patch.object(ExtBot, "set_webhook", AsyncMock()), \
+            patch.object(ExtBot, "send_message", send_message), \
+            patch.object(LinkHandler, "resolve", resolve):
+        app, client = await make_client()
+        try:
+            for update in updates:
+                resp = await client.post("/telegram/webhook", json=update,
+                                         headers={"X-Telegram-Bot-Api-Secret-Token": "s3cret"})
+                assert resp.status == 200
+            for _ in range(300):
+                if send_message.await_count >= 4:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await client.close()
+
+    # 两条更新各有处理中提示 + 结果，第一条没有超时失败
+    texts = [call.kwargs.get("text", "") for call in send_message.await_args_list]
+    assert send_message.await_count == 4
+    assert not any("处理失败" in text for text in texts)
+
+
+@pytest.mark.asyncio
+async def test_webhook_unavailable_when_telegram_unreachable(webhook_env):
+    """测试启动时连接 Telegram 失败，API 照常运行，webhook 返回 503 让 Telegram 重发"""
+    from telegram.error import NetworkError
+
+    with patch.object(ExtBot, "get_me", AsyncMock(side_effect=NetworkError("down"))):
+        app, client = await make_client()
+        try:
+            resp = await client.post("/telegram/webhook", json=UPDATE,
+                                     headers={"X-Telegram-Bot-Api-Secret-Token": "s3cret"})
+            health = await client.get("/health")
+        finally:
+            await client.close()
+
+    assert resp.status == 503
+    assert health.status == 200
+
+
+def test_webhook_secret_derived_from_token(monkeypatch):
+    """测试未配置密钥时由 BOT_TOKEN 派生，且符合 Telegram 的字符限制"""
+    from config import Config
+    from handlers.telegram_bot import webhook_secret
+
+    monkeypatch.setenv("BOT_TOKEN", "123:test_token")
+    secret = webhook_secret(Config())
+
+    assert secret == webhook_secret(Config())
+    assert secret.isalnum() and len(secret) <= 256
@@ -0,0 +1,40 @@
+from utils.url_expiry import parse_url_expiry
+
+
+def test_no_expiry():
+    """测试普通地址没有过期时间"""
+    assert parse_url_expiry("https://video.twimg.com/ext_tw_video/1/pu/vid/avc1/1280x720/a.mp4?tag=12") is None
+    assert parse_url_expiry(None) is None
+
+
+def test_expires_query_param():
+    """测试 expires / exp 等参数"""
+    assert parse_url_expiry("https://cdn.example.com/a.mp4?Expires=1700000000&Signature=x") == 1700000000
+    assert parse_url_expiry("https://cdn.example.com/a.mp4?sig=x&exp=1700000000") == 1700000000
+
+
+def test_milliseconds():
+    """测试毫秒时间戳"""
+    assert parse_url_expiry("https://cdn.example.com/a.mp4?e=1700000000123") == 1700000000.123
+
+
+def test_akamai_token():
+    """测试嵌在 token 参数中的过期时间"""
+    url = "https://cdn.example.com/a.mp4?hdnts=st%3D1699990000~exp%3D1700000000~acl%3D%2F*~hmac%3Dabc"
+    assert parse_url_expiry(url) == 1700000000
+
+
+def test_s3_presigned():
+    """测试 S3 预签名地址"""
+    url = "https://bucket.s3.amazonaws.com/a.mp4?X-Amz-Date=20231114T221320Z&X-Amz-Expires=3600&X-Amz-Signature=x"
+    assert parse_url_expiry(url) == 1700000000 + 3600
+
+
+def test_earliest_expiry_wins():
+    """测试多个提示时取最早的"""
+    assert parse_url_expiry("https://cdn.example.com/a.mp4?expires=1700000500&exp=1700000000") == 1700000000
+
+
+def test_ignores_unrelated_numbers():
+    """测试不把其他参数误认为过期时间"""
+    assert parse_url_expiry("https://cdn.example.com/a.mp4?id=1700000000&size=1700000000") is None
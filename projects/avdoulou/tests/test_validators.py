@@ -1,6 +1,6 @@
 # tests/test_validators.py
 import pytest
-from utils.validators import is_x_video_url, extract_tweet_id
+from utils.validators import is_x_video_url, extract_tweet_id, extract_x_urls
 
 
 def test_valid_x_url():
@@ -29,3 +29,20 @@ def test_extract_tweet_id_invalid():
     """测试无效链接返回 None"""
     assert extract_tweet_id("https://youtube.com/watch?v=123") is None
     assert extract_tweet_id("not a url") is None
+
+
+def test_extract_x_urls():
+    """测试提取消息中的多个推文链接，按推文 ID 去重并保持顺序"""
+    text = (
+        "看这个 https://x.com/a/status/1?s=20 和 https://twitter.com/i/web/status/2，"
+        "还有 https://x.com/a/status/1/video/1 https://youtube.com/watch?v=3 "
+        "https://www.x.com/b/status/4."
+    )
+
+    assert extract_x_urls(text) == [
+        "https://x.com/a/status/1?s=20",
+        "https://twitter.com/i/web/status/2",
+        "https://www.x.com/b/status/4",
+    ]
+    assert extract_x_urls("没有链接") == []
+    assert extract_x_urls("") == []
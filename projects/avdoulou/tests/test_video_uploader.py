@@ -0,0 +1,146 @@
+# tests/test_video_uploader.py
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from telegram.error import BadRequest
+
+from handlers.models import VideoInfo
+from handlers.video_uploader import VideoUploader
+
+
+VIDEO_BYTES = b"\x00\x00\x00\x18ftypmp42" + b"x" * 4096
+
+
+async def start_cdn():
+    requests = []
+
+    async def video(request):
+        requests.append(request.path)
+        return web.Response(body=VIDEO_BYTES, headers={"Content-Type": "video/mp4"})
+
+    app = web.Application()
+    app.router.add_get("/video.mp4", video)
+    server = TestServer(app)
+    await server.start_server()
+    return server, requests
+
+
+def make_message(file_id: str = "FILE_ID"):
+    message = MagicMock()
+    message.reply_video = AsyncMock(return_value=SimpleNamespace(video=SimpleNamespace(file_id=file_id)))
+    return message
+
+
+def make_video(url: str) -> VideoInfo:
+    return VideoInfo(url=url, title="Test Video", duration=10, width=1280, height=720)
+
+
+@pytest.mark.asyncio
+async def test_send_uploads_from_memory_and_caches_file_id():
+    """测试小视频读入内存后上传，并按推文 ID 缓存 file_id"""
+    server, requests = await start_cdn()
+    uploader = VideoUploader()
+    video = make_video(str(server.make_url("/video.mp4")))
+    try:
+        first = make_message()
+        assert await uploader.send(first, video, "123")
+        assert first.reply_video.await_args.kwargs["video"] == VIDEO_BYTES
+
+        second = make_message()
+        assert await uploader.send(second, video, "123")
+        assert second.reply_video.await_args.kwargs["video"] == "FILE_ID"
+        assert len(requests) == 1
+    finally:
+        await uploader.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_send_skips_videos_over_limit():
+    """测试超过上传上限时返回 False，由调用方回复直链"""
+    server, _ = await start_cdn()
+    uploader = VideoUploader(max_upload_bytes=1024)
+    try:
+        message = make_message()
+        assert not await uploader.send(message, make_video(str(server.make_url("/video.mp4"))), "123")
+        message.reply_video.assert_not_awaited()
+        assert uploader.file_ids.get("123") is None
+    finally:
+        await uploader.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_send_reuploads_when_file_id_rejected():
+    """测试缓存的 file_id 失效时重新上传"""
+    server, requests = await start_cdn()
+    uploader = VideoUploader()
+    uploader.file_ids.set("123", "STALE")
+    message = make_message(file_id="NEW")
+    message.reply_video.side_effect = [
+        BadRequest("Wrong file identifier"),
+        SimpleNamespace(video=SimpleNamespace(file_id="NEW")),
+    ]
+    try:
+        assert await uploader.send(message, make_video(str(server.make_url("/video.mp4"))), "123")
+    finally:
+        await uploader.close()
+        await server.close()
+
+    assert len(requests) == 1
+    assert uploader.file_ids.get("123") == "NEW"
+
+
+@pytest.mark.asyncio
+async def test_file_ids_persisted_and_restored(tmp_path):
+    """测试 file_id 写入持久化存储，新的上传器启动时载入"""
+    from utils.store import ResolutionStore
+
+    path = str(tmp_path / "store.db")
+    server, _ = await start_cdn()
+    store = ResolutionStore(path)
+    uploader = VideoUploader(store=store)
+    try:
+        assert await uploader.send(make_message(), make_video(str(server.make_url("/video.mp4"))), "123")
+    finally:
+        await uploader.close()
+        await store.close()
+        await server.close()
+
+    store = ResolutionStore(path)
+    restarted = VideoUploader(store=store)
+    assert await restarted.restore() == 1
+    assert restarted.file_ids.get("123") == "FILE_ID"
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_does_not_copy_video():
+    """测试读入内存时不复制整段数据，峰值内存接近视频大小而不是两倍"""
+    import tracemalloc
+
+    size = 8 * 1024 * 1024
+    body = b"x" * size
+
+    async def video(request):
+        return web.Response(body=body, headers={"Content-Type": "video/mp4"})
+
+    app = web.Application()
+    app.router.add_get("/big.mp4", video)
+    server = TestServer(app)
+    await server.start_server()
+    uploader = VideoUploader()
+    try:
+        tracemalloc.start()
+        data = await uploader.fetch(str(server.make_url("/big.mp4")))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        await uploader.close()
+        await server.close()
+
+    assert isinstance(data, bytes) and len(data) == size
+    assert peak < size * 1.5
@@ -0,0 +1,136 @@
+import pytest
+from unittest.mock import MagicMock
+from handlers.ydl_pool import YoutubeDLPool
+from utils.cookies import CookieFile
+
+
+OPTS = {"quiet": True, "extract_flat": True}
+
+
+def make_pool(**kwargs):
+    factory = MagicMock(side_effect=lambda opts, cookie: MagicMock(name="ydl"))
+    return YoutubeDLPool(factory=factory, **kwargs), factory
+
+
+def test_checkout_reuses_instance():
+    """测试归还后的实例会被再次借出"""
+    pool, factory = make_pool()
+
+    with pool.checkout(OPTS) as first:
+        pass
+    with pool.checkout(OPTS) as second:
+        pass
+
+    assert first is second
+    assert factory.call_count == 1
+    assert pool.stats()["reused"] == 1
+
+
+def test_checkout_keys_by_cookie_identity(tmp_path):
+    """测试不同 Cookie 使用不同的实例"""
+    pool, factory = make_pool()
+
+    with pool.checkout(OPTS, CookieFile("auth_token=a", str(tmp_path))) as first:
+        pass
+    with pool.checkout(OPTS, CookieFile("auth_token=b", str(tmp_path))) as second:
+        pass
+
+    assert first is not second
+    assert factory.call_count == 2
+
+
+def test_instance_recycled_after_max_uses():
+    """测试实例达到使用次数上限后重建"""
+    pool, factory = make_pool(max_uses=2)
+
+    for _ in range(3):
+        with pool.checkout(OPTS):
+            pass
+
+    assert factory.call_count == 2
+    assert pool.stats()["recycled"] == 1
+
+
+def test_instance_discarded_on_error():
+    """测试出错的实例被丢弃"""
+    pool, factory = make_pool()
+
+    with pytest.raises(RuntimeError):
+        with pool.checkout(OPTS) as ydl:
+            raise RuntimeError("extract failed")
+
+    ydl.close.assert_called_once()
+    assert pool.stats()["idle"] == 0
+    assert pool.stats()["discarded"] == 1
+
+
+def test_idle_instances_bounded():
+    """测试空闲实例数量不超过 max_idle"""
+    pool, factory = make_pool(max_idle=1)
+
+    with pool.checkout(OPTS):
+        with pool.checkout(OPTS):
+            pass
+
+    assert factory.call_count == 2
+    assert pool.stats()["idle"] == 1
+
+
+def test_warm_up():
+    """测试预热创建空闲实例"""
+    pool, factory = make_pool(max_idle=3)
+
+    assert pool.warm_up(OPTS) == 3
+    assert pool.warm_up(OPTS) == 0
+    assert pool.stats()["idle"] == 3
+
+    pool.clear()
+    assert pool.stats()["idle"] == 0
+
+
+def test_create_youtube_dl_loads_cookie_into_memory(tmp_path):
+    """测试 Cookie 载入内存，且关闭实例时不会改写共享的 Cookie 文件"""
+    from handlers.ydl_pool import create_youtube_dl
+
+    cookies = CookieFile("auth_token=abc123; ct0=xyz789", str(tmp_path))
+    path = cookies.path()
+    with open(path) as f:
+        original = f.read()
+
+    ydl = create_youtube_dl(OPTS, path)
+
+    assert "cookiefile" not in ydl.params
+    assert {c.name for c in ydl.cookiejar} == {"auth_token", "ct0"}
+    ydl.close()
+    with open(path) as f:
+        assert f.read() == original
+    cookies.invalidate()
+
+
+def test_create_youtube_dl_registers_twitter_extractors_only():
+    """测试实例只注册 Twitter 相关的提取器"""
+    from handlers.ydl_pool import create_youtube_dl
+
+    ydl = create_youtube_dl(OPTS)
+
+    assert "Twitter" in ydl._ies
+    assert all(key.startswith("Twitter") for key in ydl._ies)
+    assert ydl._ies["Twitter"].suitable("https://x.com/user/status/123456")
+    ydl.close()
+
+
+def test_yt_dlp_not_imported_until_first_extraction():
+    """测试导入解析、格式化模块和服务入口时不会导入 yt-dlp"""
+    import os
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    code = "import sys, utils.formatter, handlers.link_handler, server; print('yt_dlp' in sys.modules)"
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).parent.parent, capture_output=True, text=True, check=True,
+        env={**os.environ, "BOT_TOKEN": "test_token"},
+    ).stdout
+
+    assert output.strip() == "False"
@@ -0,0 +1,181 @@
+"""批量归档下载（scripts/download_x_video.py --batch）。
+
+- 从文件或标准输入读取链接，按推文 ID 去重
+- 已记录在清单（manifest，JSONL）中的推文直接跳过，每处理完成一条立即追加到清单，中断后重新运行即可继续
+- 推文已删除、不可见或没有视频时同样记入清单，以后不再重复解析；只有解析或下载失败的推文下次重试
+- 解析和下载并发执行，并发数有上限
+- 每条推文的处理结果写入 JSONL 报告
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable, TextIO
+
+from handlers.models import MediaResult, VideoInfo
+from utils.validators import extract_tweet_id
+
+
+__all__ = ['ArchiveEntry', 'ArchiveResult', 'Manifest', 'read_urls', 'run_batch']
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4
+
+# 处理结果
+STATUS_DOWNLOADED = "downloaded"
+STATUS_SKIPPED = "skipped"  # 清单中已存在
+STATUS_EXISTS = "exists"  # 目标文件已存在（未指定 --overwrite）
+STATUS_NO_VIDEO = "no_video"  # 推文只有图片
+STATUS_NOT_FOUND = "not_found"  # 推文已删除、不可见或只有文字
+STATUS_ERROR = "error"  # 解析或下载失败（包括 X 暂时无法访问），下次运行时重试
+# 记入清单、以后不再处理的结果
+TERMINAL_STATUSES = frozenset((STATUS_DOWNLOADED, STATUS_EXISTS, STATUS_NO_VIDEO, STATUS_NOT_FOUND))
+
+
+@dataclass
+class ArchiveEntry:
+    """待下载的推文"""
+    tweet_id: str
+    url: str
+
+
+@dataclass
+class ArchiveResult:
+    """一条推文的处理结果（报告中的一行）"""
+    tweet_id: str
+    url: str
+    status: str
+    file: str | None = None
+    size: int | None = None
+    error: str | None = None
+    elapsed: float = 0.0
+
+
+def read_urls(lines: Iterable[str]) -> tuple[list[ArchiveEntry], list[str]]:
+    """读取链接（每行一个，# 开头为注释），按推文 ID 去重，返回 (有效条目, 无效行)"""
+    entries = []
+    invalid = []
+    seen = set()
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        tweet_id = extract_tweet_id(line)
+        if not tweet_id:
+            invalid.append(line)
+            continue
+        if tweet_id in seen:
+            continue
+        seen.add(tweet_id)
+        entries.append(ArchiveEntry(tweet_id=tweet_id, url=line))
+    return entries, invalid
+
+
+class Manifest:
+    """已处理推文清单（JSONL，每行一条记录）"""
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = Path(path)
+        self.done: set[str] = set()
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # 上次写入时中断留下的半行
+                    if isinstance(record, dict) and record.get("tweet_id"):
+                        self.done.add(str(record["tweet_id"]))
+
+    def __contains__(self, tweet_id: str) -> bool:
+        return tweet_id in self.done
+
+    def add(self, result: ArchiveResult) -> None:
+        """追加一条记录并立即落盘"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        record = {
+            "tweet_id": result.tweet_id,
+            "url": result.url,
+            "status": result.status,
+            "file": result.file,
+            "size": result.size,
+            "archived_at": int(time.time()),
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.done.add(result.tweet_id)
+
+
+async def run_batch(
+    entries: list[ArchiveEntry],
+    resolve: Callable[[str], Awaitable[MediaResult]],
+    download: Callable[[VideoInfo, Path], Awaitable[Path]],
+    output_dir: Path,
+    manifest: Manifest,
+    report: TextIO | None = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    overwrite: bool = False,
+    on_result: Callable[[ArchiveResult], None] | None = None,
+) -> list[ArchiveResult]:
+    """并发解析并下载，文件保存为 <output_dir>/<推文 ID>.mp4，按完成顺序写报告"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def process(entry: ArchiveEntry) -> ArchiveResult:
+        if entry.tweet_id in manifest:
+            return ArchiveResult(entry.tweet_id, entry.url, STATUS_SKIPPED)
+
+        async with semaphore:
+            start = time.perf_counter()
+            result = await _archive_one(entry, resolve, download, output_dir, overwrite)
+            result.elapsed = round(time.perf_counter() - start, 3)
+
+        if result.status in TERMINAL_STATUSES:
+            manifest.add(result)
+        return result
+
+    results = []
+    tasks = [asyncio.ensure_future(process(entry)) for entry in entries]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            results.append(result)
+            if report is not None:
+                report.write(json.dumps(asdict(result), ensure_ascii=False) + "\n")
+                report.flush()
+            if on_result is not None:
+                on_result(result)
+    finally:
+        for task in tasks:
+            task.cancel()
+    return results
+
+
+async def _archive_one(
+    entry: ArchiveEntry,
+    resolve: Callable[[str], Awaitable[MediaResult]],
+    download: Callable[[VideoInfo, Path], Awaitable[Path]],
+    output_dir: Path,
+    overwrite: bool,
+) -> ArchiveResult:
+    target = output_dir / f"{entry.tweet_id}.mp4"
+    if target.exists() and not overwrite:
+        return ArchiveResult(entry.tweet_id, entry.url, STATUS_EXISTS, str(target), target.stat().st_size)
+
+    try:
+        content = await resolve(entry.url)
+        if not content.found:
+            # X 无法访问时 resolve 抛出 UpstreamError，走下面的失败分支；这里只剩推文已删除、不可见或只有文字
+            return ArchiveResult(entry.tweet_id, entry.url, STATUS_NOT_FOUND)
+        if not content.video:
+            return ArchiveResult(entry.tweet_id, entry.url, STATUS_NO_VIDEO)
+        path = await download(content.video, target)
+    except Exception as e:
+        logger.debug(f"Archiving {entry.tweet_id} failed", exc_info=True)
+        return ArchiveResult(entry.tweet_id, entry.url, STATUS_ERROR, error=str(e) or type(e).__name__)
+
+    return ArchiveResult(entry.tweet_id, entry.url, STATUS_DOWNLOADED, str(path), path.stat().st_size)
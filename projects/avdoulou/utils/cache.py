@@ -0,0 +1,95 @@
+"""进程内 LRU + TTL 缓存。
+
+用于缓存推文解析结果，键为推文 ID，避免同一条推文在短时间内反复调用 yt-dlp。
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+__all__ = ['TTLCache']
+
+
+class TTLCache:
+    """带过期时间的 LRU 缓存
+
+    - 超过 maxsize 时淘汰最久未使用的条目
+    - 条目超过 ttl 秒后视为过期，读取时惰性删除；set() 可为单个条目指定更短的 ttl
+    - maxsize 或 ttl 为 0 时缓存关闭（get 永远未命中，set 不保存）
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 600, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        # key -> [过期时间, 值, 命中次数]
+        self._data: OrderedDict[Hashable, list] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """读取缓存，命中时刷新 LRU 顺序"""
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def get_entry(self, key: Hashable) -> tuple[Any, float, int] | None:
+        """读取缓存，返回 (值, 剩余有效秒数, 该条目的命中次数)，未命中时返回 None"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        remaining = entry[0] - self._clock()
+        if remaining <= 0:
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        entry[2] += 1
+        return entry[1], remaining, entry[2]
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """写入缓存，ttl 不能超过缓存的默认 ttl；ttl <= 0 时不保存"""
+        if not self.enabled:
+            return
+
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            self._data.pop(key, None)
+            return
+
+        self._data[key] = [self._clock() + ttl, value, 0]
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > self._clock()
+
+    def stats(self) -> dict:
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,141 @@
+"""上游熔断器。
+
+X 开始返回 429 或要求登录时，后续的提取几乎都会失败，但每次仍要占用解析线程数秒。
+熔断器按错误类型统计连续失败：
+
+- 限流、认证失败、5xx / 超时（classify_error 分类为 rate_limited / auth / upstream）计为失败
+- 推文不存在等错误说明 X 正常响应，与成功一样清零计数
+- 连续失败达到 failure_threshold 次后熔断（open），open_seconds 内的提取直接抛出 CircuitOpenError
+- 到期后进入半开（half_open），只放行一个探测请求：成功则恢复（closed），
+  失败则再次熔断，熔断时间翻倍，最长 max_open_seconds
+- 熔断前已在进行的提取在熔断期间失败时只计数，不会再次熔断或延长熔断时间
+
+只在事件循环中调用，不需要加锁。
+"""
+import logging
+import time
+from typing import Callable
+
+from utils.exceptions import (
+    CircuitOpenError, ERROR_AUTH, ERROR_RATE_LIMITED, ERROR_UPSTREAM,
+)
+
+
+__all__ = ['CircuitBreaker', 'CLOSED', 'OPEN', 'HALF_OPEN']
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_OPEN_SECONDS = 30.0
+DEFAULT_MAX_OPEN_SECONDS = 600.0
+# 半开状态下探测请求进行中时，其他请求的重试等待时间（秒）
+PROBE_RETRY_AFTER = 5.0
+# 计为失败的错误类型
+TRIPPING_ERRORS = frozenset((ERROR_RATE_LIMITED, ERROR_AUTH, ERROR_UPSTREAM))
+
+
+class CircuitBreaker:
+    """按错误类型计数的熔断器，半开探测失败时熔断时间指数增长"""
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        open_seconds: float = DEFAULT_OPEN_SECONDS,
+        max_open_seconds: float = DEFAULT_MAX_OPEN_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        # failure_threshold 为 0 表示不启用
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self._clock = clock
+        self.state = CLOSED
+        self.failures = 0  # 连续失败次数
+        self.strikes = 0  # 连续熔断次数，决定熔断时间
+        self.open_until = 0.0
+        self.last_error: str | None = None
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+
+    def before_call(self) -> None:
+        """提取前调用，熔断中直接抛出异常
+
+        Raises:
+            CircuitOpenError: 熔断中，或半开状态下已有探测请求
+        """
+        if not self.enabled or self.state == CLOSED:
+            return
+        now = self._clock()
+        if self.state == OPEN:
+            if now < self.open_until:
+                self.rejected += 1
+                raise CircuitOpenError(
+                    f"X upstream circuit open ({self.last_error})", retry_after=self.open_until - now
+                )
+            self.state = HALF_OPEN
+            logger.info("X upstream circuit half-open, probing")
+        if self._probing:
+            self.rejected += 1
+            raise CircuitOpenError(f"X upstream circuit half-open ({self.last_error})", retry_after=PROBE_RETRY_AFTER)
+        self._probing = True
+
+    def record_success(self) -> None:
+        """X 正常响应"""
+        self._probing = False
+        self.failures = 0
+        if self.state != CLOSED:
+            logger.info("X upstream circuit closed")
+            self.state = CLOSED
+            self.strikes = 0
+
+    def record_failure(self, error_kind: str) -> None:
+        """记录一次失败，只有限流、认证和上游错误计入熔断"""
+        if error_kind not in TRIPPING_ERRORS:
+            self.record_success()
+            return
+        self._probing = False
+        self.last_error = error_kind
+        self.failures += 1
+        # 熔断前已发出的提取陆续失败时只计数，不延长熔断时间
+        if not self.enabled or self.state == OPEN:
+            return
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._open()
+
+    def release(self) -> None:
+        """提取没有到达 X（被取消、解析队列已满），不影响状态，只释放探测名额"""
+        self._probing = False
+
+    def reset(self) -> None:
+        """立即恢复（例如更换 Cookie 后）"""
+        self._probing = False
+        self.failures = 0
+        self.strikes = 0
+        self.state = CLOSED
+
+    def _open(self) -> None:
+        duration = min(self.open_seconds * 2 ** self.strikes, self.max_open_seconds)
+        self.strikes += 1
+        self.state = OPEN
+        self.open_until = self._clock() + duration
+        self.opened += 1
+        logger.warning(f"X upstream circuit open for {duration:.0f}s after {self.failures} failure(s) ({self.last_error})")
+
+    def stats(self) -> dict:
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'open_for': max(0.0, round(self.open_until - self._clock(), 1)) if self.state == OPEN else 0.0,
+            'last_error': self.last_error,
+            'opened': self.opened,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,129 @@
+"""Twitter/X Cookie 工具。
+
+把浏览器复制的 Cookie 字符串（auth_token=xxx; ct0=xxx）转换成 yt-dlp 需要的 Netscape 格式。
+"""
+import atexit
+import hashlib
+import os
+import tempfile
+import threading
+
+
+__all__ = ['parse_cookie_string', 'write_netscape_cookie_file', 'cookie_identity', 'CookieFile']
+
+
+def parse_cookie_string(cookie: str) -> list[tuple[str, str]]:
+    """解析 Cookie 字符串，跳过空 name 或空 value 的条目"""
+    pairs = []
+    for item in cookie.strip().split(';'):
+        item = item.strip()
+        if '=' not in item:
+            continue
+        name, value = item.split('=', 1)
+        name = name.strip()
+        value = value.strip()
+        if name and value:
+            pairs.append((name, value))
+    return pairs
+
+
+def write_netscape_cookie_file(cookie: str, directory: str | None = None) -> str | None:
+    """把 Cookie 字符串写入唯一的临时文件（Netscape 格式），返回文件路径
+
+    未配置 Cookie 时返回 None
+    """
+    if not cookie.strip():
+        return None
+
+    # 创建唯一的临时 cookie 文件，mkstemp 保证权限为 0600
+    fd, cookie_file = tempfile.mkstemp(suffix="_twitter_cookies.txt", prefix="avdoulou_", dir=directory)
+
+    try:
+        with os.fdopen(fd, 'w') as f:
+            # Netscape 格式头部（可选，但某些工具需要）
+            f.write("# Netscape HTTP Cookie File\n")
+            f.write("# This file is generated by avdoulou\n\n")
+
+            for name, value in parse_cookie_string(cookie):
+                # Netscape 格式: domain \t flag \t path \t secure \t expiration \t name \t value
+                # flag: TRUE 表示可用于所有子域名
+                # secure: FALSE 表示非 HTTPS 专用（虽然 x.com 用 HTTPS，但 yt-dlp 期望 FALSE）
+                f.write(f".x.com\tTRUE\t/\tFALSE\t0\t{name}\t{value}\n")
+
+        return cookie_file
+    except Exception:
+        try:
+            os.remove(cookie_file)
+        except OSError:
+            pass
+        raise
+
+
+def cookie_identity(cookie: str | None) -> str | None:
+    """Cookie 的短指纹，用于区分账号而不在日志或键中暴露 Cookie 本身"""
+    if not cookie or not cookie.strip():
+        return None
+    return hashlib.sha256(cookie.strip().encode()).hexdigest()[:16]
+
+
+def _default_cookie_dir() -> str | None:
+    """优先使用内存文件系统 /dev/shm，避免 Cookie 落盘"""
+    shm = "/dev/shm"
+    if os.path.isdir(shm) and os.access(shm, os.W_OK):
+        return shm
+    return None
+
+
+class CookieFile:
+    """进程内共享的 Cookie 文件
+
+    首次使用时写入一次（权限 0600，优先放在 /dev/shm），之后所有请求复用同一路径。
+    Cookie 轮换时调用 update()，旧文件会被删除并在下次使用时重新生成；进程退出时自动清理。
+    """
+
+    def __init__(self, cookie: str = "", directory: str | None = None):
+        self._cookie = cookie.strip()
+        self._directory = directory if directory is not None else _default_cookie_dir()
+        self._path: str | None = None
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+
+    @property
+    def identity(self) -> str | None:
+        """当前 Cookie 的指纹"""
+        return cookie_identity(self._cookie)
+
+    def __bool__(self) -> bool:
+        return bool(self._cookie)
+
+    def path(self) -> str | None:
+        """返回 Cookie 文件路径，必要时生成；未配置 Cookie 时返回 None"""
+        if not self._cookie:
+            return None
+
+        with self._lock:
+            if self._path is None or not os.path.exists(self._path):
+                self._path = write_netscape_cookie_file(self._cookie, self._directory)
+                if not self._atexit_registered:
+                    atexit.register(self.invalidate)
+                    self._atexit_registered = True
+            return self._path
+
+    def update(self, cookie: str) -> bool:
+        """更换 Cookie，内容有变化时返回 True"""
+        cookie = cookie.strip()
+        if cookie == self._cookie:
+            return False
+        self.invalidate()
+        self._cookie = cookie
+        return True
+
+    def invalidate(self) -> None:
+        """删除已生成的文件，下次使用时重新生成"""
+        with self._lock:
+            path, self._path = self._path, None
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
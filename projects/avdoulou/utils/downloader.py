@@ -0,0 +1,268 @@
+"""分段并发下载（支持断点续传）。
+
+流程：
+1. 用 Range: bytes=0-0 探测文件大小以及服务器是否支持 Range
+2. 预分配 <文件>.part，按字节范围切分成若干段，通过同一个连接池并发下载
+3. 每段用 os.pwrite 写入各自的偏移位置，不需要按顺序拼接
+4. 各段进度保存在 <文件>.part.json 中，中断后重新运行会从已下载的位置继续
+5. 全部完成后把 .part 重命名为目标文件并删除状态文件
+
+服务器不支持 Range 时退化为单连接顺序下载（不支持续传）。
+签名地址每次解析都会变化，因此续传时只核对文件大小和 ETag / Last-Modified，不比较地址。
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable
+
+import aiohttp
+
+
+__all__ = ['DownloadError', 'SegmentedDownloader', 'split_ranges']
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENTS = 4
+MIN_SEGMENT_SIZE = 1024 * 1024
+DEFAULT_CHUNK_SIZE = 256 * 1024
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_RETRIES = 3
+# 状态文件最短保存间隔（秒）
+STATE_SAVE_INTERVAL = 1.0
+
+
+class DownloadError(Exception):
+    """下载失败（已下载的部分会保留，重新运行可续传）"""
+    pass
+
+
+def split_ranges(size: int, segments: int, min_size: int = MIN_SEGMENT_SIZE) -> list[list[int]]:
+    """把 [0, size) 切分成最多 segments 段，每段不小于 min_size，返回 [start, end]（闭区间）列表"""
+    if size <= 0:
+        return []
+    count = max(1, min(segments, size // max(min_size, 1)))
+    step = -(-size // count)
+    return [[start, min(start + step, size) - 1] for start in range(0, size, step)]
+
+
+def _pwrite(fd: int, data: bytes, offset: int) -> None:
+    if hasattr(os, 'pwrite'):
+        os.pwrite(fd, data, offset)
+    else:
+        # Windows 没有 pwrite；写入之间没有 await，不会与其他协程交错
+        os.lseek(fd, offset, os.SEEK_SET)
+        os.write(fd, data)
+
+
+class SegmentedDownloader:
+    """分段并发下载器"""
+
+    def __init__(
+        self,
+        segments: int = DEFAULT_SEGMENTS,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        min_segment_size: int = MIN_SEGMENT_SIZE,
+        headers: dict | None = None,
+    ):
+        self.segments = max(1, segments)
+        self.chunk_size = chunk_size
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+        self.retries = retries
+        self.min_segment_size = min_segment_size
+        self.headers = {
+            "User-Agent": "Mozilla/5.0 (compatible; avdoulou)",
+            "Referer": "https://x.com/",
+            "Accept-Encoding": "identity",
+            **(headers or {}),
+        }
+
+    async def download(
+        self,
+        url: str,
+        path: str | os.PathLike,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> int:
+        """下载 url 到 path，返回文件大小；progress(已下载字节数, 总字节数) 在每个块写入后调用
+
+        Raises:
+            DownloadError: 请求失败且重试次数用尽，已下载的部分保留在 .part 文件中
+        """
+        path = Path(path)
+        part_path = path.with_name(path.name + '.part')
+        state_path = path.with_name(path.name + '.part.json')
+
+        connector = aiohttp.TCPConnector(limit=self.segments)
+        async with aiohttp.ClientSession(
+            connector=connector, timeout=self.timeout, headers=self.headers, auto_decompress=False,
+        ) as session:
+            size, validator = await self._probe(session, url)
+            if size is None:
+                logger.info("Server does not support range requests, downloading sequentially")
+                size = await self._download_sequential(session, url, part_path, progress)
+                state_path.unlink(missing_ok=True)
+            else:
+                await self._download_segmented(session, url, size, validator, part_path, state_path, progress)
+
+        os.replace(part_path, path)
+        state_path.unlink(missing_ok=True)
+        return size
+
+    async def _probe(self, session: aiohttp.ClientSession, url: str) -> tuple[int | None, str]:
+        """返回 (文件大小, ETag 或 Last-Modified)；不支持 Range 时大小为 None"""
+        try:
+            async with session.get(url, headers={"Range": "bytes=0-0"}) as resp:
+                if resp.status >= 400:
+                    raise DownloadError(f"HTTP {resp.status} while probing {url[:80]}")
+                validator = resp.headers.get("ETag") or resp.headers.get("Last-Modified") or ""
+                content_range = resp.headers.get("Content-Range", "")
+                if resp.status != 206 or "/" not in content_range:
+                    return None, validator
+                total = content_range.rsplit("/", 1)[1]
+                return (int(total) if total.isdigit() else None), validator
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise DownloadError(f"Probing {url[:80]} failed: {e}") from e
+
+    def _load_state(self, state_path: Path, size: int, validator: str) -> list[list[int]] | None:
+        """读取续传状态，文件已变化或状态损坏时返回 None"""
+        try:
+            state = json.loads(state_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        if state.get('size') != size or state.get('validator') != validator:
+            logger.info("Remote file changed, restarting download")
+            return None
+        segments = state.get('segments')
+        if not isinstance(segments, list) or not all(
+            isinstance(s, list) and len(s) == 3 and s[0] <= s[2] <= s[1] + 1 for s in segments
+        ):
+            return None
+        return segments
+
+    @staticmethod
+    def _save_state(state_path: Path, size: int, validator: str, segments: list[list[int]]) -> None:
+        tmp_path = state_path.with_name(state_path.name + '.tmp')
+        tmp_path.write_text(
+            json.dumps({'size': size, 'validator': validator, 'segments': segments}),
+            encoding='utf-8',
+        )
+        os.replace(tmp_path, state_path)
+
+    async def _download_segmented(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        size: int,
+        validator: str,
+        part_path: Path,
+        state_path: Path,
+        progress: Callable[[int, int], None] | None,
+    ) -> None:
+        # 每段为 [start, end, 下一个待写入的偏移]
+        segments = None
+        if part_path.exists() and part_path.stat().st_size == size:
+            segments = self._load_state(state_path, size, validator)
+        if segments is None:
+            segments = [[start, end, start] for start, end in split_ranges(size, self.segments, self.min_segment_size)]
+
+        fd = os.open(part_path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            if os.fstat(fd).st_size != size:
+                # 预分配，避免边写边扩展文件
+                os.ftruncate(fd, size)
+                if hasattr(os, 'posix_fallocate'):
+                    try:
+                        os.posix_fallocate(fd, 0, size)
+                    except OSError:
+                        pass  # 文件系统不支持时保留稀疏文件
+
+            downloaded = sum(s[2] - s[0] for s in segments)
+            last_save = time.monotonic()
+
+            def on_chunk(length: int) -> None:
+                nonlocal downloaded, last_save
+                downloaded += length
+                if progress:
+                    progress(downloaded, size)
+                if time.monotonic() - last_save >= STATE_SAVE_INTERVAL:
+                    self._save_state(state_path, size, validator, segments)
+                    last_save = time.monotonic()
+
+            self._save_state(state_path, size, validator, segments)
+            tasks = [
+                asyncio.ensure_future(self._fetch_segment(session, url, fd, segment, on_chunk))
+                for segment in segments if segment[2] <= segment[1]
+            ]
+            try:
+                # 某一段失败时其他段继续下载，尽量多保留进度
+                results = await asyncio.gather(*tasks, return_exceptions=True)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                self._save_state(state_path, size, validator, segments)
+            errors = [r for r in results if isinstance(r, BaseException)]
+            if errors:
+                raise errors[0]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    async def _fetch_segment(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        fd: int,
+        segment: list[int],
+        on_chunk: Callable[[int], None],
+    ) -> None:
+        """下载一段，失败时从已写入的位置重试"""
+        attempt = 0
+        while segment[2] <= segment[1]:
+            try:
+                headers = {"Range": f"bytes={segment[2]}-{segment[1]}"}
+                async with session.get(url, headers=headers) as resp:
+                    if resp.status != 206:
+                        raise DownloadError(f"HTTP {resp.status} for range {segment[2]}-{segment[1]}")
+                    async for chunk in resp.content.iter_chunked(self.chunk_size):
+                        chunk = chunk[:segment[1] + 1 - segment[2]]
+                        _pwrite(fd, chunk, segment[2])
+                        segment[2] += len(chunk)
+                        on_chunk(len(chunk))
+                        if segment[2] > segment[1]:
+                            break
+                if segment[2] <= segment[1]:
+                    raise DownloadError(f"Connection closed at byte {segment[2]}")
+            except (aiohttp.ClientError, asyncio.TimeoutError, DownloadError) as e:
+                attempt += 1
+                if attempt > self.retries:
+                    raise DownloadError(f"Segment {segment[0]}-{segment[1]} failed: {e}") from e
+                logger.warning(f"Segment {segment[0]}-{segment[1]} interrupted at {segment[2]}, retrying: {e}")
+                await asyncio.sleep(min(2 ** attempt * 0.5, 5.0))
+
+    async def _download_sequential(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        part_path: Path,
+        progress: Callable[[int, int], None] | None,
+    ) -> int:
+        """单连接顺序下载"""
+        try:
+            async with session.get(url) as resp:
+                if resp.status != 200:
+                    raise DownloadError(f"HTTP {resp.status} for {url[:80]}")
+                total = resp.content_length or 0
+                downloaded = 0
+                with open(part_path, 'wb') as f:
+                    async for chunk in resp.content.iter_chunked(self.chunk_size):
+                        f.write(chunk)
+                        downloaded += len(chunk)
+                        if progress:
+                            progress(downloaded, total)
+                return downloaded
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise DownloadError(f"Downloading {url[:80]} failed: {e}") from e
@@ -0,0 +1,113 @@
+"""异常定义。"""
+import re
+
+
+class ServiceUnavailableError(Exception):
+    """解析服务暂时不可用
+
+    调用方应快速失败（HTTP 503 / Bot 提示稍后再试），而不是继续排队。
+    """
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ExtractorBusyError(ServiceUnavailableError):
+    """解析队列已满"""
+    pass
+
+
+class StreamLimitError(ServiceUnavailableError):
+    """同时转发的视频流已达上限"""
+    pass
+
+
+class CircuitOpenError(ServiceUnavailableError):
+    """X 连续返回限流 / 认证 / 服务器错误，暂停提取"""
+    pass
+
+
+# 上游错误分类
+ERROR_RATE_LIMITED = "rate_limited"  # 429 / 请求过多
+ERROR_AUTH = "auth"  # 401 / 403 / 需要登录，通常是 Cookie 失效
+ERROR_NOT_FOUND = "not_found"  # 推文不存在、已删除或没有媒体
+ERROR_UPSTREAM = "upstream"  # 5xx、超时、连接失败等
+ERROR_OTHER = "other"
+
+_STATUS_KINDS = (
+    (ERROR_RATE_LIMITED, (429,)),
+    (ERROR_AUTH, (401, 403)),
+    (ERROR_NOT_FOUND, (404, 410)),
+)
+
+# 只匹配明确的 HTTP 状态码（“HTTP Error 429”“status code: 503”），不匹配推文 ID 中的数字
+_STATUS_PATTERN = re.compile(r"\b(?:http error|status(?: code)?)\s*[:=]?\s*([1-5]\d\d)\b")
+# yt-dlp 错误信息的前缀“ERROR: [twitter] 1845029384756120429: ”
+_YTDLP_PREFIX = re.compile(r"^(?:error:\s*)?\[[^\]]+\]\s*[^\s:]+:\s*")
+
+_ERROR_PATTERNS = (
+    (ERROR_RATE_LIMITED, ("too many requests", "rate limit", "rate-limit")),
+    (ERROR_AUTH, ("unauthorized", "forbidden", "login", "log in",
+                  "authenticat", "authorization", "cookies")),
+    (ERROR_UPSTREAM, ("timed out", "timeout", "connection", "temporary failure", "network",
+                      "bad gateway", "service unavailable", "internal server error")),
+    (ERROR_NOT_FOUND, ("not found", "no video", "no status found",
+                       "does not exist", "unavailable", "has been deleted")),
+)
+
+
+class UpstreamError(Exception):
+    """提取失败（限流、认证失败、超时、X 服务器错误等），与“推文没有媒体”区分
+
+    kind 为上面的错误分类之一。调用方应返回 502 / 提示稍后重试，而不是“未找到视频”。
+    """
+
+    def __init__(self, message: str, kind: str = ERROR_OTHER):
+        super().__init__(message)
+        self.kind = kind
+
+
+def _status_code(error: BaseException) -> int | None:
+    """异常（及其原因）中的 HTTP 状态码：yt-dlp / urllib 的 HTTPError、aiohttp 的 ClientResponseError"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        for attr in ("status", "code"):
+            value = getattr(error, attr, None)
+            if isinstance(value, int) and 100 <= value <= 599:
+                return value
+        # DownloadError.exc_info / ExtractorError.cause 保存原始异常
+        exc_info = getattr(error, "exc_info", None)
+        cause = getattr(error, "cause", None)
+        if isinstance(exc_info, tuple) and len(exc_info) > 1 and isinstance(exc_info[1], BaseException):
+            error = exc_info[1]
+        elif isinstance(cause, BaseException):
+            error = cause
+        else:
+            error = error.__cause__ or error.__context__
+    return None
+
+
+def _classify_status(status: int) -> str:
+    for kind, statuses in _STATUS_KINDS:
+        if status in statuses:
+            return kind
+    return ERROR_UPSTREAM if status >= 500 else ERROR_OTHER
+
+
+def classify_error(error: BaseException | str) -> str:
+    """根据 HTTP 状态码或异常信息对 yt-dlp / HTTP 错误分类"""
+    if isinstance(error, BaseException):
+        status = _status_code(error)
+        if status is not None:
+            return _classify_status(status)
+
+    message = _YTDLP_PREFIX.sub("", str(error).strip().lower(), count=1)
+    match = _STATUS_PATTERN.search(message)
+    if match:
+        return _classify_status(int(match.group(1)))
+    for kind, patterns in _ERROR_PATTERNS:
+        if any(pattern in message for pattern in patterns):
+            return kind
+    return ERROR_OTHER
@@ -1,6 +1,8 @@
 # utils/formatter.py
+import math
 import re
-from handlers.link_handler import VideoInfo
+from handlers.models import MediaResult, VideoInfo
+from utils.exceptions import CircuitOpenError, ServiceUnavailableError
 
 # Telegram MarkdownV2 需要转义的字符
 MARKDOWN_ESCAPE_CHARS = r'_*[]()~`>#+-=|{}.!'
@@ -9,9 +11,11 @@ MARKDOWN_ESCAPE_PATTERN = re.compile(f'([{re.escape(MARKDOWN_ESCAPE_CHARS)}])')
 DEFAULT_RESOLUTION_TEXT = "未知"
 UNKNOWN_ERROR_MESSAGE = "❌ 发生未知错误"
 MAX_MESSAGE_LENGTH = 1024
+# Telegram 单条文本消息的长度上限
+TELEGRAM_TEXT_LIMIT = 4096
 
 
-__all__ = ['format_success_message', 'format_error_message']
+__all__ = ['format_success_message', 'format_error_message', 'format_unavailable_message', 'format_multi_results']
 
 
 def format_success_message(video: VideoInfo) -> str:
@@ -56,6 +60,46 @@ def format_error_message(error_type: str) -> str:
         "no_video": "❌ 该推文不包含视频",
         "parse_failed": "❌ 解析失败，可能是私密内容或链接已失效",
         "rate_limit": "⚠️ 请求过于频繁，请稍后再试",
+        "busy": "⚠️ 服务繁忙，请稍后再试",
+        "upstream": "⚠️ X 暂时限制了访问，请稍后再试",
     }
 
     return messages.get(error_type, UNKNOWN_ERROR_MESSAGE)
+
+
+def format_unavailable_message(error: ServiceUnavailableError) -> str:
+    """解析服务暂时不可用时的提示：区分 X 熔断和本地繁忙"""
+    if isinstance(error, CircuitOpenError):
+        return f"{format_error_message('upstream')}（约 {math.ceil(error.retry_after)} 秒后）"
+    return format_error_message("busy")
+
+
+def _format_result_block(index: int, url: str, result: MediaResult | BaseException) -> str:
+    if isinstance(result, ServiceUnavailableError):
+        return f"{index}. {format_unavailable_message(result)}\n{url}"
+    if isinstance(result, BaseException):
+        return f"{index}. ❌ 处理失败，请稍后重试\n{url}"
+    if result.type == "video" and result.video:
+        video = result.video
+        return f"{index}. 🎬 {video.title} ({video.width}x{video.height}, {video.duration}秒)\n{video.url}"
+    if result.type == "photos" and result.photos:
+        lines = [f"{index}. 📷 图片 {len(result.photos)} 张"]
+        lines.extend(photo.url for photo in result.photos)
+        return "\n".join(lines)
+    return f"{index}. ❌ 该推文不包含视频或图片\n{url}"
+
+
+def format_multi_results(items: list[tuple[str, MediaResult | BaseException]]) -> list[str]:
+    """把多条推文的解析结果按原始顺序合并成消息，超过 Telegram 长度上限时拆分成多条"""
+    header = f"🔗 共 {len(items)} 条推文"
+    messages = []
+    current = header
+    for index, (url, result) in enumerate(items, 1):
+        block = _format_result_block(index, url, result)[:TELEGRAM_TEXT_LIMIT - 2]
+        if len(current) + 2 + len(block) > TELEGRAM_TEXT_LIMIT:
+            messages.append(current)
+            current = block
+        else:
+            current = f"{current}\n\n{block}"
+    messages.append(current)
+    return messages
@@ -0,0 +1,331 @@
+"""HLS（m3u8）并发下载。
+
+部分 X 视频只提供 HLS：主播放列表（master）列出各分辨率的视频流，音频是单独的 EXT-X-MEDIA 轨道，
+每个流由 EXT-X-MAP 初始化片段和若干 fMP4 分片组成。yt-dlp / ffmpeg 逐个下载分片，
+速度受每个分片的往返延迟限制。
+
+这里按窗口并发下载分片（同时最多 window 个请求），按顺序写入文件，内存中最多保留 window 个分片：
+- 选择分辨率最高（相同时码率最高）的视频流
+- 视频流和音频轨道同时下载，完成后用 ffmpeg 无损合并（-c copy）
+- 没有单独音频轨道时直接拼接分片；TS 分片在有 ffmpeg 时转封装为 MP4
+
+不支持加密（EXT-X-KEY）和 EXT-X-BYTERANGE，遇到时抛出 HLSError，调用方回退到 yt-dlp。
+"""
+import asyncio
+import logging
+import os
+import re
+import shutil
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+from urllib.parse import urljoin, urlparse
+
+import aiohttp
+
+
+__all__ = [
+    'HLSError', 'HLSTooLargeError', 'Variant', 'MediaPlaylist', 'HLSFetcher',
+    'is_hls_url', 'parse_master_playlist', 'parse_media_playlist', 'select_variant',
+]
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 8
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_RETRIES = 3
+
+_ATTRIBUTE_PATTERN = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+class HLSError(Exception):
+    """播放列表无法解析或下载失败"""
+    pass
+
+
+class HLSTooLargeError(HLSError):
+    """下载的内容超过 max_bytes"""
+    pass
+
+
+@dataclass
+class Variant:
+    """主播放列表中的一个视频流"""
+    url: str
+    bandwidth: int = 0
+    width: int = 0
+    height: int = 0
+    audio_group: str | None = None
+
+
+@dataclass
+class MediaPlaylist:
+    """媒体播放列表：初始化片段（fMP4）和按顺序排列的分片"""
+    segments: list[str] = field(default_factory=list)
+    init_url: str | None = None
+
+
+def is_hls_url(url: str | None) -> bool:
+    """是否为 HLS 播放列表地址"""
+    return bool(url) and urlparse(url).path.endswith('.m3u8')
+
+
+def _parse_attributes(line: str) -> dict[str, str]:
+    attributes = line.split(':', 1)[1] if ':' in line else ''
+    return {key: value.strip('"') for key, value in _ATTRIBUTE_PATTERN.findall(attributes)}
+
+
+def parse_master_playlist(text: str, base_url: str) -> tuple[list[Variant], dict[str, str]]:
+    """解析主播放列表，返回 (视频流列表, 音频分组 ID -> 音频播放列表地址)"""
+    variants = []
+    audio_groups: dict[str, str] = {}
+    pending: dict[str, str] | None = None
+
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#EXT-X-MEDIA:'):
+            attrs = _parse_attributes(line)
+            if attrs.get('TYPE') == 'AUDIO' and attrs.get('URI') and attrs.get('GROUP-ID'):
+                # 同一分组有多个轨道时优先默认轨道
+                if attrs['GROUP-ID'] not in audio_groups or attrs.get('DEFAULT') == 'YES':
+                    audio_groups[attrs['GROUP-ID']] = urljoin(base_url, attrs['URI'])
+        elif line.startswith('#EXT-X-STREAM-INF:'):
+            pending = _parse_attributes(line)
+        elif line and not line.startswith('#') and pending is not None:
+            width, _, height = pending.get('RESOLUTION', '').partition('x')
+            variants.append(Variant(
+                url=urljoin(base_url, line),
+                bandwidth=int(pending.get('BANDWIDTH') or 0),
+                width=int(width) if width.isdigit() else 0,
+                height=int(height) if height.isdigit() else 0,
+                audio_group=pending.get('AUDIO'),
+            ))
+            pending = None
+
+    return variants, audio_groups
+
+
+def select_variant(variants: list[Variant]) -> Variant | None:
+    """选择分辨率最高的视频流，分辨率相同时选择码率最高的"""
+    if not variants:
+        return None
+    return max(variants, key=lambda v: (v.height, v.bandwidth))
+
+
+def parse_media_playlist(text: str, base_url: str) -> MediaPlaylist:
+    """解析媒体播放列表
+
+    Raises:
+        HLSError: 加密或使用 EXT-X-BYTERANGE 的播放列表
+    """
+    playlist = MediaPlaylist()
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#EXT-X-MAP:'):
+            attrs = _parse_attributes(line)
+            if 'BYTERANGE' in attrs:
+                raise HLSError("EXT-X-MAP with BYTERANGE is not supported")
+            if attrs.get('URI'):
+                playlist.init_url = urljoin(base_url, attrs['URI'])
+        elif line.startswith('#EXT-X-KEY:'):
+            if _parse_attributes(line).get('METHOD', 'NONE') != 'NONE':
+                raise HLSError("encrypted HLS is not supported")
+        elif line.startswith('#EXT-X-BYTERANGE'):
+            raise HLSError("EXT-X-BYTERANGE is not supported")
+        elif line and not line.startswith('#'):
+            playlist.segments.append(urljoin(base_url, line))
+
+    if not playlist.segments:
+        raise HLSError("media playlist has no segments")
+    return playlist
+
+
+class HLSFetcher:
+    """HLS 并发下载器"""
+
+    def __init__(
+        self,
+        window: int = DEFAULT_WINDOW,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        ffmpeg: str | None = None,
+        headers: dict | None = None,
+    ):
+        self.window = max(1, window)
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+        self.retries = retries
+        self.ffmpeg = ffmpeg or shutil.which('ffmpeg')
+        self.headers = {
+            "User-Agent": "Mozilla/5.0 (compatible; avdoulou)",
+            "Referer": "https://x.com/",
+            **(headers or {}),
+        }
+
+    async def fetch(
+        self,
+        playlist_url: str,
+        path: str | os.PathLike,
+        progress: Callable[[int, int], None] | None = None,
+        max_bytes: int | None = None,
+    ) -> Path:
+        """下载 playlist_url（主播放列表或媒体播放列表）到 path
+
+        progress(已下载分片数, 分片总数) 在每个分片写入后调用；
+        超过 max_bytes 时中止并抛出 HLSTooLargeError。
+        """
+        path = Path(path)
+        written = [0]
+
+        # 视频流和音频轨道共用一个连接池，总并发为 2 * window
+        connector = aiohttp.TCPConnector(limit=self.window * 2)
+        async with aiohttp.ClientSession(connector=connector, timeout=self.timeout, headers=self.headers) as session:
+            video_playlist, audio_playlist = await self._load_playlists(session, playlist_url)
+            total = sum(
+                len(p.segments) + (1 if p.init_url else 0) for p in (video_playlist, audio_playlist) if p
+            )
+            done = [0]
+
+            def on_segment(size: int) -> None:
+                written[0] += size
+                done[0] += 1
+                if max_bytes is not None and written[0] > max_bytes:
+                    raise HLSTooLargeError(f"HLS stream exceeds {max_bytes} bytes")
+                if progress:
+                    progress(done[0], total)
+
+            try:
+                if audio_playlist is None:
+                    return await self._fetch_single(session, video_playlist, path, on_segment)
+                return await self._fetch_with_audio(session, video_playlist, audio_playlist, path, on_segment)
+            except BaseException:
+                path.unlink(missing_ok=True)
+                raise
+
+    async def _load_playlists(
+        self, session: aiohttp.ClientSession, playlist_url: str
+    ) -> tuple[MediaPlaylist, MediaPlaylist | None]:
+        """返回 (视频流播放列表, 单独的音频播放列表)"""
+        text = await self._get_text(session, playlist_url)
+        if '#EXT-X-STREAM-INF' not in text:
+            return parse_media_playlist(text, playlist_url), None
+
+        variants, audio_groups = parse_master_playlist(text, playlist_url)
+        variant = select_variant(variants)
+        if variant is None:
+            raise HLSError("master playlist has no variants")
+        logger.debug(f"Selected HLS variant {variant.width}x{variant.height} @ {variant.bandwidth}")
+
+        audio_url = audio_groups.get(variant.audio_group) if variant.audio_group else None
+        if audio_url:
+            video_text, audio_text = await asyncio.gather(
+                self._get_text(session, variant.url), self._get_text(session, audio_url))
+            return parse_media_playlist(video_text, variant.url), parse_media_playlist(audio_text, audio_url)
+        return parse_media_playlist(await self._get_text(session, variant.url), variant.url), None
+
+    async def _fetch_single(
+        self, session: aiohttp.ClientSession, playlist: MediaPlaylist, path: Path, on_segment
+    ) -> Path:
+        """没有单独的音频轨道：拼接分片，TS 分片转封装为 MP4"""
+        if playlist.init_url or not self.ffmpeg:
+            await self._fetch_track(session, playlist, path, on_segment)
+            return path
+
+        ts_path = path.with_name(path.name + '.ts')
+        try:
+            await self._fetch_track(session, playlist, ts_path, on_segment)
+            await self._run_ffmpeg('-i', str(ts_path), '-c', 'copy', '-movflags', '+faststart', str(path))
+        finally:
+            ts_path.unlink(missing_ok=True)
+        return path
+
+    async def _fetch_with_audio(
+        self,
+        session: aiohttp.ClientSession,
+        video: MediaPlaylist,
+        audio: MediaPlaylist,
+        path: Path,
+        on_segment,
+    ) -> Path:
+        """视频流和音频轨道同时下载，再用 ffmpeg 合并"""
+        if not self.ffmpeg:
+            raise HLSError("ffmpeg is required to merge separate HLS audio")
+
+        video_path = path.with_name(path.name + '.video')
+        audio_path = path.with_name(path.name + '.audio')
+        tasks = [
+            asyncio.ensure_future(self._fetch_track(session, video, video_path, on_segment)),
+            asyncio.ensure_future(self._fetch_track(session, audio, audio_path, on_segment)),
+        ]
+        try:
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                # 一条轨道失败时停止另一条
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+            await self._run_ffmpeg(
+                '-i', str(video_path), '-i', str(audio_path),
+                '-map', '0:v:0', '-map', '1:a:0', '-c', 'copy', '-movflags', '+faststart', '-f', 'mp4', str(path),
+            )
+        finally:
+            video_path.unlink(missing_ok=True)
+            audio_path.unlink(missing_ok=True)
+        return path
+
+    async def _fetch_track(
+        self, session: aiohttp.ClientSession, playlist: MediaPlaylist, path: Path, on_segment
+    ) -> None:
+        """按窗口并发下载分片并按顺序写入 path"""
+        urls = ([playlist.init_url] if playlist.init_url else []) + playlist.segments
+        window: deque[asyncio.Future] = deque()
+        try:
+            with open(path, 'wb') as f:
+                for url in urls:
+                    if len(window) >= self.window:
+                        self._write(f, await window.popleft(), on_segment)
+                    window.append(asyncio.ensure_future(self._get_bytes(session, url)))
+                while window:
+                    self._write(f, await window.popleft(), on_segment)
+        finally:
+            for task in window:
+                task.cancel()
+            await asyncio.gather(*window, return_exceptions=True)
+
+    @staticmethod
+    def _write(f, data: bytes, on_segment) -> None:
+        f.write(data)
+        on_segment(len(data))
+
+    async def _get_text(self, session: aiohttp.ClientSession, url: str) -> str:
+        return (await self._get_bytes(session, url)).decode('utf-8', errors='replace')
+
+    async def _get_bytes(self, session: aiohttp.ClientSession, url: str) -> bytes:
+        """下载一个分片或播放列表，网络错误和 5xx 时重试"""
+        attempt = 0
+        while True:
+            try:
+                async with session.get(url) as resp:
+                    if resp.status == 200:
+                        return await resp.read()
+                    if resp.status < 500:
+                        raise HLSError(f"HTTP {resp.status} for {url[:80]}")
+                    error = f"HTTP {resp.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+            attempt += 1
+            if attempt > self.retries:
+                raise HLSError(f"Fetching {url[:80]} failed: {error}")
+            await asyncio.sleep(min(2 ** attempt * 0.25, 4.0))
+
+    async def _run_ffmpeg(self, *args: str) -> None:
+        process = await asyncio.create_subprocess_exec(
+            self.ffmpeg, '-hide_banner', '-loglevel', 'error', '-y', *args,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise HLSError(f"ffmpeg failed: {stderr.decode(errors='replace').strip()[-500:]}")
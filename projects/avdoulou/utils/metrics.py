@@ -0,0 +1,253 @@
+"""Prometheus 文本格式的指标。
+
+不依赖 prometheus_client，只实现用到的 Counter / Gauge / Histogram，线程安全
+（解析阶段的耗时在工作线程中记录）。所有指标注册在模块级的 REGISTRY 中，
+server.py 的 /metrics 和 Bot 的指标端口都从这里输出。
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+
+__all__ = [
+    'Counter', 'Gauge', 'Histogram', 'Registry', 'REGISTRY', 'CONTENT_TYPE', 'start_metrics_server',
+    'HTTP_REQUESTS', 'HTTP_LATENCY', 'STAGE_LATENCY', 'RESOLUTIONS',
+    'BOT_MESSAGES', 'BOT_LATENCY', 'BOT_UPLOADS', 'CACHE_HIT_RATIO', 'CACHE_SIZE',
+    'EXECUTOR_SATURATION', 'EXECUTOR_IN_FLIGHT', 'EXECUTOR_QUEUED', 'EXECUTOR_REJECTED',
+    'CIRCUIT_OPEN', 'CIRCUIT_REJECTED', 'STREAMS_ACTIVE', 'STREAM_BYTES',
+]
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    type_name = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}' for key, v in items]
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+    type_name = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}' for key, v in items]
+
+
+class Histogram(_Metric):
+    """耗时分布直方图"""
+    type_name = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [各桶计数..., +Inf 计数], 总和
+        self._counts: dict[tuple[str, ...], list[int]] = {}
+        self._sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """记录 with 代码块的耗时（秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            return sum(self._counts.get(self._key(labels), ()))
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, list(counts), self._sums[key]) for key, counts in self._counts.items())
+
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# HTTP API
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    'avdoulou_http_requests_total', 'HTTP requests by route, method and status code',
+    ('path', 'method', 'status')))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    'avdoulou_http_request_duration_seconds', 'HTTP request latency by route', ('path',)))
+
+# 解析流程各阶段：queue_wait / native_resolve / extract_info / format_selection / serialize
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    'avdoulou_stage_duration_seconds', 'Latency of each resolution stage', ('stage',)))
+RESOLUTIONS = REGISTRY.register(Counter(
+    'avdoulou_resolutions_total', 'Tweet resolutions by source (cache / native / ytdlp) and result',
+    ('source', 'result')))
+
+# Telegram Bot
+BOT_MESSAGES = REGISTRY.register(Counter(
+    'avdoulou_bot_messages_total', 'Telegram messages handled by outcome', ('outcome',)))
+BOT_LATENCY = REGISTRY.register(Histogram(
+    'avdoulou_bot_message_duration_seconds', 'Time to answer a Telegram message'))
+BOT_UPLOADS = REGISTRY.register(Counter(
+    'avdoulou_bot_uploads_total', 'Videos sent as files by source (file_id / cdn / hls / skipped)', ('source',)))
+
+# 缓存与解析线程池（输出前由 LinkHandler.collect_metrics() 更新）
+CACHE_HIT_RATIO = REGISTRY.register(Gauge(
+    'avdoulou_cache_hit_ratio', 'Resolution cache hit ratio since start'))
+CACHE_SIZE = REGISTRY.register(Gauge(
+    'avdoulou_cache_entries', 'Entries in the resolution cache'))
+EXECUTOR_SATURATION = REGISTRY.register(Gauge(
+    'avdoulou_executor_saturation', '(in-flight + queued) / (workers + max queue)'))
+EXECUTOR_IN_FLIGHT = REGISTRY.register(Gauge(
+    'avdoulou_executor_in_flight', 'Extractions currently running'))
+EXECUTOR_QUEUED = REGISTRY.register(Gauge(
+    'avdoulou_executor_queued', 'Extractions waiting for a worker'))
+EXECUTOR_REJECTED = REGISTRY.register(Gauge(
+    'avdoulou_executor_rejected', 'Extractions rejected because the queue was full, since start'))
+CIRCUIT_OPEN = REGISTRY.register(Gauge(
+    'avdoulou_circuit_open', '1 while the X upstream circuit breaker is open or half-open'))
+CIRCUIT_REJECTED = REGISTRY.register(Gauge(
+    'avdoulou_circuit_rejected', 'Extractions rejected by the circuit breaker, since start'))
+
+# /stream 视频转发
+STREAMS_ACTIVE = REGISTRY.register(Gauge(
+    'avdoulou_streams_active', 'Video streams currently being relayed'))
+STREAM_BYTES = REGISTRY.register(Counter(
+    'avdoulou_stream_bytes_total', 'Video bytes relayed to clients'))
+
+
+async def start_metrics_server(host: str, port: int, collect=None):
+    """启动只提供 GET /metrics 的 HTTP 服务（Bot 进程使用），返回 AppRunner，退出时调用 cleanup()"""
+    from aiohttp import web
+
+    async def handle(request):
+        if collect is not None:
+            collect()
+        return web.Response(body=REGISTRY.render().encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
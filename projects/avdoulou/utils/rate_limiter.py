@@ -0,0 +1,73 @@
+"""令牌桶限流。
+
+每个 key（Telegram 用户 ID / 客户端 IP）一个令牌桶，按 rate_per_minute 匀速补充，
+最多积攒 capacity 个令牌。每次检查都是 O(1)：令牌数在访问时按流逝时间惰性补充。
+
+空闲超过“补满所需时间”的桶与新建的桶等价，会被淘汰，因此内存只与活跃 key 的数量有关；
+另外 max_keys 限制桶的总数。
+"""
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+
+__all__ = ['TokenBucketLimiter']
+
+
+class TokenBucketLimiter:
+    """按 key 限流的令牌桶"""
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        capacity: float | None = None,
+        max_keys: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate_per_minute / 60.0  # 每秒补充的令牌数
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.max_keys = max_keys
+        self._clock = clock
+        # key -> [剩余令牌, 上次更新时间]，按最近访问顺序排列
+        self._buckets: OrderedDict[Hashable, list[float]] = OrderedDict()
+
+    @property
+    def idle_ttl(self) -> float:
+        """桶从空到补满所需的时间，空闲超过该时间的桶可以丢弃"""
+        return self.capacity / self.rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def check(self, key: Hashable, cost: float = 1.0) -> tuple[bool, float]:
+        """尝试消耗令牌
+
+        Returns:
+            (是否允许, 需要等待的秒数)；允许时等待时间为 0
+        """
+        now = self._clock()
+        self._evict(now)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [self.capacity, now]
+            self._buckets[key] = bucket
+        else:
+            tokens, updated = bucket
+            bucket[0] = min(self.capacity, tokens + (now - updated) * self.rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return True, 0.0
+        return False, (cost - bucket[0]) / self.rate
+
+    def _evict(self, now: float) -> None:
+        """淘汰空闲的桶（最旧的在最前面，均摊 O(1)）"""
+        ttl = self.idle_ttl
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if now - updated < ttl and len(self._buckets) < self.max_keys:
+                break
+            self._buckets.popitem(last=False)
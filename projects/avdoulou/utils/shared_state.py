@@ -0,0 +1,242 @@
+"""多进程共享状态（SQLite）。
+
+server.py --workers N 启动多个进程监听同一端口（SO_REUSEPORT），每个进程有自己的内存缓存、
+令牌桶和 single-flight。为了让多个进程表现得像一个服务，下列状态放在同一个 SQLite 文件中
+（默认位于 /dev/shm，即共享内存）：
+
+- 解析结果缓存：进程内缓存未命中时先查共享缓存，任何一个进程解析的结果其他进程都可以直接使用
+- 令牌桶：同一个客户端 IP / Telegram 用户无论请求落到哪个进程，都消耗同一个桶
+- 解析租约：同一条推文同时只由一个进程调用 yt-dlp，其他进程等待共享缓存中出现结果；
+  持有租约的进程崩溃时租约在 lease_seconds 后过期
+
+每个线程使用自己的连接（SQLite 连接不能跨线程共享）。令牌桶在事件循环中同步检查，
+只等待 busy_timeout 秒，拿不到写锁时由调用方退回进程内的令牌桶。
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Hashable
+
+from utils.rate_limiter import TokenBucketLimiter
+
+
+__all__ = ['SharedState', 'SharedTokenBucketLimiter']
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = 30.0
+DEFAULT_POLL_INTERVAL = 0.1
+# 事件循环中等待写锁的最长时间（秒）
+DEFAULT_BUSY_TIMEOUT = 0.05
+# 线程池中的读写等待写锁的最长时间（秒）
+EXECUTOR_BUSY_TIMEOUT = 2.0
+# 每写入多少次清理一次过期条目
+CLEANUP_EVERY = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SharedState:
+    """多个进程共用的缓存、令牌桶和解析租约"""
+
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        busy_timeout: float = DEFAULT_BUSY_TIMEOUT,
+    ):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.busy_timeout = busy_timeout
+        # 租约持有者标识，区分不同进程
+        self.owner = uuid.uuid4().hex
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        # 建表使用单独的连接，避免当前线程的连接沿用较长的等待时间
+        conn = sqlite3.connect(path, timeout=EXECUTOR_BUSY_TIMEOUT, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self, timeout: float) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=timeout, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    # ------------------------------------------------------------------
+    # 解析结果缓存
+    # ------------------------------------------------------------------
+
+    async def get(self, key: str) -> tuple[dict, float] | None:
+        """读取共享缓存，返回 (值, 剩余有效秒数)"""
+        cached = await self._run(self._get, key)
+        if cached is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return cached
+
+    def _get(self, key: str) -> tuple[dict, float] | None:
+        row = self._connect(EXECUTOR_BUSY_TIMEOUT).execute(
+            "SELECT data, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        remaining = row[1] - time.time()
+        if remaining <= 0:
+            return None
+        return json.loads(row[0]), remaining
+
+    async def set(self, key: str, value: dict, ttl: float) -> None:
+        """写入共享缓存，ttl <= 0 时不保存"""
+        if ttl > 0:
+            await self._run(self._set, key, json.dumps(value, ensure_ascii=False), time.time() + ttl)
+
+    def _set(self, key: str, data: str, expires_at: float) -> None:
+        conn = self._connect(EXECUTOR_BUSY_TIMEOUT)
+        conn.execute(
+            "INSERT INTO cache (key, data, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at",
+            (key, data, expires_at),
+        )
+        self._writes += 1
+        if self._writes % CLEANUP_EVERY == 0:
+            now = time.time()
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            conn.execute("DELETE FROM leases WHERE expires_at <= ?", (now,))
+
+    async def delete(self, key: str) -> None:
+        await self._run(self._delete, key)
+
+    def _delete(self, key: str) -> None:
+        self._connect(EXECUTOR_BUSY_TIMEOUT).execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    # ------------------------------------------------------------------
+    # 解析租约
+    # ------------------------------------------------------------------
+
+    async def acquire(self, key: str) -> bool:
+        """尝试取得 key 的解析租约（没有人持有或已过期时成功）"""
+        return await self._run(self._acquire, key)
+
+    def _acquire(self, key: str) -> bool:
+        now = time.time()
+        cursor = self._connect(EXECUTOR_BUSY_TIMEOUT).execute(
+            "INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.expires_at <= ?",
+            (key, self.owner, now + self.lease_seconds, now),
+        )
+        return cursor.rowcount == 1
+
+    async def release(self, key: str) -> None:
+        await self._run(self._release, key)
+
+    def _release(self, key: str) -> None:
+        self._connect(EXECUTOR_BUSY_TIMEOUT).execute(
+            "DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner)
+        )
+
+    # ------------------------------------------------------------------
+    # 令牌桶
+    # ------------------------------------------------------------------
+
+    def take_token(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> tuple[bool, float]:
+        """消耗共享令牌桶中的令牌（同步，在事件循环中调用）
+
+        Raises:
+            sqlite3.OperationalError: busy_timeout 内没有拿到写锁
+        """
+        conn = self._connect(self.busy_timeout)
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, tokens, now),
+            )
+            self._writes += 1
+            if self._writes % CLEANUP_EVERY == 0:
+                # 空闲到补满的桶与新建的桶等价
+                conn.execute("DELETE FROM buckets WHERE updated_at <= ?", (now - capacity / rate,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return (True, 0.0) if allowed else (False, (cost - tokens) / rate)
+
+    def stats(self) -> dict:
+        return {
+            'path': self.path,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def close(self) -> None:
+        """关闭当前线程的连接（其他线程的连接随线程池一起释放）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class SharedTokenBucketLimiter:
+    """与 TokenBucketLimiter 接口相同、状态保存在 SharedState 中的令牌桶
+
+    共享状态暂时不可用（写锁被长时间占用、文件损坏等）时退回进程内的令牌桶，不阻塞请求。
+    """
+
+    def __init__(self, state: SharedState, rate_per_minute: float, namespace: str, capacity: float | None = None):
+        self.state = state
+        self.namespace = namespace
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.local = TokenBucketLimiter(rate_per_minute, capacity=capacity)
+        self.fallbacks = 0
+
+    def check(self, key: Hashable, cost: float = 1.0) -> tuple[bool, float]:
+        """尝试消耗令牌，返回 (是否允许, 需要等待的秒数)"""
+        try:
+            return self.state.take_token(f"{self.namespace}:{key}", self.rate, self.capacity, cost)
+        except sqlite3.Error as e:
+            self.fallbacks += 1
+            logger.debug(f"Shared rate limit unavailable, using local bucket: {e}")
+            return self.local.check(key, cost)
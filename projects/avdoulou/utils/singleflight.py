@@ -0,0 +1,42 @@
+"""请求合并（single-flight）。
+
+同一个 key 的并发调用只执行一次，其余调用等待并共享同一个结果或异常。
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+__all__ = ['SingleFlight']
+
+
+class SingleFlight:
+    """按 key 合并并发的异步调用"""
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.executed = 0  # 实际执行次数
+        self.shared = 0  # 搭便车（复用进行中调用）的次数
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """执行 fn()，若同 key 已有调用在进行中则等待其结果"""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            self.executed += 1
+            # 放到独立的 Task 中执行，发起者被取消时不影响其他等待者
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 所有等待者都被取消时，避免出现 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,267 @@
+"""解析结果的持久化存储（SQLite）。
+
+进程重启后内存缓存为空，刚启动的几分钟内所有请求都要重新解析。设置 STORE_PATH 后：
+
+- 解析成功的结果（推文 ID → 媒体地址、图片、过期时间）和 Bot 发送视频得到的 file_id 写入 SQLite
+- 写入先放进内存中的待写队列（同一推文只保留最新一条），由后台任务每隔 flush_interval 秒
+  在线程池中批量提交，事件循环中不做磁盘 IO
+- 缓存命中只累加计数，随下一批写入一起更新，作为“热门程度”
+- 启动时只把命中次数最多、尚未过期的 preload 条载入内存缓存，其余条目留在磁盘上
+- 条目数超过 max_entries 时删除命中最少、最久未更新的条目，已过期的条目随每次写入清理
+
+内存占用只有待写队列（最多 flush_interval 秒内的写入）和预加载的条目，与磁盘上的条目数无关。
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from handlers.models import MediaResult
+
+
+__all__ = ['ResolutionStore', 'StoredResult']
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_FLUSH_INTERVAL = 2.0
+DEFAULT_PRELOAD = 512
+# 与 VideoUploader 中 file_id 缓存的有效期一致
+DEFAULT_FILE_ID_TTL = 30 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resolutions (
+    tweet_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS resolutions_expires_at ON resolutions (expires_at);
+CREATE INDEX IF NOT EXISTS resolutions_hits ON resolutions (hits, updated_at);
+CREATE TABLE IF NOT EXISTS file_ids (
+    tweet_id TEXT PRIMARY KEY,
+    file_id TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+@dataclass
+class StoredResult:
+    """从存储中读出的一条解析结果"""
+    tweet_id: str
+    result: MediaResult
+    expires_at: float  # Unix 时间戳
+    hits: int
+
+
+class ResolutionStore:
+    """SQLite 解析结果存储，写入在后台批量提交"""
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        file_id_ttl: float = DEFAULT_FILE_ID_TTL,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.file_id_ttl = file_id_ttl
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # 连接在线程池中使用，由锁保证同一时间只有一个线程访问
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+        # 待写队列：推文 ID -> (结果 JSON, 过期时间)，file_id 为 None 表示删除
+        self._pending_results: dict[str, tuple[str, float]] = {}
+        self._pending_hits: dict[str, int] = {}
+        self._pending_file_ids: dict[str, str | None] = {}
+        self._flush_task: asyncio.Task | None = None
+        self._closed = False
+        self.flushes = 0
+        self.written = 0
+        self.evicted = 0
+
+    # ------------------------------------------------------------------
+    # 事件循环中调用：只修改待写队列
+    # ------------------------------------------------------------------
+
+    def put(self, tweet_id: str, result: MediaResult, expires_at: float) -> None:
+        """记录解析结果，expires_at 为 Unix 时间戳"""
+        self._pending_results[tweet_id] = (json.dumps(result.to_dict(), ensure_ascii=False), expires_at)
+        self._schedule_flush()
+
+    def touch(self, tweet_id: str) -> None:
+        """记录一次缓存命中"""
+        self._pending_hits[tweet_id] = self._pending_hits.get(tweet_id, 0) + 1
+        self._schedule_flush()
+
+    def put_file_id(self, tweet_id: str, file_id: str) -> None:
+        self._pending_file_ids[tweet_id] = file_id
+        self._schedule_flush()
+
+    def delete_file_id(self, tweet_id: str) -> None:
+        self._pending_file_ids[tweet_id] = None
+        self._schedule_flush()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending_results) + len(self._pending_hits) + len(self._pending_file_ids)
+
+    def _schedule_flush(self) -> None:
+        if self._closed or (self._flush_task is not None and not self._flush_task.done()):
+            return
+        try:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+        except RuntimeError:
+            pass  # 没有事件循环（同步调用）时由 flush() / close() 提交
+
+    async def _flush_later(self) -> None:
+        # 提交期间产生的新写入由同一个任务在下一轮提交
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                # 写入失败只影响重启后的预热，不影响正常请求
+                logger.warning(f"Writing resolution store failed: {e}")
+            if not self.pending:
+                return
+
+    # ------------------------------------------------------------------
+    # 批量读写（在线程池中执行）
+    # ------------------------------------------------------------------
+
+    async def flush(self) -> int:
+        """立即提交待写队列，返回写入的条目数"""
+        results, self._pending_results = self._pending_results, {}
+        hits, self._pending_hits = self._pending_hits, {}
+        file_ids, self._pending_file_ids = self._pending_file_ids, {}
+        if not (results or hits or file_ids):
+            return 0
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._write, results, hits, file_ids
+        )
+
+    def _write(self, results: dict, hits: dict, file_ids: dict) -> int:
+        now = time.time()
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    "INSERT INTO resolutions (tweet_id, data, expires_at, hits, updated_at) VALUES (?, ?, ?, 0, ?) "
+                    "ON CONFLICT (tweet_id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at, "
+                    "updated_at = excluded.updated_at",
+                    [(tweet_id, data, expires_at, now) for tweet_id, (data, expires_at) in results.items()],
+                )
+                conn.executemany(
+                    "UPDATE resolutions SET hits = hits + ? WHERE tweet_id = ?",
+                    [(count, tweet_id) for tweet_id, count in hits.items()],
+                )
+                conn.executemany(
+                    "INSERT INTO file_ids (tweet_id, file_id, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (tweet_id) DO UPDATE SET file_id = excluded.file_id, updated_at = excluded.updated_at",
+                    [(tweet_id, file_id, now) for tweet_id, file_id in file_ids.items() if file_id is not None],
+                )
+                conn.executemany(
+                    "DELETE FROM file_ids WHERE tweet_id = ?",
+                    [(tweet_id,) for tweet_id, file_id in file_ids.items() if file_id is None],
+                )
+                self.evicted += self._evict(now)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        self.flushes += 1
+        written = len(results) + len(file_ids)
+        self.written += written
+        return written
+
+    def _evict(self, now: float) -> int:
+        """删除过期条目，并把条目数限制在 max_entries 以内（命中最少、最久未更新的先删）"""
+        conn = self._conn
+        removed = conn.execute("DELETE FROM resolutions WHERE expires_at <= ?", (now,)).rowcount
+        removed += conn.execute(
+            "DELETE FROM file_ids WHERE updated_at <= ?", (now - self.file_id_ttl,)
+        ).rowcount
+        for table, order in (("resolutions", "hits, updated_at"), ("file_ids", "updated_at")):
+            excess = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] - self.max_entries
+            if excess > 0:
+                removed += conn.execute(
+                    f"DELETE FROM {table} WHERE tweet_id IN "
+                    f"(SELECT tweet_id FROM {table} ORDER BY {order} LIMIT ?)",
+                    (excess,),
+                ).rowcount
+        return removed
+
+    async def load_hot(self, limit: int = DEFAULT_PRELOAD) -> list[StoredResult]:
+        """读取命中次数最多、尚未过期的 limit 条结果"""
+        if limit <= 0:
+            return []
+        return await asyncio.get_running_loop().run_in_executor(None, self._load_hot, limit)
+
+    def _load_hot(self, limit: int) -> list[StoredResult]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT tweet_id, data, expires_at, hits FROM resolutions WHERE expires_at > ? "
+                "ORDER BY hits DESC, updated_at DESC LIMIT ?",
+                (time.time(), limit),
+            ).fetchall()
+
+        stored = []
+        for tweet_id, data, expires_at, hits in rows:
+            try:
+                result = MediaResult.from_dict(json.loads(data))
+            except (ValueError, TypeError) as e:
+                logger.debug(f"Skipping unreadable stored result for {tweet_id}: {e}")
+                continue
+            stored.append(StoredResult(tweet_id, result, expires_at, hits))
+        return stored
+
+    async def load_file_ids(self, limit: int) -> list[tuple[str, str]]:
+        """读取最近更新的 limit 个 (推文 ID, file_id)"""
+        if limit <= 0:
+            return []
+        return await asyncio.get_running_loop().run_in_executor(None, self._load_file_ids, limit)
+
+    def _load_file_ids(self, limit: int) -> list[tuple[str, str]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT tweet_id, file_id FROM file_ids ORDER BY updated_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+
+    def stats(self) -> dict:
+        return {
+            'pending': self.pending,
+            'flushes': self.flushes,
+            'written': self.written,
+            'evicted': self.evicted,
+        }
+
+    async def close(self) -> None:
+        """提交剩余的写入并关闭数据库"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Writing resolution store failed: {e}")
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,57 @@
+"""从签名媒体地址中解析过期时间。
+
+常见的签名参数：
+- expires / Expires / exp / expire / e = Unix 时间戳（秒或毫秒），CloudFront、Akamai (hdnts=exp=...~acl=...) 等
+- X-Amz-Date + X-Amz-Expires：S3 预签名地址
+"""
+import calendar
+import re
+import time
+from urllib.parse import parse_qsl, unquote, urlparse
+
+
+__all__ = ['parse_url_expiry']
+
+_EPOCH_PATTERN = re.compile(r'(?:^|[?&~/;,])(?:expires|expire|exp|e)=(\d{10,13})(?=$|[&~/;,])', re.IGNORECASE)
+
+
+def _normalize_epoch(value: int) -> float:
+    # 13 位为毫秒
+    return value / 1000.0 if value > 10 ** 12 else float(value)
+
+
+def _amz_expiry(params: dict) -> float | None:
+    date = params.get('x-amz-date')
+    expires = params.get('x-amz-expires')
+    if not date or not expires or not expires.isdigit():
+        return None
+    try:
+        signed_at = calendar.timegm(time.strptime(date, '%Y%m%dT%H%M%SZ'))
+    except ValueError:
+        return None
+    return float(signed_at + int(expires))
+
+
+def parse_url_expiry(url: str | None) -> float | None:
+    """返回地址的过期时间（Unix 时间戳，秒），没有过期提示时返回 None"""
+    if not url:
+        return None
+
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return None
+
+    params = {k.lower(): v for k, v in parse_qsl(parsed.query, keep_blank_values=True)}
+    candidates = []
+
+    amz = _amz_expiry(params)
+    if amz is not None:
+        candidates.append(amz)
+
+    # 查询参数、token 参数值（如 hdnts=exp=...~acl=...）以及路径中的 exp=...
+    haystack = '&'.join([parsed.path, parsed.query, unquote(parsed.query)])
+    for match in _EPOCH_PATTERN.finditer(haystack):
+        candidates.append(_normalize_epoch(int(match.group(1))))
+
+    return min(candidates) if candidates else None
@@ -3,6 +3,13 @@ import re
 from urllib.parse import urlparse
 
 
+# 消息中的推文链接：x.com / twitter.com（可带 www.），路径中包含 /status/<数字>
+X_STATUS_URL_PATTERN = re.compile(
+    r"https?://(?:www\.)?(?:x|twitter)\.com(?:/[^\s/?#]+)*?/status/(\d+)[A-Za-z0-9\-._~/?#&=%+]*",
+    re.IGNORECASE,
+)
+
+
 def is_x_video_url(url: str) -> bool:
     """验证是否为 X/Twitter 推文链接"""
     if not url:
@@ -36,3 +43,19 @@ def extract_tweet_id(url: str) -> str | None:
         pass
 
     return None
+
+
+def extract_x_urls(text: str) -> list[str]:
+    """提取消息中的所有推文链接，按推文 ID 去重并保持原始顺序"""
+    if not text:
+        return []
+
+    urls = []
+    seen = set()
+    for match in X_STATUS_URL_PATTERN.finditer(text):
+        tweet_id = match.group(1)
+        if tweet_id not in seen:
+            seen.add(tweet_id)
+            # 句末的英文句号不属于链接
+            urls.append(match.group(0).rstrip("."))
+    return urls